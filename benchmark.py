@@ -0,0 +1,342 @@
+import argparse
+import datetime
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+from bot import TradingFromSignal
+from handlers.classes import BotConfig, Mt5Setting, SimulatedMt5Setting
+from handlers.fake_controller import FakeController, build_signal
+from handlers.simulated_mt5 import DEFAULT_SIMULATED_SYMBOLS, SimulatedMt5
+from handlers.supervisor import get_rss_in_bytes
+
+RESULT_FORMAT_VERSION = 1
+BARRIER_TIMEOUT_IN_SECONDS = 600
+SOURCES = ("zulu", "exness", "myfxbook")
+# Metrics compared with the baseline, with the summary key and the statistic used
+REGRESSION_METRICS = (
+    ("cycle_latency_ms", "p90"),
+    ("mt5_calls_per_cycle", "mean"),
+    ("cpu_ms_per_cycle", "mean"),
+)
+
+Scenario = namedtuple(
+    "Scenario", ["masters_per_terminal", "signals_per_master", "terminals", "sources", "cycles", "warmup_cycles",
+                 "churn_ratio", "modify_ratio", "closed_ratio", "mt5_latency_in_ms", "log_level", "seed"])
+
+
+def get_master_trader_id(terminal_index, master_index):
+    return str((terminal_index + 1) * 100_000 + master_index)
+
+
+def get_master_traders(scenario: Scenario, terminal_index):
+    master_traders = {}
+    for master_index in range(scenario.masters_per_terminal):
+        source = SOURCES[master_index % scenario.sources]
+        master_traders.setdefault(source, []).append(
+            get_master_trader_id(terminal_index, master_index))
+    return master_traders
+
+
+class SyntheticSignals:
+    """Signals of every master trader of a scenario, churned from one cycle to the next."""
+
+    SYMBOLS = tuple(DEFAULT_SIMULATED_SYMBOLS.items())
+
+    def __init__(self, scenario: Scenario, controller: FakeController):
+        self.scenario = scenario
+        self.controller = controller
+        self.random = random.Random(scenario.seed)
+        self.signal_ids = itertools.count(1)
+        self.signals = {}
+        for terminal_index in range(scenario.terminals):
+            for source, master_trader_ids in get_master_traders(scenario, terminal_index).items():
+                for master_trader_id in master_trader_ids:
+                    self.signals[(source, master_trader_id)] = [
+                        self.build_signal() for _ in range(scenario.signals_per_master)]
+        self.publish(self.signals)
+
+    def build_signal(self):
+        signal_id = next(self.signal_ids)
+        symbol, symbol_setting = self.random.choice(self.SYMBOLS)
+        price = symbol_setting["price"]
+        trade_type = self.random.choice(("BUY", "SELL"))
+        direction = 1 if trade_type == "BUY" else -1
+        return build_signal(
+            signal_id, signal_id, symbol, trade_type, round(self.random.randint(1, 10) * 0.01, 2), price,
+            datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            round(price * (1 - direction * 0.05), symbol_setting["digits"]),
+            round(price * (1 + direction * 0.05), symbol_setting["digits"]))
+
+    def churn(self):
+        """Replace and modify a share of the signals of every master trader and publish the changes."""
+        replaced_count = round(self.scenario.signals_per_master * self.scenario.churn_ratio)
+        modified_count = round(self.scenario.signals_per_master * self.scenario.modify_ratio)
+        if not replaced_count and not modified_count:
+            return
+
+        for signals in self.signals.values():
+            for index in self.random.sample(range(len(signals)), min(replaced_count, len(signals))):
+                signals[index] = self.build_signal()
+            for index in self.random.sample(range(len(signals)), min(modified_count, len(signals))):
+                signals[index] = {**signals[index], "stop_loss": round(signals[index]["stop_loss"] * 0.999, 5)}
+        self.publish(self.signals)
+
+    def publish(self, signals_by_master_trader):
+        for (source, master_trader_id), signals in signals_by_master_trader.items():
+            self.controller.set_signals(source, master_trader_id, signals)
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def nearest_rank(percentile):
+        return values[min(len(values) - 1, max(0, round(percentile / 100 * len(values)) - 1))]
+
+    return {
+        "p50": round(nearest_rank(50), 3),
+        "p90": round(nearest_rank(90), 3),
+        "p99": round(nearest_rank(99), 3),
+        "max": round(values[-1], 3),
+        "mean": round(sum(values) / len(values), 3),
+    }
+
+
+def close_share_of_positions(simulator: SimulatedMt5, closed_ratio, seed):
+    """Close positions behind the bot's back, so their signals are found in the deal history."""
+    positions = simulator.positions_get()
+    closed_positions = random.Random(seed).sample(positions, round(len(positions) * closed_ratio))
+    for position in closed_positions:
+        simulator.order_send({
+            "action": simulator.TRADE_ACTION_DEAL,
+            "type": simulator.ORDER_TYPE_SELL if position.type == simulator.ORDER_TYPE_BUY else simulator.ORDER_TYPE_BUY,
+            "symbol": position.symbol,
+            "volume": position.volume,
+            "position": position.ticket,
+            "magic": position.magic,
+        })
+
+
+def run_terminal(scenario: Scenario, terminal_index, base_controller_url, work_folder_path, barrier, result_queue):
+    """Run the cycles of one terminal in step with the other terminals of the scenario."""
+    try:
+        bot_name = f"benchmark_{terminal_index}"
+        bot_config = BotConfig(
+            base_controller_url=base_controller_url, log_folder_path=f"{work_folder_path}/logs",
+            log_level=scenario.log_level, mt5_backend="simulated", state_folder_path=f"{work_folder_path}/state",
+            metrics_folder_path=f"{work_folder_path}/metrics")
+        mt5_setting = Mt5Setting(
+            server="Benchmark", login_id=terminal_index + 1, password="", setup_path="benchmark",
+            copied_volume_coefficient=1, symbol_postfix="", master_traders=get_master_traders(scenario, terminal_index),
+            bot_name=bot_name, type_filling="ORDER_FILLING_FOK", max_allowed_order_age_to_copy_in_minutes=10 ** 6,
+            max_allowed_price_difference_in_pips=10 ** 9)
+        simulator = SimulatedMt5(SimulatedMt5Setting(
+            default_latency_in_ms=scenario.mt5_latency_in_ms, seed=scenario.seed + terminal_index))
+        bot = TradingFromSignal(mt5_setting, bot_config, mt5=simulator)
+    except Exception:
+        barrier.abort()
+        raise
+
+    latencies_in_ms = []
+    mt5_calls_per_cycle = []
+    cpu_ms_per_cycle = []
+    max_rss_in_bytes = 0
+    try:
+        for cycle in range(scenario.warmup_cycles + scenario.cycles):
+            barrier.wait(BARRIER_TIMEOUT_IN_SECONDS)
+            call_count = sum(bot.mt5_proxy.call_counts.values())
+            cpu_started_at = time.process_time()
+            started_at = time.perf_counter()
+            bot.run_cycle()
+            latency_in_ms = (time.perf_counter() - started_at) * 1000
+            cpu_in_ms = (time.process_time() - cpu_started_at) * 1000
+            if cycle == 0 and scenario.closed_ratio:
+                close_share_of_positions(simulator, scenario.closed_ratio, scenario.seed + terminal_index)
+            if cycle >= scenario.warmup_cycles:
+                latencies_in_ms.append(latency_in_ms)
+                cpu_ms_per_cycle.append(cpu_in_ms)
+                mt5_calls_per_cycle.append(sum(bot.mt5_proxy.call_counts.values()) - call_count)
+                max_rss_in_bytes = max(max_rss_in_bytes, get_rss_in_bytes())
+            barrier.wait(BARRIER_TIMEOUT_IN_SECONDS)
+    except Exception:
+        barrier.abort()
+        raise
+    finally:
+        bot.shutdown()
+
+    result_queue.put({
+        "terminal": bot_name,
+        "open_positions": len(simulator.positions_get()),
+        "deals": len(simulator.history_deals_get(0, time.time() * 2)),
+        "cycle_latencies_ms": latencies_in_ms,
+        "mt5_calls_per_cycle": mt5_calls_per_cycle,
+        "cpu_ms_per_cycle": cpu_ms_per_cycle,
+        "max_rss_in_bytes": max_rss_in_bytes,
+    })
+
+
+def run_scenario(scenario: Scenario, work_folder_path):
+    controller = FakeController().start()
+    signals = SyntheticSignals(scenario, controller)
+    barrier = multiprocessing.Barrier(scenario.terminals + 1)
+    result_queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=run_terminal, daemon=True,
+            args=(scenario, terminal_index, controller.base_url, work_folder_path, barrier, result_queue))
+        for terminal_index in range(scenario.terminals)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        started_at = time.perf_counter()
+        for cycle in range(scenario.warmup_cycles + scenario.cycles):
+            if cycle:
+                signals.churn()
+            barrier.wait(BARRIER_TIMEOUT_IN_SECONDS)
+            barrier.wait(BARRIER_TIMEOUT_IN_SECONDS)
+        elapsed_in_seconds = time.perf_counter() - started_at
+        workers = [result_queue.get(timeout=BARRIER_TIMEOUT_IN_SECONDS) for _ in processes]
+    except threading.BrokenBarrierError:
+        raise Exception(f"A terminal of scenario {scenario} failed, see its logs in {work_folder_path}/logs")
+    finally:
+        for process in processes:
+            process.join(timeout=BARRIER_TIMEOUT_IN_SECONDS)
+        controller.stop()
+
+    workers.sort(key=lambda worker: worker["terminal"])
+    return {
+        "masters_per_terminal": scenario.masters_per_terminal,
+        "signals_per_master": scenario.signals_per_master,
+        "terminals": scenario.terminals,
+        "cycle_latency_ms": percentiles([value for worker in workers for value in worker["cycle_latencies_ms"]]),
+        "mt5_calls_per_cycle": percentiles([value for worker in workers for value in worker["mt5_calls_per_cycle"]]),
+        "cpu_ms_per_cycle": percentiles([value for worker in workers for value in worker["cpu_ms_per_cycle"]]),
+        "max_rss_in_mb": round(max(worker["max_rss_in_bytes"] for worker in workers) / 1024 / 1024, 1),
+        "cycles_per_second": round(scenario.cycles * scenario.terminals / elapsed_in_seconds, 1),
+        "workers": [
+            {
+                "terminal": worker["terminal"],
+                "open_positions": worker["open_positions"],
+                "deals": worker["deals"],
+                "cycle_latency_ms": percentiles(worker["cycle_latencies_ms"]),
+                "mt5_calls_per_cycle": percentiles(worker["mt5_calls_per_cycle"]),
+                "cpu_ms_per_cycle": percentiles(worker["cpu_ms_per_cycle"]),
+                "max_rss_in_mb": round(worker["max_rss_in_bytes"] / 1024 / 1024, 1),
+            }
+            for worker in workers
+        ],
+    }
+
+
+def get_scenario_key(result):
+    return result["masters_per_terminal"], result["signals_per_master"], result["terminals"]
+
+
+def find_regressions(results, baseline, max_regression_percent):
+    """Return the metrics of ``results`` worse than ``baseline`` by more than ``max_regression_percent``."""
+    baseline_scenarios = {get_scenario_key(result): result for result in baseline["scenarios"]}
+    regressions = []
+    for result in results["scenarios"]:
+        baseline_result = baseline_scenarios.get(get_scenario_key(result))
+        if baseline_result is None:
+            continue
+        for metric, statistic in REGRESSION_METRICS:
+            value = result[metric].get(statistic)
+            baseline_value = baseline_result.get(metric, {}).get(statistic)
+            if value is None or not baseline_value:
+                continue
+            if value > baseline_value * (1 + max_regression_percent / 100):
+                regressions.append({
+                    "scenario": dict(zip(("masters_per_terminal", "signals_per_master", "terminals"),
+                                         get_scenario_key(result))),
+                    "metric": f"{metric}.{statistic}",
+                    "baseline": baseline_value,
+                    "value": value,
+                    "change_percent": round((value / baseline_value - 1) * 100, 1),
+                })
+    return regressions
+
+
+def parse_counts(value):
+    return [int(count) for count in value.split(",") if count]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure TradingFromSignal cycles against simulated terminals at increasing scale")
+    parser.add_argument("--masters", type=parse_counts, default=[1, 10, 50],
+                        help="comma separated master traders per terminal")
+    parser.add_argument("--signals", type=parse_counts, default=[1, 10, 100],
+                        help="comma separated signals per master trader")
+    parser.add_argument("--terminals", type=parse_counts, default=[1, 4],
+                        help="comma separated terminal processes")
+    parser.add_argument("--sources", type=int, default=1, choices=range(1, len(SOURCES) + 1))
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--warmup-cycles", type=int, default=2)
+    parser.add_argument("--churn-ratio", type=float, default=0.05,
+                        help="share of the signals of each master trader replaced every cycle")
+    parser.add_argument("--modify-ratio", type=float, default=0.05,
+                        help="share of the signals of each master trader whose stop loss changes every cycle")
+    parser.add_argument("--closed-ratio", type=float, default=0.1,
+                        help="share of the copied positions closed outside the bot after the first cycle")
+    parser.add_argument("--mt5-latency-ms", type=float, default=0.0)
+    parser.add_argument("--log-level", default="ERROR")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None,
+                        help="result file, benchmark_results/<date>.json by default")
+    parser.add_argument("--baseline", default=None, help="result file of a previous run to compare with")
+    parser.add_argument("--max-regression-percent", type=float, default=20.0)
+    args = parser.parse_args()
+
+    results = {
+        "version": RESULT_FORMAT_VERSION,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in {"output", "baseline"}},
+        "scenarios": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as work_folder_path:
+        for masters, signals, terminals in itertools.product(args.masters, args.signals, args.terminals):
+            scenario = Scenario(
+                masters, signals, terminals, args.sources, args.cycles, args.warmup_cycles, args.churn_ratio,
+                args.modify_ratio, args.closed_ratio, args.mt5_latency_ms, args.log_level, args.seed)
+            result = run_scenario(
+                scenario, f"{work_folder_path}/{masters}_{signals}_{terminals}")
+            results["scenarios"].append(result)
+            print(f"masters={masters} signals={signals} terminals={terminals}: "
+                  f"cycle p50/p90/p99 {result['cycle_latency_ms']['p50']}/{result['cycle_latency_ms']['p90']}/"
+                  f"{result['cycle_latency_ms']['p99']}ms, {result['mt5_calls_per_cycle']['mean']} MT5 calls, "
+                  f"{result['cpu_ms_per_cycle']['mean']}ms CPU per cycle, {result['max_rss_in_mb']}MB RSS")
+
+    if args.baseline:
+        with open(args.baseline) as content:
+            results["regressions"] = find_regressions(results, json.load(content), args.max_regression_percent)
+
+    output_path = args.output or f"benchmark_results/{datetime.datetime.now().strftime('%Y-%m-%d_%H_%M_%S')}.json"
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as content:
+        json.dump(results, content, indent=2)
+    print(f"Results written to {output_path}")
+
+    for regression in results.get("regressions", []):
+        print(f"REGRESSION {regression}")
+    return 1 if results.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,130 +1,248 @@
+import dataclasses
 import datetime
 import json
+import os
+import queue
 import time
-from multiprocessing import Process
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from multiprocessing import Manager, Queue
 
-import dateutil.parser
-import MetaTrader5 as mt5
 import requests
 from dacite import from_dict
 
+from handlers.change_detector import ReconciliationChangeDetector
 from handlers.classes import BotConfig, MasterTrader, TradeSignal, TradeType
+from handlers.config_watcher import ConfigWatcher
+from handlers.constant import OrderIntentTypeEnum, SignalLifecycleStateEnum, SignalRejectReasonEnum
+from handlers.execution_queue import ExecutionQueue
+from handlers.controller_client import ControllerClient
 from handlers.logger import Logger
+from handlers.magic_codec import MagicNumberCodec
+from handlers.metrics import InstrumentedMt5, Metrics, aggregate_metric_files
+from handlers.mt5_backend import load_mt5_backend
 from handlers.mt5_handler import Mt5Handler, Mt5Setting
+from handlers.mt5_proxy import Mt5Proxy
+from handlers.recording import Recorder, RecordingMt5
+from handlers.signal_decoder import SignalDecoder
+from handlers.signal_validator import SignalValidator
+from handlers.signal_fetcher import SharedSignalFetcher, SharedSignalReceiver
+from handlers.signal_transport import LongPollingTransport, build_signal_transport
+from handlers.state_journal import StateJournal
+from handlers.supervisor import WorkerHeartbeat, WorkerSupervisor
 
 
 class TradingFromSignal:
-    def __init__(self, mt5_setting: Mt5Setting, bot_config: BotConfig):
+    MAX_CYCLE_RETRY_BACKOFF_IN_SECONDS = 30
+
+    def __init__(self, mt5_setting: Mt5Setting, bot_config: BotConfig, mt5=None, signal_queue=None,
+                 heartbeat: WorkerHeartbeat = None, control_queue=None):
         now = datetime.datetime.now()
         formatted_date = now.strftime("%Y-%m-%d_%H_%M_%S")
         log_file_path = (
             f"{bot_config.log_folder_path}/{mt5_setting.bot_name}/{formatted_date}.log"
         )
         self.logger = Logger(
-            log_file_path=log_file_path, message_prefix=f'{mt5_setting.login_id}::{mt5_setting.bot_name}', log_level=bot_config.log_level
+            log_file_path=log_file_path, message_prefix=f'{mt5_setting.login_id}::{mt5_setting.bot_name}', log_level=bot_config.log_level,
+            log_format=bot_config.log_format, max_file_size_in_mb=bot_config.log_max_file_size_in_mb,
+            backup_count=bot_config.log_backup_count, rotation_interval_in_hours=bot_config.log_rotation_interval_in_hours,
         ).get_logger()
 
+        self.metrics = Metrics(terminal=mt5_setting.bot_name)
+        self.metrics_file_path = f"{get_metrics_folder_path(bot_config)}/terminals/{mt5_setting.bot_name}.prom"
+        self.metrics_exported_at = time.monotonic()
+        mt5 = mt5 or load_mt5_backend(bot_config)
+        self.recorder = None
+        if bot_config.recording_folder_path:
+            self.recorder = Recorder(
+                f"{bot_config.recording_folder_path}/{mt5_setting.bot_name}/{formatted_date}.jsonl.gz")
+            mt5 = recording_mt5 = RecordingMt5(mt5, self.recorder)
+        self.mt5_proxy = Mt5Proxy(
+            InstrumentedMt5(mt5, self.metrics), self.logger, self.metrics,
+            call_budget_per_cycle=mt5_setting.mt5_call_budget_per_cycle)
+        mt5 = self.mt5_proxy
         self.mt5_handler = Mt5Handler(mt5, self.logger, mt5_setting)
         self.mt5_setting = mt5_setting
         self.logger.info(mt5.last_error())
         self.mt5_handler.get_ea_login()
-        self.bot_info = (
-            f"{self.mt5_handler.get_ea_login()}"
-            f"(copy:{mt5_setting.master_traders} with copied_volume_coefficient {mt5_setting.copied_volume_coefficient})"
-        )
+        self.bot_info = self.build_bot_info()
         self.bot_name = mt5_setting.bot_name
+        self.heartbeat = heartbeat
+        self.control_queue = control_queue
         self.bot_config = bot_config
-        self.mt5_handler.get_server_time()
-
-    def calculate_price_differences_in_pips(self, signal):
-
-        mt5_order_type_code = self.mt5_handler.mt5.ORDER_TYPE_BUY if signal.type == TradeType.BUY \
-            else self.mt5_handler.mt5.ORDER_TYPE_SELL
-
-        current_price = self.mt5_handler.get_market_price_by_order_type_symbol(
-            mt5_order_type_code, signal.symbol)
-        price_difference = abs(current_price - signal.price_order)
-        if 'JPY' in signal.symbol:
-            price_difference_in_pips = 100 * price_difference
-        else:
-            price_difference_in_pips = 10_000 * price_difference
-        signal.price_diff = price_difference_in_pips
-
-        return price_difference_in_pips, current_price, signal.price_order
-
-    def calculate_time_diff_between_signal_order_date_and_now(self, signal):
-        server_time = datetime.datetime.fromtimestamp(self.mt5_handler.get_server_time(
-        ), datetime.timezone.utc) if self.mt5_handler.get_server_time() else None
-
-        current_time = server_time or datetime.datetime.now(
-            datetime.timezone.utc)
-        signal_time = dateutil.parser.parse(signal.time)
-        time_difference = current_time - signal_time
-        signal.time_diff = time_difference
-        return time_difference, current_time, signal_time
-
-    def validate_signal_order_date_for_copied(self, signal: TradeSignal):
-        time_difference, current_time, signal_time = self.calculate_time_diff_between_signal_order_date_and_now(
-            signal)
-        max_allowed_order_age_to_copy_in_minutes = self.mt5_setting.max_allowed_order_age_to_copy_in_minutes
-        is_time_valid_to_copy = time_difference <= datetime.timedelta(
-            minutes=max_allowed_order_age_to_copy_in_minutes)
-        if not is_time_valid_to_copy:
-            self.logger.error(
-                f'\n\tTime is not valid as:\n \t\t\t'
-                f'time_difference={str(time_difference)} ({time_difference.total_seconds() / 60} minutes),current_time={str(current_time)},signal_time={signal_time},{max_allowed_order_age_to_copy_in_minutes=}')
-
-        return is_time_valid_to_copy
-
-    def validate_price_for_copied(self, signal: TradeSignal):
-        price_difference_in_pips, current_price, signal_price = self.calculate_price_differences_in_pips(
-            signal)
-        max_allowed_price_difference_in_pips = self.mt5_setting.max_allowed_price_difference_in_pips
-        is_price_valid_to_copy = price_difference_in_pips <= max_allowed_price_difference_in_pips
-        if not is_price_valid_to_copy:
-            self.logger.error(
-                f'\n\tPrice is not valid as:\n \t\t\t'
-                f'{price_difference_in_pips=},{current_price=},{signal_price=},{max_allowed_price_difference_in_pips=}')
-        return is_price_valid_to_copy
-
-    def valid_signal_for_copied(self, signal: TradeSignal):
-        return self.validate_price_for_copied(signal) and self.validate_signal_order_date_for_copied(signal)
+        self.master_traders_by_source = {}
+        self.signal_decoder = SignalDecoder(self.mt5_handler, self.logger)
+        self.signal_validator = SignalValidator(
+            self.mt5_handler, mt5_setting.max_allowed_price_difference_in_pips,
+            mt5_setting.max_allowed_order_age_to_copy_in_minutes)
+        self.account_snapshot = None
+        self.has_pending_signals = False
+        state_folder_path = f"{bot_config.state_folder_path or bot_config.log_folder_path}/{mt5_setting.bot_name}"
+        self.magic_codec = MagicNumberCodec(
+            self.logger, f"{state_folder_path}/magic_numbers.json",
+            bot_config.separator_number_string, self.get_followed_master_trader_ids(),
+            is_legacy_supported=bot_config.is_legacy_magic_number_supported,
+        )
+        self.state_journal = StateJournal(
+            f"{state_folder_path}/state.sqlite3", self.logger, bot_config.state_journal_retention_in_days)
+        # The journal holds every close before its deal watermark, so only the later history is checked
+        self.mt5_handler.deal_index.resume_from_time = self.state_journal.get_deal_watermark()
+        self.change_detector = ReconciliationChangeDetector(
+            bot_config.full_resync_interval_in_seconds)
+        self.execution_queue = ExecutionQueue(
+            self.logger, self.mt5_handler.is_successful_result, bot_config.execution_deadline_in_seconds,
+            self.metrics)
+        self.pending_fetches = {}
+        self.fetch_worker_count = max(len(mt5_setting.master_traders), 1)
+        self.fetch_executor = ThreadPoolExecutor(
+            max_workers=self.fetch_worker_count, thread_name_prefix="signal_fetch")
+        self.is_signal_payload_modified = {}
+        self.controller_client = ControllerClient(
+            bot_config.base_controller_url, self.logger,
+            connect_timeout_in_seconds=bot_config.controller_connect_timeout_in_seconds,
+            read_timeout_in_seconds=bot_config.controller_read_timeout_in_seconds,
+            max_retries=bot_config.controller_max_retries,
+        )
+        self.signal_receiver = SharedSignalReceiver(
+            signal_queue, bot_config.max_poll_interval_in_seconds) if signal_queue else None
+        self.signal_transport = self.signal_receiver or build_signal_transport(
+            bot_config, [source for source, master_trader_ids in mt5_setting.master_traders.items() if master_trader_ids],
+            self.controller_client, self.logger)
+        if self.recorder:
+            self.execution_queue.on_executed = self.recorder.record_decision
+            self.recorder.write_header(
+                dataclasses.asdict(bot_config), dataclasses.asdict(mt5_setting),
+                recording_mt5.get_constants(), self.magic_codec.get_table(),
+                self.state_journal.get_entries())
+
+    def build_bot_info(self):
+        return (
+            f"{self.mt5_handler.ea_login}"
+            f"(copy:{self.mt5_setting.master_traders} with copied_volume_coefficient {self.mt5_setting.copied_volume_coefficient})"
+        )
 
-    def get_master_trader_data_from_api(self, source_id, master_ids) -> list[MasterTrader]:
-        master_ids_str = ','.join(map(str, master_ids))
-        headers = {"Content-Type": "application/json"}
-        url = f"{self.bot_config.base_controller_url}/master_traders/?source={source_id}&external_trader_ids={master_ids_str}"
-        self.logger.info(f"Calling api {url} to get info")
+    def apply_mt5_setting(self, mt5_setting: Mt5Setting):
+        """Apply a reloaded setting of this terminal between two cycles."""
+        self.logger.info(f"Apply reloaded setting {mt5_setting}")
+        if self.recorder:
+            self.recorder.record_setting(dataclasses.asdict(mt5_setting))
+        self.mt5_setting = mt5_setting
+        self.mt5_handler.apply_mt5_setting(mt5_setting)
+        self.mt5_proxy.call_budget_per_cycle = mt5_setting.mt5_call_budget_per_cycle
+        self.signal_validator.max_price_difference_in_pips = mt5_setting.max_allowed_price_difference_in_pips
+        self.signal_validator.max_order_age_in_seconds = mt5_setting.max_allowed_order_age_to_copy_in_minutes * 60
+        self.magic_codec.set_master_trader_ids(
+            self.get_followed_master_trader_ids())
+
+        if len(mt5_setting.master_traders) > self.fetch_worker_count:
+            self.fetch_executor.shutdown(wait=False)
+            self.fetch_worker_count = len(mt5_setting.master_traders)
+            self.fetch_executor = ThreadPoolExecutor(
+                max_workers=self.fetch_worker_count, thread_name_prefix="signal_fetch")
+        if isinstance(self.signal_transport, LongPollingTransport):
+            self.signal_transport.sources = [
+                source for source, master_trader_ids in mt5_setting.master_traders.items() if master_trader_ids]
+
+        # Decoded signals and settled states depend on the symbol postfix and the thresholds
+        self.signal_decoder.invalidate()
+        self.master_traders_by_source.clear()
+        self.change_detector.invalidate()
+        self.bot_info = self.build_bot_info()
+
+    def apply_control_messages(self):
+        while self.control_queue is not None:
+            try:
+                mt5_setting = self.control_queue.get_nowait()
+            except queue.Empty:
+                return
+            self.apply_mt5_setting(mt5_setting)
+
+    def fetch_master_trader_payload(self, source_id, master_ids):
+        with self.metrics.time("stage_duration_ms", stage="fetch", source=source_id):
+            if self.signal_receiver:
+                return self.signal_receiver.get(source_id)
+
+            params = {"source": source_id,
+                      "external_trader_ids": ','.join(map(str, master_ids))}
+            self.logger.info(
+                f"Calling api /master_traders/ with {params} to get info")
+            return self.controller_client.get("/master_traders/", params=params)
 
-        resp = requests.get(url=url, headers=headers)
-        master_traders = []
+    def decode_master_trader_payload(self, source_id, resp) -> list[MasterTrader]:
+        self.is_signal_payload_modified[source_id] = resp.is_modified
 
         if resp.status_code in [requests.codes.created, requests.codes.ok]:
-            for master_trader_from_api in resp.json():
-                master_trader = MasterTrader(
-                    source=master_trader_from_api['source'], external_trader_id=master_trader_from_api['external_trader_id'], signals=[])
-
-                for signal in master_trader_from_api["signals"]:
-                    signal['symbol'] = self.mt5_handler.convert_to_broker_symbol_format(
-                        signal['symbol'])
-                    try:
-                        self.mt5_handler.enable_symbol(signal['symbol'])
-                    except Exception as e:
-                        self.logger.debug(
-                            f"Signal {master_trader.external_trader_id}:{signal['external_signal_id']} will be IGNORED as we cannot enable this symbol as {e}"
-                        )
-                        master_trader.invalid_symbol_signal_count += 1
-                        continue
-                    master_trader.signals.append(TradeSignal(**signal))
-
-                master_traders.append(master_trader)
-
-            return master_traders
+            if resp.is_modified or source_id not in self.master_traders_by_source:
+                with self.metrics.time("stage_duration_ms", stage="decode", source=source_id):
+                    self.master_traders_by_source[source_id] = self.signal_decoder.decode(
+                        source_id, resp.payload or [])
+            return self.master_traders_by_source[source_id]
+
         raise Exception(
-            f"[Error] Cannot get data from server: {url}"
+            f"[Error] Cannot get data of source {source_id} from server: {self.bot_config.base_controller_url}"
             f" Status code {resp.status_code}"
         )
 
+    def is_opening_allowed(self, source_id, resp):
+        """Return False when ``resp`` was relayed by the shared signal fetcher too long after it was fetched."""
+        if resp.fetched_at is None:
+            return True
+        age_in_seconds = time.time() - resp.fetched_at
+        if age_in_seconds <= self.bot_config.max_shared_signal_age_in_seconds:
+            return True
+        self.logger.error(
+            f"No signal of source {source_id} will be opened as its data was fetched {age_in_seconds:.0f}s ago, "
+            f"over {self.bot_config.max_shared_signal_age_in_seconds}s")
+        return False
+
+    def get_master_trader_data_from_api(self, source_id, master_ids) -> list[MasterTrader]:
+        return self.decode_master_trader_payload(
+            source_id, self.fetch_master_trader_payload(source_id, master_ids))
+
+    def iterate_master_trader_payloads(self, master_traders):
+        """Yield ``(source, response)`` as soon as each source has answered.
+
+        Sources are fetched concurrently. A source failing or exceeding
+        ``source_fetch_timeout_in_seconds`` is logged and skipped for this cycle.
+        """
+        if self.signal_receiver:
+            for source, master_trader_ids in master_traders.items():
+                yield source, self.fetch_master_trader_payload(source, master_trader_ids)
+            return
+
+        futures = {}
+        for source, master_trader_ids in master_traders.items():
+            pending_future = self.pending_fetches.get(source)
+            if pending_future and not pending_future.done():
+                self.logger.error(
+                    f"Source {source} is skipped as its previous request is still running")
+                continue
+            future = self.fetch_executor.submit(
+                self.fetch_master_trader_payload, source, master_trader_ids)
+            self.pending_fetches[source] = future
+            futures[future] = source
+
+        deadline = time.monotonic() + self.bot_config.source_fetch_timeout_in_seconds
+        pending_futures = set(futures)
+        while pending_futures:
+            done_futures, pending_futures = wait(
+                pending_futures, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done_futures:
+                self.logger.error(
+                    f"Source(s) {[futures[future] for future in pending_futures]} did not answer "
+                    f"within {self.bot_config.source_fetch_timeout_in_seconds}s")
+                return
+
+            for future in done_futures:
+                source = futures[future]
+                try:
+                    resp = future.result()
+                except Exception as e:
+                    self.logger.error(
+                        f"Cannot get data of source {source} from server: {e}")
+                    continue
+                yield source, resp
+
     @staticmethod
     def is_up_to_date_stop_loss_take_profit(position, signal: TradeSignal):
         if position.sl == signal.stop_loss and position.tp == signal.take_profit:
@@ -132,46 +250,70 @@ class TradingFromSignal:
         if None not in [position.sl, signal.stop_loss, position.tp, signal.take_profit]:
             return round(position.sl, 5) == round(
                 signal.stop_loss, 5
-            ) and round(signal.tp, 5) == round(
+            ) and round(position.tp, 5) == round(
                 signal.take_profit, 5
             )
         return False
 
-    def process_signals_from_master_trader(self, master_trader_id: str, signals: list[TradeSignal]):
-        magic_number_prefix = (
-            f"{master_trader_id}{self.bot_config.separator_number_string}"
-        )
-        magic_numbers_from_signals = []
-
+    def take_account_snapshot(self):
+        self.account_snapshot = self.mt5_handler.take_account_snapshot(
+            self.magic_codec, self.get_followed_master_trader_ids())
+        return self.account_snapshot
+
+    def get_followed_master_trader_ids(self):
+        return [
+            str(master_trader_id)
+            for master_trader_ids in self.mt5_setting.master_traders.values()
+            for master_trader_id in master_trader_ids or []
+        ]
+
+    def process_signals_from_master_trader(self, master_trader_id: str, signals: list[TradeSignal],
+                                           is_opening_allowed=True) -> bool:
+        """Reconcile the copied positions of a master trader with its signals.
+
+        The resulting closes, SL/TP updates and opens are queued on
+        ``execution_queue``; opens only when ``is_opening_allowed``. Return
+        False when a signal is left pending and the master trader must be
+        reconciled again next cycle.
+        """
+        magic_numbers_from_signals = set()
         for signal in signals:
-            signal.magic_numbers = int(
-                f'{magic_number_prefix}{signal.external_signal_id}'
-            )
-            magic_numbers_from_signals.append(signal.magic_numbers)
-
-        open_copied_positions_dict = {
-            position.magic: position
-            for position in self.mt5_handler.get_current_open_position()
-            if str(position.magic).startswith(magic_number_prefix)
-        }
-
-        open_copied_position_to_be_closed_dict = {
-            magic_number: position
-            for magic_number, position in open_copied_positions_dict.items()
-            if magic_number not in magic_numbers_from_signals
-        }
-
-        closed_copied_deals_dict = {
-            deal.magic: deal
-            for deal in self.mt5_handler.get_history_deal_within_x_days(10)
-            if (
-                is_deal_created_by_bot_and_closed := str(deal.magic).startswith(
-                    magic_number_prefix
-                )
-                and not open_copied_positions_dict.get(deal.magic)
-            )
-        }
+            signal.magic_numbers = self.magic_codec.encode(
+                master_trader_id, signal.external_signal_id)
+            signal.legacy_magic_number = self.magic_codec.encode_legacy(
+                master_trader_id, signal.external_signal_id)
+            magic_numbers_from_signals.add(signal.magic_numbers)
+            if signal.legacy_magic_number:
+                magic_numbers_from_signals.add(signal.legacy_magic_number)
+
+        open_copied_positions_dict = self.account_snapshot.get_positions(
+            master_trader_id)
+
+        open_copied_position_to_be_closed_dict = {}
+        for magic_number, position in open_copied_positions_dict.items():
+            if magic_number in magic_numbers_from_signals:
+                continue
+            if magic_number in self.account_snapshot.ambiguous_magic_numbers:
+                self.logger.warning(
+                    f"The position {position.ticket} (magic number {magic_number}) will NOT be closed "
+                    f"as its legacy magic number matches several master traders")
+                continue
+            open_copied_position_to_be_closed_dict[magic_number] = position
 
+        closed_copied_deals_dict = {}
+        unconfirmed_copies_dict = {}
+        for signal in signals:
+            if open_copied_positions_dict.get(signal.magic_numbers) or open_copied_positions_dict.get(
+                    signal.legacy_magic_number):
+                continue
+            closed_deal, unconfirmed_copy = self.find_closed_copy(master_trader_id, signal)
+            if closed_deal:
+                closed_copied_deals_dict[signal.magic_numbers] = closed_deal
+            elif unconfirmed_copy:
+                unconfirmed_copies_dict[signal.magic_numbers] = unconfirmed_copy
+
+        is_settled = True
+        signals_to_open = []
         for signal in signals:
             signal_info = f"{master_trader_id}:{signal.external_signal_id}"
             signal_magic_number = signal.magic_numbers
@@ -180,7 +322,7 @@ class TradingFromSignal:
                 signal_magic_number
             )
             is_this_signal_created = open_copied_positions_dict.get(
-                signal_magic_number)
+                signal_magic_number) or open_copied_positions_dict.get(signal.legacy_magic_number)
 
             if is_this_signal_created_but_closed:
                 closed_deal = closed_copied_deals_dict.get(signal_magic_number)
@@ -191,119 +333,379 @@ class TradingFromSignal:
                 )
                 continue
 
+            elif unconfirmed_copy := unconfirmed_copies_dict.get(signal_magic_number):
+                position_id, copied_at = unconfirmed_copy
+                position_table = self.mt5_handler.position_table
+                if copied_at is not None and (
+                        position_table.fetched_at_time is None or position_table.fetched_at_time < copied_at):
+                    # The positions were not downloaded since the copy, check them again next cycle
+                    position_table.invalidate()
+                    is_settled = False
+                    continue
+                self.logger.warning(
+                    f"Signal {signal_info} will be IGNORED as its position {position_id} is not open "
+                    f"and has no closing deal in the history (magic number {signal_magic_number})")
+                continue
+
             elif is_this_signal_created:
                 # Check to need to update or ignore as exis already
-                exist_open_position = open_copied_positions_dict.get(
-                    signal_magic_number
-                )
+                exist_open_position = is_this_signal_created
                 is_up_to_date = self.is_up_to_date_stop_loss_take_profit(
                     exist_open_position, signal)
                 if is_up_to_date:
                     self.logger.debug(
-                        f"Signal {signal_info} will be IGNORED as it is created with same information with the ticket {exist_open_position.ticket}"
-                        f"(magic number {signal_magic_number})"
+                        "Signal %s will be IGNORED as it is created with same information with the ticket %s"
+                        "(magic number %s)", signal_info, exist_open_position.ticket, signal_magic_number
                     )
                     continue
 
                 self.logger.debug(
-                    f"Signal {signal_info} will UPDATE the position {exist_open_position.ticket}."
-                    f"(magic number {signal_magic_number})\n"
-                    f"New stop lost/take profit: {signal.stop_loss}/{signal.take_profit}\n"
-                    f"Old stop lost/take profit: {exist_open_position.sl}/{exist_open_position.tp}"
+                    "Signal %s will UPDATE the position %s.(magic number %s)\n"
+                    "New stop lost/take profit: %s/%s\nOld stop lost/take profit: %s/%s",
+                    signal_info, exist_open_position.ticket, signal_magic_number,
+                    signal.stop_loss, signal.take_profit, exist_open_position.sl, exist_open_position.tp
                 )
-                self.mt5_handler.update_trade(
-                    position_ticket=exist_open_position.ticket,
-                    symbol=signal.symbol,
-                    stop_loss=signal.stop_loss,
-                    take_profit=signal.take_profit,
-                    magic_number=signal_magic_number,
+                self.execution_queue.submit(
+                    OrderIntentTypeEnum.MODIFY, ("position", exist_open_position.ticket), master_trader_id,
+                    f"Update of position {exist_open_position.ticket} for signal {signal_info}",
+                    partial(
+                        self.mt5_handler.update_trade,
+                        position_ticket=exist_open_position.ticket,
+                        symbol=signal.symbol,
+                        stop_loss=signal.stop_loss,
+                        take_profit=signal.take_profit,
+                        magic_number=exist_open_position.magic,
+                    ),
                 )
-            elif not self.valid_signal_for_copied(signal):
-                self.logger.error(
-                    f"Signal {signal_info} will be IGNORE instead of Create as open time or price is not sutable with condition")
-
             else:
-                self.logger.debug(
-                    f"Signal {signal_info} will CREATE new trade with {signal.price_diff=} pips, signal.time_diff {str(signal.time_diff)}")
+                signals_to_open.append(signal)
+
+        if signals_to_open and not is_opening_allowed:
+            # The signals are opened from a fresh payload in a later cycle
+            is_settled = False
+            signals_to_open = []
+
+        if signals_to_open:
+            with self.metrics.time("stage_duration_ms", stage="validate"):
+                validation = self.signal_validator.validate(signals_to_open)
+            for signal, is_accepted, reason in zip(signals_to_open, validation.accepted, validation.reasons):
+                signal_info = f"{master_trader_id}:{signal.external_signal_id}"
+                if reason == SignalRejectReasonEnum.TOO_OLD.value:
+                    self.logger.error(
+                        f"Signal {signal_info} will be IGNORE instead of Create as open time is not sutable with condition "
+                        f"(time_diff {str(signal.time_diff)}, max {self.mt5_setting.max_allowed_order_age_to_copy_in_minutes} minutes)")
+                    continue
+                if not is_accepted:
+                    # The price can come back within the limit, so the signal stays pending
+                    is_settled = False
+                    self.logger.error(
+                        f"Signal {signal_info} will be IGNORE instead of Create as price is not sutable with condition "
+                        f"({SignalRejectReasonEnum(reason).name}, {signal.price_diff=} pips, "
+                        f"max {self.mt5_setting.max_allowed_price_difference_in_pips} pips)")
+                    continue
 
+                self.logger.debug(
+                    "Signal %s will CREATE new trade with signal.price_diff=%s pips, signal.time_diff %s",
+                    signal_info, signal.price_diff, signal.time_diff)
                 order_type = (
-                    mt5.ORDER_TYPE_BUY
-                    if signal.type == "BUY"
-                    else mt5.ORDER_TYPE_SELL
+                    self.mt5_handler.mt5.ORDER_TYPE_BUY
+                    if signal.type == TradeType.BUY.value
+                    else self.mt5_handler.mt5.ORDER_TYPE_SELL
                 )
 
-                self.mt5_handler.open_trade(
-                    symbol=signal.symbol,
-                    order_type=order_type,
-                    volume=signal.size,
-                    stop_loss=signal.stop_loss,
-                    take_profit=signal.take_profit,
-                    magic_number=signal_magic_number,
+                self.execution_queue.submit(
+                    OrderIntentTypeEnum.OPEN, ("magic", signal.magic_numbers), master_trader_id,
+                    f"Open for signal {signal_info}",
+                    partial(
+                        self.open_trade_for_signal,
+                        master_trader_id,
+                        signal.external_signal_id,
+                        symbol=signal.symbol,
+                        order_type=order_type,
+                        volume=signal.size,
+                        stop_loss=signal.stop_loss,
+                        take_profit=signal.take_profit,
+                        magic_number=signal.magic_numbers,
+                    ),
                 )
 
         for _, position in open_copied_position_to_be_closed_dict.items():
             self.logger.info(
                 f"The position created by old Signal {position.magic} will be closed"
             )
-            self.mt5_handler.close_trade_by_position(position)
+            self.execution_queue.submit(
+                OrderIntentTypeEnum.CLOSE, ("position", position.ticket), master_trader_id,
+                f"Close of position {position.ticket} (magic number {position.magic})",
+                partial(self.close_trade_by_position, master_trader_id, position),
+            )
 
-    def run(self):
+        return is_settled
+
+    def find_closed_copy(self, master_trader_id, signal: TradeSignal):
+        """Return ``(closed_deal, unconfirmed_copy)`` of a signal that has no open position.
+
+        ``closed_deal`` is the closing deal or the closed journal entry of its
+        copy. A copy only counts as closed once a closing deal of its position
+        was seen. Otherwise ``unconfirmed_copy`` is ``(position_id, copied_at)``
+        of a copy whose position is missing, or None when the signal was never
+        copied.
+        """
+        deal_index = self.mt5_handler.deal_index
+        copies = []
+        for magic_number in (signal.magic_numbers, signal.legacy_magic_number):
+            if not magic_number:
+                continue
+            entry = self.state_journal.get(magic_number)
+            if entry is not None:
+                if entry.state == SignalLifecycleStateEnum.CLOSED.value:
+                    return entry, None
+                copies.append((magic_number, entry.position_id, entry.time))
+            deal = deal_index.get_deal_by_magic(magic_number)
+            if deal is not None:
+                copies.append((magic_number, deal.position_id, None))
+
+        for magic_number, position_id, _ in copies:
+            closing_deal = deal_index.get_closing_deal(position_id)
+            if closing_deal:
+                self.state_journal.record_closed(
+                    magic_number, master_trader_id, signal.external_signal_id, closing_deal.ticket,
+                    closing_deal.position_id, closing_deal.time)
+                return closing_deal, None
+        if not copies:
+            return None, None
+        _, position_id, copied_at = max(copies, key=lambda copy: copy[2] or 0)
+        return None, (position_id, copied_at)
+
+    def journal_closing_deals(self):
+        """Record the copies closed by the deals of the last deal history refresh."""
+        deal_index = self.mt5_handler.deal_index
+        if deal_index.is_reloaded:
+            closing_deals = deal_index.closing_deals
+        else:
+            closing_deals = [deal for deal in deal_index.new_deals if deal_index.is_closing_deal(deal)]
+
+        # A partial close leaves the position open
+        open_position_ids = {position.identifier for position in self.account_snapshot.positions}
+        for deal in closing_deals:
+            if deal.position_id in open_position_ids:
+                continue
+            entry = self.state_journal.get_by_position_id(deal.position_id)
+            if entry is not None:
+                magic_number = entry.magic_number
+            else:
+                # A position closed by hand gets a closing deal without magic number
+                opening_deal = deal_index.get_opening_deal(deal.position_id)
+                magic_number = deal.magic or (opening_deal.magic if opening_deal else 0)
+            master_trader_ids = self.magic_codec.get_master_trader_ids(magic_number)
+            if entry is None and not master_trader_ids:
+                continue
+            decoded = self.magic_codec.decode(magic_number)
+            self.state_journal.record_closed(
+                magic_number, master_trader_ids[0] if len(master_trader_ids) == 1 else None,
+                decoded[1] if decoded else None, deal.ticket, deal.position_id, deal.time)
+        self.state_journal.set_deal_watermark(deal_index.watermark[0])
+
+    def open_trade_for_signal(self, master_trader_id, external_signal_id, **kwargs):
+        result = self.mt5_handler.open_trade(**kwargs)
+        if self.mt5_handler.is_successful_result(result):
+            self.state_journal.record_open(
+                kwargs["magic_number"], str(master_trader_id), external_signal_id, result.order)
+        return result
+
+    def close_trade_by_position(self, master_trader_id, position):
+        result = self.mt5_handler.close_trade_by_position(position)
+        # The closing deal of the whole volume confirms the close
+        if self.mt5_handler.is_successful_result(result) and result.deal and result.volume >= position.volume:
+            decoded = self.magic_codec.decode(position.magic)
+            self.state_journal.record_closed(
+                position.magic, str(master_trader_id), decoded[1] if decoded else None,
+                result.deal, position.ticket, time.time())
+        return result
+
+    def prune_magic_numbers(self):
+        """Forget the hashed IDs of signals with neither an open position nor a journal entry."""
+        self.magic_codec.prune(
+            {position.magic for position in self.mt5_handler.position_table.positions}
+            | self.state_journal.get_magic_numbers())
+        self.magic_codec.save_table()
+
+    def export_metrics(self, force=False):
+        if not force and time.monotonic() - self.metrics_exported_at < self.bot_config.metrics_export_interval_in_seconds:
+            return
+        self.metrics_exported_at = time.monotonic()
+        try:
+            self.metrics.export(self.metrics_file_path)
+        except Exception as e:
+            self.logger.error(f"Cannot export metrics to {self.metrics_file_path} as {e}")
+
+    def run_cycle(self):
         master_traders = self.mt5_setting.master_traders
+        self.logger.info("-------------START---------------")
+        cycle_started_at = time.perf_counter()
+        if self.recorder:
+            self.recorder.begin_cycle(self.mt5_handler.server_clock.offset_in_seconds)
+        self.mt5_proxy.begin_cycle()
+        with self.metrics.time("stage_duration_ms", stage="deal_refresh"):
+            self.mt5_handler.begin_cycle()
+        with self.metrics.time("stage_duration_ms", stage="account_snapshot"):
+            self.take_account_snapshot()
+        self.journal_closing_deals()
+        self.execution_queue.begin_cycle()
+        has_changes = False
+        self.has_pending_signals = False
+        self.logger.info(f"Bot info {self.bot_info}")
+        followed_master_traders = {
+            source: master_trader_ids for source, master_trader_ids in master_traders.items() if master_trader_ids}
+        for source, resp in self.iterate_master_trader_payloads(followed_master_traders):
+            if self.recorder:
+                self.recorder.record_response(source, resp)
+            try:
+                master_trader_data_from_api = self.decode_master_trader_payload(
+                    source, resp)
+            except Exception as e:
+                self.logger.error(e)
+                continue
+            has_changes = has_changes or self.is_signal_payload_modified[source]
+            is_opening_allowed = self.is_opening_allowed(source, resp)
+            settled_master_traders = {}
+
+            for master_trader in master_trader_data_from_api:
+                master_signals = master_trader.signals
+                if master_trader.invalid_symbol_signal_count:
+                    self.logger.error(
+                        f"\n[{source}:{master_trader.external_trader_id}] Have  {master_trader.invalid_symbol_signal_count} invalid symbol signal(s)\n"
+                    )
+
+                self.logger.debug(
+                    "\n[%s:%s] Get %s valid symbol signal(s):\n%s\n",
+                    source, master_trader.external_trader_id, len(master_signals), master_signals
+                )
+
+                signal_fingerprint = self.change_detector.fingerprint(
+                    master_trader.external_trader_id, master_signals)
+                account_state = self.account_snapshot.get_state(
+                    master_trader.external_trader_id)
+                if not self.change_detector.should_reconcile(
+                        master_trader.external_trader_id, signal_fingerprint, account_state):
+                    self.logger.debug(
+                        "[%s:%s] is SKIPPED as nothing changed", source, master_trader.external_trader_id)
+                    self.metrics.increment(
+                        "reconciliations_total", result="skipped")
+                    continue
+
+                with self.metrics.time("stage_duration_ms", stage="reconcile"):
+                    is_settled = self.process_signals_from_master_trader(
+                        master_trader.external_trader_id, master_signals, is_opening_allowed
+                    )
+                self.metrics.increment(
+                    "reconciliations_total", result="processed")
+                if is_settled:
+                    settled_master_traders[master_trader.external_trader_id] = (
+                        signal_fingerprint, account_state)
+                else:
+                    self.has_pending_signals = True
+                    self.change_detector.invalidate(
+                        master_trader.external_trader_id)
+
+            # Hashed IDs of new signals are stored before their magic numbers reach the terminal
+            self.magic_codec.save_table()
+            with self.metrics.time("stage_duration_ms", stage="execute"):
+                unsettled_master_trader_ids = self.execution_queue.execute()
+            for master_trader_id, (signal_fingerprint, account_state) in settled_master_traders.items():
+                if master_trader_id in unsettled_master_trader_ids:
+                    self.has_pending_signals = True
+                    self.change_detector.invalidate(master_trader_id)
+                else:
+                    self.change_detector.mark_settled(
+                        master_trader_id, signal_fingerprint, account_state)
+
+        if self.mt5_handler.deal_index.is_reloaded:
+            self.prune_magic_numbers()
+
+        if self.logger.is_debug_enabled:
+            self.logger.debug(
+                "\nDetail bot info:\n%s", self.mt5_handler.get_bot_info())
+        self.logger.info("--------------END----------------")
+        self.metrics.observe("cycle_duration_ms",
+                             (time.perf_counter() - cycle_started_at) * 1000)
+        self.export_metrics()
+        if self.recorder:
+            self.recorder.flush()
+        return has_changes
+
+    def run(self):
         exception = None
+        failure_count = 0
         try:
             while True:
-                self.logger.info("-------------START---------------")
-                self.logger.info(f"Bot info {self.bot_info}")
-                for source, master_trader_ids in master_traders.items():
-                    if not master_trader_ids:
-                        self.logger.debug(
-                            f"Source {source} has no master trader id")
-                        continue
-
-                    master_trader_data_from_api = self.get_master_trader_data_from_api(
-                        source, master_trader_ids)
-
-                    for master_trader in master_trader_data_from_api:
-                        master_signals = master_trader.signals
-                        if master_trader.invalid_symbol_signal_count:
-                            self.logger.error(
-                                f"\n[{source}:{master_trader.external_trader_id}] Have  {master_trader.invalid_symbol_signal_count} invalid symbol signal(s)\n"
-                            )
-
-                        self.logger.debug(
-                            f"\n[{source}:{master_trader.external_trader_id}] Get {len(master_signals)} valid symbol signal(s):\n{master_signals}\n"
-                        )
-
-                        self.process_signals_from_master_trader(
-                            master_trader.external_trader_id, master_signals
-                        )
-
-                self.logger.debug(
-                    f"\nDetail bot info:\n{self.mt5_handler.get_bot_info()}")
-                self.logger.info("--------------END----------------")
+                cycle_started_at = time.perf_counter()
+                try:
+                    self.apply_control_messages()
+                    has_changes = self.run_cycle()
+                except Exception as e:
+                    failure_count += 1
+                    self.mt5_proxy.invalidate()
+                    self.mt5_handler.position_table.invalidate()
+                    if failure_count > self.bot_config.max_cycle_retries or not self.mt5_handler.is_terminal_alive():
+                        raise
+                    backoff = min(2 ** (failure_count - 1), self.MAX_CYCLE_RETRY_BACKOFF_IN_SECONDS)
+                    self.logger.error(
+                        f"Cycle failed as {e}. The terminal is still up, "
+                        f"retry {failure_count}/{self.bot_config.max_cycle_retries} in {backoff}s")
+                    time.sleep(backoff)
+                    continue
 
-                time.sleep(1)
+                failure_count = 0
+                if self.heartbeat:
+                    self.heartbeat.beat((time.perf_counter() - cycle_started_at) * 1000)
+                self.signal_transport.wait_for_next_cycle(has_changes, self.has_pending_signals)
         except Exception as e:
             exception = e
             self.logger.error(e)
         finally:
-            self.logger.info(
-                f"Bot info {self.bot_info} is going to shutdown with exception {exception}")
-            self.logger.info("--------------SHUTDOWN MT5---------------")
-            self.mt5_handler.shutdown()
+            self.shutdown(exception)
+
+    def shutdown(self, exception=None):
+        self.logger.info(
+            f"Bot info {self.bot_info} is going to shutdown with exception {exception}")
+        self.logger.info("--------------SHUTDOWN MT5---------------")
+        self.export_metrics(force=True)
+        self.fetch_executor.shutdown(wait=False, cancel_futures=True)
+        self.controller_client.close()
+        self.mt5_handler.shutdown()
+        self.magic_codec.save_table()
+        self.state_journal.close()
+        if self.recorder:
+            self.recorder.close()
+        self.logger.close()
+
+
+def get_metrics_folder_path(bot_config: BotConfig):
+    return bot_config.metrics_folder_path or f"{bot_config.log_folder_path}/metrics"
+
+
+def worker(mt5_setting: Mt5Setting, bot_config: BotConfig, signal_queue=None, heartbeat: WorkerHeartbeat = None,
+           control_queue=None):
+    bot = TradingFromSignal(mt5_setting, bot_config,
+                            signal_queue=signal_queue, heartbeat=heartbeat, control_queue=control_queue)
+    bot.run()
 
 
-def worker(mt5_setting: Mt5Setting, bot_config: BotConfig):
-    bot = TradingFromSignal(mt5_setting, bot_config)
-    bot.run()
+# Settings that need the terminal to be initialized again when they change
+TERMINAL_IDENTITY_FIELDS = ("login_id", "server", "password", "setup_path")
 
 
 def validate_mt5_settings(mt5_settings: list[Mt5Setting]):
     setup_paths = []
     accounts = []
+    bot_names = []
     for mt5_setting in mt5_settings:
         account = f'{mt5_setting.server}|{mt5_setting.login_id}'
 
+        if mt5_setting.bot_name in bot_names:
+            raise Exception(
+                f'The bot name {mt5_setting.bot_name} is already used')
+
         if mt5_setting.setup_path in setup_paths:
             raise Exception(
                 f'The setup {mt5_setting.setup_path} is already used')
@@ -314,30 +716,138 @@ def validate_mt5_settings(mt5_settings: list[Mt5Setting]):
 
         setup_paths.append(mt5_setting.setup_path)
         accounts.append(account)
+        bot_names.append(mt5_setting.bot_name)
 
 
-def bot_runner():
+def load_config(config_path):
     try:
-        with open("./terminal_login.json") as content:
+        with open(config_path) as content:
             config = json.load(content)
     except Exception as e:
         raise Exception(
-            f'Cannot parse terminal_login.json. Check it again {e}')
+            f'Cannot parse {config_path}. Check it again {e}')
 
     bot_config = from_dict(data_class=BotConfig, data=config)
-    terminals = config["terminals"]
-    procs = []
-    mt5_settings = [Mt5Setting(**terminal) for terminal in terminals]
+    mt5_settings = [Mt5Setting(**terminal) for terminal in config["terminals"]]
     validate_mt5_settings(mt5_settings)
+    return bot_config, mt5_settings
+
+
+def bot_runner(config_path="./terminal_login.json"):
+    bot_config, mt5_settings = load_config(config_path)
+
+    formatted_date = datetime.datetime.now().strftime("%Y-%m-%d_%H_%M_%S")
+    logger = Logger(
+        logger_name="supervisor", log_file_path=f"{bot_config.log_folder_path}/supervisor/{formatted_date}.log",
+        message_prefix="supervisor", log_level=bot_config.log_level, log_format=bot_config.log_format,
+    ).get_logger()
+
+    metrics_folder_path = get_metrics_folder_path(bot_config)
+    metrics_aggregated_at = time.monotonic()
+    config_watcher = ConfigWatcher(config_path, load_config, logger)
+    mt5_settings_by_bot_name = {
+        mt5_setting.bot_name: mt5_setting for mt5_setting in mt5_settings}
+    control_queues = {}
+    signal_queues = {}
+    fetcher = None
+
+    def aggregate_metrics():
+        nonlocal metrics_aggregated_at
+        if time.monotonic() - metrics_aggregated_at < bot_config.metrics_export_interval_in_seconds:
+            return
+        metrics_aggregated_at = time.monotonic()
+        try:
+            aggregate_metric_files(
+                f"{metrics_folder_path}/terminals", f"{metrics_folder_path}/metrics.prom")
+        except OSError:
+            # No terminal exported its metrics yet
+            pass
+
+    def send_to_fetcher(message):
+        # Also kept by the supervisor's copy, which is used if the fetcher process restarts
+        fetcher.apply_control_message(message)
+        fetcher.control_queue.put(message)
+
+    def on_worker_start(bot_name):
+        control_queues[bot_name] = Queue()
+        if fetcher:
+            signal_queues[bot_name] = manager.Queue()
+            send_to_fetcher(
+                (SharedSignalFetcher.WORKER_QUEUE, bot_name, signal_queues[bot_name]))
+
+    def get_worker_args(bot_name, heartbeat):
+        return (mt5_settings_by_bot_name[bot_name], bot_config, signal_queues.get(bot_name), heartbeat,
+                control_queues[bot_name])
+
+    def add_worker(bot_name):
+        heartbeat = WorkerHeartbeat()
+        on_worker_start(bot_name)
+        supervisor.add(
+            bot_name, worker, partial(get_worker_args, bot_name, heartbeat), heartbeat=heartbeat,
+            on_restart=partial(on_worker_start, bot_name))
+
+    def reload_config():
+        new_config = config_watcher.poll()
+        if new_config is None:
+            return
+
+        new_bot_config, new_mt5_settings = new_config
+        if new_bot_config != bot_config:
+            logger.warning(
+                "Only the terminals of the reloaded config are applied. Restart the bot to apply the other settings")
+        new_mt5_settings_by_bot_name = {
+            mt5_setting.bot_name: mt5_setting for mt5_setting in new_mt5_settings}
+
+        for bot_name in list(mt5_settings_by_bot_name):
+            if bot_name not in new_mt5_settings_by_bot_name:
+                logger.info(f"Stop {bot_name} as it was removed from the config")
+                supervisor.remove(bot_name)
+                del mt5_settings_by_bot_name[bot_name]
+                control_queues.pop(bot_name, None)
+                signal_queues.pop(bot_name, None)
+                if os.path.exists(f"{metrics_folder_path}/terminals/{bot_name}.prom"):
+                    os.remove(f"{metrics_folder_path}/terminals/{bot_name}.prom")
+
+        if fetcher:
+            send_to_fetcher(
+                (SharedSignalFetcher.MT5_SETTINGS, new_mt5_settings))
+
+        for bot_name, new_mt5_setting in new_mt5_settings_by_bot_name.items():
+            mt5_setting = mt5_settings_by_bot_name.get(bot_name)
+            mt5_settings_by_bot_name[bot_name] = new_mt5_setting
+            if mt5_setting is None:
+                logger.info(f"Start {bot_name} as it was added to the config")
+                add_worker(bot_name)
+            elif any(getattr(mt5_setting, field_name) != getattr(new_mt5_setting, field_name)
+                     for field_name in TERMINAL_IDENTITY_FIELDS):
+                logger.info(f"Restart {bot_name} as its terminal or account changed")
+                supervisor.restart(bot_name)
+            elif mt5_setting != new_mt5_setting:
+                logger.info(f"Send the reloaded setting to {bot_name}")
+                control_queues[bot_name].put(new_mt5_setting)
+
+    def on_check():
+        reload_config()
+        aggregate_metrics()
+
+    supervisor = WorkerSupervisor(
+        logger, bot_config.worker_heartbeat_timeout_in_seconds,
+        bot_config.worker_restart_min_backoff_in_seconds, bot_config.worker_restart_max_backoff_in_seconds,
+        on_check=on_check)
+
+    if bot_config.shared_signal_fetcher:
+        # Manager queues stay usable when a worker is killed while waiting on one,
+        # and can be handed to the running fetcher when a worker restarts
+        manager = Manager()
+        fetcher = SharedSignalFetcher(
+            bot_config, mt5_settings, signal_queues, manager.Queue())
+        supervisor.add("shared_signal_fetcher",
+                       fetcher.run, tuple, daemon=True)
 
     for mt5_setting in mt5_settings:
-        proc = Process(target=worker, args=(mt5_setting, bot_config))
-        procs.append(proc)
-        proc.start()
-
-    for proc in procs:
-        proc.join()
+        add_worker(mt5_setting.bot_name)
 
+    supervisor.run()
 
 if __name__ == "__main__":
     bot_runner()
@@ -0,0 +1,52 @@
+class AccountSnapshot:
+    """Open positions and new deals of one cycle, partitioned by master trader.
+
+    Positions and deals are matched to master traders by decoding their magic
+    number in a single pass, so every master trader reads the same view of the
+    account. ``deal_versions`` persists across cycles and counts, per master
+    trader, the refreshes that brought new deals for it.
+    """
+
+    def __init__(self, positions, new_deals, is_deal_history_reloaded, magic_codec, master_trader_ids,
+                 deal_versions):
+        self.positions = positions
+        self.deal_versions = deal_versions
+
+        self.positions_by_master_trader = {
+            str(master_trader_id): {} for master_trader_id in master_trader_ids}
+        # Legacy magic numbers whose prefix matches several master traders
+        self.ambiguous_magic_numbers = set()
+        for position in positions:
+            position_master_trader_ids = magic_codec.get_master_trader_ids(
+                position.magic)
+            if len(position_master_trader_ids) > 1:
+                self.ambiguous_magic_numbers.add(position.magic)
+            for master_trader_id in position_master_trader_ids:
+                self.positions_by_master_trader[master_trader_id][position.magic] = position
+
+        if is_deal_history_reloaded:
+            updated_master_trader_ids = set(self.positions_by_master_trader)
+        else:
+            updated_master_trader_ids = {
+                master_trader_id
+                for deal in new_deals
+                for master_trader_id in magic_codec.get_master_trader_ids(deal.magic)
+            }
+        for master_trader_id in updated_master_trader_ids:
+            deal_versions[master_trader_id] = deal_versions.get(
+                master_trader_id, 0) + 1
+        self._position_fingerprints = {}
+
+    def get_positions(self, master_trader_id):
+        return self.positions_by_master_trader.get(str(master_trader_id), {})
+
+    def get_state(self, master_trader_id):
+        master_trader_id = str(master_trader_id)
+        position_fingerprint = self._position_fingerprints.get(master_trader_id)
+        if position_fingerprint is None:
+            position_fingerprint = hash(tuple(
+                (position.ticket, position.volume, position.sl, position.tp)
+                for position in self.get_positions(master_trader_id).values()
+            ))
+            self._position_fingerprints[master_trader_id] = position_fingerprint
+        return position_fingerprint, self.deal_versions.get(master_trader_id, 0)
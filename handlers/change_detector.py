@@ -0,0 +1,51 @@
+import time
+
+
+class ReconciliationChangeDetector:
+    """Decides whether a master trader needs to be reconciled this cycle.
+
+    A master trader is skipped when its signal set and the account state are
+    the same as when it was last reconciled without leftovers. Every master
+    trader is still reconciled once per ``full_resync_interval_in_seconds``.
+    """
+
+    def __init__(self, full_resync_interval_in_seconds):
+        self.full_resync_interval_in_seconds = full_resync_interval_in_seconds
+        self._settled_states = {}
+        self._signal_fingerprints = {}
+
+    def fingerprint(self, master_trader_id, signals):
+        cached_fingerprint = self._signal_fingerprints.get(master_trader_id)
+        if cached_fingerprint is not None and cached_fingerprint[0] is signals:
+            return cached_fingerprint[1]
+
+        signal_fingerprint = hash(tuple(
+            (signal.id, signal.external_signal_id, signal.symbol, signal.type, signal.size, signal.time,
+             signal.price_order, signal.stop_loss, signal.take_profit)
+            for signal in signals
+        ))
+        self._signal_fingerprints[master_trader_id] = (
+            signals, signal_fingerprint)
+        return signal_fingerprint
+
+    def should_reconcile(self, master_trader_id, signal_fingerprint, account_state):
+        settled_state = self._settled_states.get(master_trader_id)
+        if settled_state is None:
+            return True
+
+        settled_fingerprint, settled_account_state, settled_at = settled_state
+        return (
+            settled_fingerprint != signal_fingerprint
+            or settled_account_state != account_state
+            or time.monotonic() - settled_at >= self.full_resync_interval_in_seconds
+        )
+
+    def mark_settled(self, master_trader_id, signal_fingerprint, account_state):
+        self._settled_states[master_trader_id] = (
+            signal_fingerprint, account_state, time.monotonic())
+
+    def invalidate(self, master_trader_id=None):
+        if master_trader_id is None:
+            self._settled_states.clear()
+            return
+        self._settled_states.pop(master_trader_id, None)
@@ -1,18 +1,30 @@
 
 from abc import ABC
-from dataclasses import _MISSING_TYPE, dataclass, fields
+from dataclasses import MISSING, dataclass, fields
 from enum import Enum
 from typing import List, Optional
 
-from handlers.constant import Common
+from handlers.constant import Common, LogFormatEnum, Mt5BackendEnum, SignalTransportEnum
 
 
 class BaseDataClass(ABC):
+    __slots__ = ()
+    # Fields with a default, resolved once per class instead of on every construction
+    _field_defaults_by_class = {}
+
+    @classmethod
+    def get_field_defaults(cls):
+        field_defaults = BaseDataClass._field_defaults_by_class.get(cls)
+        if field_defaults is None:
+            field_defaults = tuple(
+                (field.name, field.default) for field in fields(cls) if field.default is not MISSING)
+            BaseDataClass._field_defaults_by_class[cls] = field_defaults
+        return field_defaults
+
     def __post_init__(self):
-        for field in fields(self):
-            value = getattr(self, field.name)
-            if field.default is not _MISSING_TYPE and value is None:
-                setattr(self, field.name, field.default)
+        for field_name, default in self.get_field_defaults():
+            if getattr(self, field_name) is None:
+                setattr(self, field_name, default)
 
 
 class TradeType(Enum):
@@ -20,15 +32,53 @@ class TradeType(Enum):
     SELL = "SELL"
 
 
+@dataclass
+class SimulatedMt5Setting(BaseDataClass):
+    default_latency_in_ms: float = 0.0
+    latency_in_ms: Optional[dict] = None
+    symbols: Optional[dict] = None
+    server_time_offset_in_seconds: int = 0
+    tick_interval_in_ms: int = 250
+    seed: int = 0
+
+
 @dataclass
 class BotConfig(BaseDataClass):
     base_controller_url: str
     log_folder_path: str
     log_level: str
+    log_format: str = LogFormatEnum.TEXT.value
+    log_max_file_size_in_mb: Optional[float] = 50
+    log_backup_count: int = 10
+    log_rotation_interval_in_hours: Optional[float] = None
     separator_number_string: str = Common.SEPRATOR_NUMBER_STRING
+    mt5_backend: str = Mt5BackendEnum.METATRADER5.value
+    simulated_mt5: Optional[SimulatedMt5Setting] = None
+    signal_transport: str = SignalTransportEnum.POLLING.value
+    min_poll_interval_in_seconds: float = 1.0
+    max_poll_interval_in_seconds: float = 2.0
+    long_poll_timeout_in_seconds: int = 25
+    controller_connect_timeout_in_seconds: float = 3.0
+    controller_read_timeout_in_seconds: float = 10.0
+    controller_max_retries: int = 2
+    shared_signal_fetcher: bool = False
+    source_fetch_timeout_in_seconds: float = 10.0
+    max_shared_signal_age_in_seconds: float = 30.0
+    full_resync_interval_in_seconds: int = 60
+    execution_deadline_in_seconds: float = 5.0
+    state_folder_path: Optional[str] = None
+    is_legacy_magic_number_supported: bool = True
+    state_journal_retention_in_days: int = 365
+    metrics_folder_path: Optional[str] = None
+    metrics_export_interval_in_seconds: float = 15.0
+    max_cycle_retries: int = 5
+    worker_heartbeat_timeout_in_seconds: float = 120.0
+    worker_restart_min_backoff_in_seconds: float = 5.0
+    worker_restart_max_backoff_in_seconds: float = 300.0
+    recording_folder_path: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class TradeSignal(BaseDataClass):
     id: int
     external_signal_id: str
@@ -41,11 +91,12 @@ class TradeSignal(BaseDataClass):
     stop_loss: Optional[float] = Common.DEFAULT_STOP_LOSS
     take_profit: Optional[float] = Common.DEFAULT_TAKE_PROFIT
     magic_numbers: Optional[int] = 0
+    legacy_magic_number: Optional[int] = None
     time_diff: Optional[float] = 0.0
     price_diff: Optional[float] = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class MasterTrader(BaseDataClass):
     external_trader_id: str
     source: str
@@ -66,3 +117,16 @@ class Mt5Setting(BaseDataClass):
     type_filling: str
     max_allowed_order_age_to_copy_in_minutes: int
     max_allowed_price_difference_in_pips: float
+    symbol_cache_ttl_in_seconds: int = 300
+    unknown_symbol_cache_ttl_in_seconds: int = 600
+    max_quote_age_in_ms: int = 1000
+    deal_history_retention_in_days: int = 10
+    server_clock_symbols: Optional[list] = None
+    server_clock_refresh_interval_in_seconds: int = 30
+    max_server_clock_offset_age_in_seconds: int = 600
+    mt5_call_budget_per_cycle: Optional[int] = None
+    position_full_refresh_interval_in_seconds: int = 30
+    max_order_attempts: int = 5
+    order_retry_deadline_in_ms: int = 2000
+    order_retry_min_backoff_in_ms: int = 100
+    max_order_slippage_in_pips: float = 5.0
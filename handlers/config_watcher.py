@@ -0,0 +1,36 @@
+import os
+
+
+class ConfigWatcher:
+    """Reloads a configuration file when its modification time changes.
+
+    ``load_config`` parses and validates the file. When it raises, the error
+    is logged and the running configuration is kept until the file changes
+    again.
+    """
+
+    def __init__(self, config_path, load_config, logger):
+        self.config_path = config_path
+        self.load_config = load_config
+        self.logger = logger
+        self._modified_at = self._get_modified_at()
+
+    def _get_modified_at(self):
+        try:
+            return os.path.getmtime(self.config_path)
+        except OSError:
+            return None
+
+    def poll(self):
+        """Return the new configuration if the file changed since the last poll, else None."""
+        modified_at = self._get_modified_at()
+        if modified_at is None or modified_at == self._modified_at:
+            return None
+
+        self._modified_at = modified_at
+        try:
+            return self.load_config(self.config_path)
+        except Exception as e:
+            self.logger.error(
+                f"{self.config_path} changed but is NOT applied: {e}")
+            return None
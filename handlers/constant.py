@@ -8,8 +8,51 @@ class SymbolFillingModeEnum(Enum):
     SYMBOL_FILLING_ALL = 3
 
 
+class LogFormatEnum(Enum):
+    TEXT = "text"
+    JSON = "json"
 
 
+class Mt5BackendEnum(Enum):
+    METATRADER5 = "metatrader5"
+    SIMULATED = "simulated"
+
+
+class Mt5CachePolicyEnum(Enum):
+    SESSION = "session"
+    CYCLE = "cycle"
+    TTL = "ttl"
+
+
+class OrderIntentTypeEnum(Enum):
+    # The value is the execution priority, exits first
+    CLOSE = 0
+    MODIFY = 1
+    OPEN = 2
+
+
+class OrderRetryActionEnum(Enum):
+    REPRICE = "reprice"
+    NEXT_FILLING_TYPE = "next_filling_type"
+    BACKOFF = "backoff"
+
+
+class SignalLifecycleStateEnum(Enum):
+    OPEN = "open"
+    CLOSED = "closed"
+
+
+class SignalRejectReasonEnum(Enum):
+    ACCEPTED = 0
+    TOO_OLD = 1
+    NO_QUOTE = 2
+    PRICE_DEVIATION = 3
+
+
+class SignalTransportEnum(Enum):
+    POLLING = "polling"
+    LONG_POLLING = "long_polling"
+
 
 class ReturnCodeTradeServer(Enum):
     # https://www.mql5.com/en/docs/constants/errorswarnings/enum_trade_return_codes
@@ -70,5 +113,16 @@ class Common:
         ReturnCodeTradeServer.TRADE_RETCODE_DONE.value,
         ReturnCodeTradeServer.TRADE_RETCODE_DONE_PARTIAL.value
     }
+    # Failed orders retried within the cycle, by what is changed before sending again.
+    # A timeout is not retried as the order may have been executed.
+    ORDER_RETRY_ACTION_BY_RETCODE = {
+        ReturnCodeTradeServer.TRADE_RETCODE_REQUOTE.value: OrderRetryActionEnum.REPRICE,
+        ReturnCodeTradeServer.TRADE_RETCODE_PRICE_CHANGED.value: OrderRetryActionEnum.REPRICE,
+        ReturnCodeTradeServer.TRADE_RETCODE_PRICE_OFF.value: OrderRetryActionEnum.REPRICE,
+        ReturnCodeTradeServer.TRADE_RETCODE_INVALID_FILL.value: OrderRetryActionEnum.NEXT_FILLING_TYPE,
+        ReturnCodeTradeServer.TRADE_RETCODE_TOO_MANY_REQUESTS.value: OrderRetryActionEnum.BACKOFF,
+        ReturnCodeTradeServer.TRADE_RETCODE_CONNECTION.value: OrderRetryActionEnum.BACKOFF,
+    }
     DEFAULT_STOP_LOSS = 0.0
     DEFAULT_TAKE_PROFIT = 0.0
+    DEFAULT_SERVER_CLOCK_SYMBOLS = ["EURUSD", "GBPUSD", "USDJPY"]
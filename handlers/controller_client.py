@@ -0,0 +1,124 @@
+import random
+import threading
+import time
+from collections import namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ``fetched_at`` is the time a payload relayed by the shared signal fetcher was fetched, None when fetched directly
+ControllerResponse = namedtuple(
+    "ControllerResponse", ["status_code", "payload", "is_modified", "fetched_at"], defaults=[None])
+
+
+class ControllerClient:
+    """Keep-alive HTTP client for the controller API.
+
+    Responses are cached per URL with their ``ETag`` and revalidated with
+    ``If-None-Match``. A ``304 Not Modified`` (or a ``200`` with an identical
+    body from a controller that sends no ``ETag``) returns the cached payload
+    with ``is_modified`` set to False so callers can skip decoding it again.
+
+    ``requests.Session`` is not documented as thread-safe, so every thread
+    calling the controller gets its own keep-alive session.
+    """
+
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+    RETRY_BACKOFF_IN_SECONDS = 0.2
+
+    def __init__(self, base_controller_url, logger, connect_timeout_in_seconds, read_timeout_in_seconds,
+                 max_retries, pool_size=4):
+        self.base_controller_url = base_controller_url
+        self.logger = logger
+        self.timeout = (connect_timeout_in_seconds, read_timeout_in_seconds)
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self._thread_local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+        self._cached_responses = {}
+
+    @property
+    def session(self):
+        session = getattr(self._thread_local, "session", None)
+        if session is None:
+            session = self._thread_local.session = self._create_session()
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def _create_session(self):
+        session = requests.Session()
+        session.headers.update({
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+        })
+        adapter = HTTPAdapter(pool_connections=self.pool_size,
+                              pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get(self, path, params=None, timeout=None, max_retries=None, conditional=True):
+        url = f"{self.base_controller_url}{path}"
+        max_retries = self.max_retries if max_retries is None else max_retries
+        cache_key = (url, tuple(sorted((params or {}).items())))
+        cached_response = self._cached_responses.get(
+            cache_key) if conditional else None
+
+        headers = {}
+        if cached_response and cached_response[0]:
+            headers["If-None-Match"] = cached_response[0]
+
+        resp = self._send_with_retries(
+            url, params, headers, timeout or self.timeout, max_retries)
+
+        if resp.status_code == requests.codes.not_modified and cached_response:
+            return ControllerResponse(requests.codes.ok, cached_response[2], False)
+
+        if resp.status_code not in [requests.codes.created, requests.codes.ok]:
+            return ControllerResponse(resp.status_code, None, True)
+
+        if not resp.content:
+            return ControllerResponse(resp.status_code, None, True)
+
+        if cached_response and cached_response[1] == resp.content:
+            return ControllerResponse(resp.status_code, cached_response[2], False)
+
+        payload = orjson.loads(resp.content) if orjson else resp.json()
+        if conditional:
+            self._cached_responses[cache_key] = (
+                resp.headers.get("ETag"), resp.content, payload)
+        return ControllerResponse(resp.status_code, payload, True)
+
+    def _send_with_retries(self, url, params, headers, timeout, max_retries):
+        attempt = 0
+        while True:
+            try:
+                resp = self.session.get(
+                    url, params=params, headers=headers, timeout=timeout)
+                if resp.status_code not in self.RETRY_STATUS_CODES or attempt >= max_retries:
+                    return resp
+                reason = f"status code {resp.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= max_retries:
+                    raise
+                reason = f"{e}"
+
+            attempt += 1
+            backoff = self.RETRY_BACKOFF_IN_SECONDS * \
+                2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            self.logger.warning(
+                f"Calling {url} failed with {reason}. Retry {attempt}/{max_retries} in {backoff:.2f}s")
+            time.sleep(backoff)
+
+    def close(self):
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
@@ -0,0 +1,149 @@
+import datetime
+import time
+
+
+class DealIndex:
+    """In-memory index of the account deal history keyed by magic number.
+
+    The history of the last ``retention_in_days`` is loaded once. Later
+    refreshes ask ``history_deals_total`` for the deals since the last seen
+    deal time and only download that tail when the count has changed. When
+    ``resume_from_time`` is set, the first load starts there instead, so a
+    restarted process only checks the deals made since it last ran. Closing
+    deals are also indexed by position, to confirm that a position was closed.
+    """
+
+    # Deals sharing the watermark second are downloaded again and de-duplicated by ticket
+    WATERMARK_OVERLAP_IN_SECONDS = 1
+    # The terminal filters deals by server time which can be ahead of UTC
+    END_TIME_MARGIN = datetime.timedelta(days=2)
+    PRUNE_INTERVAL_IN_SECONDS = 60
+
+    def __init__(self, mt5, logger, retention_in_days, full_reload_interval_in_seconds=3600):
+        self.mt5 = mt5
+        self.logger = logger
+        self.retention_in_days = retention_in_days
+        self.full_reload_interval_in_seconds = full_reload_interval_in_seconds
+        self._deals_by_ticket = {}
+        self._deals_by_magic = {}
+        self._opening_deals_by_position_id = {}
+        self._closing_deals_by_position_id = {}
+        self._closing_deal_entries = (mt5.DEAL_ENTRY_OUT, mt5.DEAL_ENTRY_OUT_BY)
+        self._watermark_time = None
+        self._deal_count_since_watermark = 0
+        self._loaded_at = None
+        self._pruned_at = 0.0
+        self.resume_from_time = None
+        self.new_deals = []
+        self.is_reloaded = False
+
+    @property
+    def watermark(self):
+        return self._watermark_time, len(self._deals_by_ticket)
+
+    def _end_time(self):
+        return datetime.datetime.now(datetime.timezone.utc) + self.END_TIME_MARGIN
+
+    def refresh(self):
+        """Bring the index up to date; ``new_deals`` and ``is_reloaded`` describe what changed."""
+        self.new_deals = []
+        self.is_reloaded = False
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.full_reload_interval_in_seconds:
+            return self.reload()
+
+        from_time = datetime.datetime.fromtimestamp(
+            self._watermark_time - self.WATERMARK_OVERLAP_IN_SECONDS, datetime.timezone.utc)
+        to_time = self._end_time()
+        deal_total = self.mt5.history_deals_total(from_time, to_time)
+        if deal_total is not None and deal_total == self._deal_count_since_watermark:
+            return False
+
+        deals = self.mt5.history_deals_get(from_time, to_time)
+        if deals is None:
+            self.logger.error(
+                f"Cannot get deal history from {from_time}: {self.mt5.last_error()}")
+            return False
+
+        new_deals = [
+            deal for deal in deals if deal.ticket not in self._deals_by_ticket]
+        self._add_deals(new_deals)
+        self._move_watermark(deals)
+        self._prune()
+        self.new_deals = new_deals
+        return bool(new_deals)
+
+    def reload(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        from_time = now - datetime.timedelta(days=self.retention_in_days)
+        if self.resume_from_time is not None:
+            from_time = max(from_time, datetime.datetime.fromtimestamp(
+                self.resume_from_time - self.WATERMARK_OVERLAP_IN_SECONDS, datetime.timezone.utc))
+        deals = self.mt5.history_deals_get(from_time, self._end_time())
+        if deals is None:
+            self.logger.error(
+                f"Cannot load deal history from {from_time}: {self.mt5.last_error()}")
+            return False
+
+        self._deals_by_ticket.clear()
+        self._deals_by_magic.clear()
+        self._opening_deals_by_position_id.clear()
+        self._closing_deals_by_position_id.clear()
+        self.resume_from_time = None
+        self._watermark_time = from_time.timestamp()
+        self._add_deals(deals)
+        self._move_watermark(deals)
+        self._loaded_at = time.monotonic()
+        self._pruned_at = self._loaded_at
+        self.is_reloaded = True
+        self.logger.debug(
+            "Loaded %s deal(s) since %s", len(self._deals_by_ticket), from_time)
+        return True
+
+    def _add_deals(self, deals):
+        for deal in deals:
+            self._deals_by_ticket[deal.ticket] = deal
+            if deal.magic:
+                known_deal = self._deals_by_magic.get(deal.magic)
+                if known_deal is None or (deal.time, deal.ticket) >= (known_deal.time, known_deal.ticket):
+                    self._deals_by_magic[deal.magic] = deal
+            if deal.entry == self.mt5.DEAL_ENTRY_IN:
+                self._opening_deals_by_position_id[deal.position_id] = deal
+            elif deal.entry in self._closing_deal_entries:
+                self._closing_deals_by_position_id[deal.position_id] = deal
+
+    def _move_watermark(self, deals):
+        if deals:
+            self._watermark_time = max(
+                self._watermark_time, max(deal.time for deal in deals))
+        overlap_start = self._watermark_time - self.WATERMARK_OVERLAP_IN_SECONDS
+        self._deal_count_since_watermark = sum(
+            1 for deal in deals if deal.time >= overlap_start)
+
+    def _prune(self):
+        if time.monotonic() - self._pruned_at < self.PRUNE_INTERVAL_IN_SECONDS:
+            return
+        self._pruned_at = time.monotonic()
+
+        expired_before = time.time() - self.retention_in_days * 86400
+        for ticket in [ticket for ticket, deal in self._deals_by_ticket.items() if deal.time < expired_before]:
+            del self._deals_by_ticket[ticket]
+        for deals_by_key in (self._deals_by_magic, self._opening_deals_by_position_id,
+                             self._closing_deals_by_position_id):
+            for key in [key for key, deal in deals_by_key.items() if deal.time < expired_before]:
+                del deals_by_key[key]
+
+    def get_deal_by_magic(self, magic_number):
+        return self._deals_by_magic.get(magic_number)
+
+    def is_closing_deal(self, deal):
+        return deal.entry in self._closing_deal_entries
+
+    @property
+    def closing_deals(self):
+        return list(self._closing_deals_by_position_id.values())
+
+    def get_opening_deal(self, position_id):
+        return self._opening_deals_by_position_id.get(position_id)
+
+    def get_closing_deal(self, position_id):
+        return self._closing_deals_by_position_id.get(position_id)
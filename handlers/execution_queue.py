@@ -0,0 +1,101 @@
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from handlers.constant import OrderIntentTypeEnum
+
+
+@dataclass(slots=True, order=True)
+class OrderIntent:
+    priority: int
+    sequence: int
+    intent_type: OrderIntentTypeEnum = field(compare=False)
+    key: tuple = field(compare=False)
+    master_trader_id: str = field(compare=False)
+    description: str = field(compare=False)
+    execute: Callable = field(compare=False)
+    submitted_at: float = field(compare=False, default=0.0)
+
+
+class ExecutionQueue:
+    """Collects the order intents of a reconciliation and executes them by priority.
+
+    Closes run before SL/TP modifications, which run before opens. Intents
+    targeting the same position or magic number are de-duplicated, keeping the
+    most urgent one. Intents still queued when the cycle deadline passes are
+    dropped; their master traders are reported as unsettled so the next cycle
+    reconciles them again. ``on_executed``, when set, is called with each
+    executed intent and its result. With ``metrics``, the time from submission
+    to completion of each intent feeds the ``order_intent_latency_ms``
+    histogram labelled with the intent type.
+    """
+
+    def __init__(self, logger, is_successful_result, cycle_deadline_in_seconds, metrics=None):
+        self.logger = logger
+        self.is_successful_result = is_successful_result
+        self.cycle_deadline_in_seconds = cycle_deadline_in_seconds
+        self.metrics = metrics
+        self._heap = []
+        self._intents_by_key = {}
+        self._sequence = itertools.count()
+        self._deadline = None
+        self.on_executed = None
+
+    def begin_cycle(self):
+        # Intents left by a cycle that failed before executing them are stale
+        self._heap.clear()
+        self._intents_by_key.clear()
+        self._deadline = time.monotonic() + self.cycle_deadline_in_seconds
+
+    def submit(self, intent_type: OrderIntentTypeEnum, key, master_trader_id, description, execute):
+        queued_intent = self._intents_by_key.get(key)
+        if queued_intent is not None:
+            if queued_intent.priority <= intent_type.value:
+                self.logger.debug(
+                    "%s is DROPPED as %s is already queued", description, queued_intent.description)
+                return
+            # The more urgent intent replaces the queued one, which is skipped when popped
+            queued_intent.execute = None
+
+        intent = OrderIntent(intent_type.value, next(self._sequence), intent_type, key, master_trader_id,
+                             description, execute, time.monotonic())
+        self._intents_by_key[key] = intent
+        heapq.heappush(self._heap, intent)
+
+    def execute(self):
+        """Execute the queued intents and return the master traders left unsettled."""
+        unsettled_master_trader_ids = set()
+        deadline = self._deadline or time.monotonic() + self.cycle_deadline_in_seconds
+        while self._heap:
+            intent = heapq.heappop(self._heap)
+            if intent.execute is None:
+                continue
+            if self._intents_by_key.get(intent.key) is intent:
+                del self._intents_by_key[intent.key]
+
+            if time.monotonic() > deadline:
+                unsettled_master_trader_ids.add(intent.master_trader_id)
+                self.logger.warning(
+                    f"{intent.description} is DEFERRED to next cycle as the cycle deadline "
+                    f"{self.cycle_deadline_in_seconds}s is reached")
+                continue
+
+            try:
+                result = intent.execute()
+            except Exception as e:
+                result = None
+                self.logger.error(f"{intent.description} failed as {e}")
+            latency_in_ms = (time.monotonic() - intent.submitted_at) * 1000
+            if self.metrics:
+                self.metrics.observe("order_intent_latency_ms", latency_in_ms, intent=intent.intent_type.name)
+            self.logger.debug(
+                "%s finished %.1fms after it was queued", intent.description, latency_in_ms)
+            if self.on_executed:
+                self.on_executed(intent, result)
+            if not self.is_successful_result(result):
+                unsettled_master_trader_ids.add(intent.master_trader_id)
+
+        self._intents_by_key.clear()
+        return unsettled_master_trader_ids
@@ -0,0 +1,151 @@
+import gzip
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def build_signal(signal_id, external_signal_id, symbol, trade_type, size, price_order, time,
+                 stop_loss=0.0, take_profit=0.0, market_price=None):
+    return {
+        "id": signal_id,
+        "external_signal_id": str(external_signal_id),
+        "symbol": symbol,
+        "type": trade_type,
+        "size": size,
+        "time": time,
+        "price_order": price_order,
+        "market_price": market_price if market_price is not None else price_order,
+        "stop_loss": stop_loss,
+        "take_profit": take_profit,
+    }
+
+
+class FakeController:
+    """Local stand-in for the controller ``/master_traders/`` endpoint."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._lock = threading.Condition()
+        self._master_traders = {}
+        self._version = 0
+        self._source_versions = {}
+        self.request_count = 0
+        self.not_modified_count = 0
+        self._server = ThreadingHTTPServer(
+            (host, port), self._build_request_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _bump_version(self, source):
+        self._version += 1
+        self._source_versions[source] = self._version
+        self._lock.notify_all()
+
+    def set_signals(self, source, external_trader_id, signals):
+        with self._lock:
+            self._master_traders[(source, str(external_trader_id))] = list(
+                signals)
+            self._bump_version(source)
+
+    def remove_master_trader(self, source, external_trader_id):
+        with self._lock:
+            self._master_traders.pop((source, str(external_trader_id)), None)
+            self._bump_version(source)
+
+    def wait_for_changes(self, sources, cursor, timeout_in_seconds):
+        def changed_version():
+            return max((self._source_versions.get(source, 0) for source in sources), default=0)
+
+        with self._lock:
+            self._lock.wait_for(lambda: changed_version() > cursor, timeout_in_seconds)
+            if changed_version() > cursor:
+                return self._version
+            return None
+
+    def get_master_traders(self, source, external_trader_ids):
+        with self._lock:
+            return [
+                {
+                    "source": source,
+                    "external_trader_id": external_trader_id,
+                    "signals": list(self._master_traders[(source, external_trader_id)]),
+                }
+                for external_trader_id in external_trader_ids
+                if (source, external_trader_id) in self._master_traders
+            ]
+
+    def _build_request_handler(self):
+        controller = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path.rstrip("/") == "/master_traders/changes":
+                    return self._send_changes(query)
+                if url.path.rstrip("/") != "/master_traders":
+                    return self._send_json(404, {"detail": "Not Found"})
+
+                controller.request_count += 1
+                source = query.get("source", [""])[0]
+                external_trader_ids = [
+                    external_trader_id
+                    for external_trader_id in query.get("external_trader_ids", [""])[0].split(",")
+                    if external_trader_id
+                ]
+                return self._send_json(200, controller.get_master_traders(source, external_trader_ids))
+
+            def _send_changes(self, query):
+                sources = query.get("sources", [""])[0].split(",")
+                cursor = int(query.get("cursor", ["-1"])[0])
+                timeout_in_seconds = float(query.get("timeout", ["25"])[0])
+                version = controller.wait_for_changes(
+                    sources, cursor, timeout_in_seconds)
+                if version is None:
+                    self.send_response(204)
+                    self.end_headers()
+                    return
+                return self._send_json(200, {"cursor": version})
+
+            def _send_json(self, status_code, payload):
+                body = json.dumps(payload).encode()
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if status_code == 200 and self.headers.get("If-None-Match") == etag:
+                    controller.not_modified_count += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("ETag", etag)
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return RequestHandler
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
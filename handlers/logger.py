@@ -1,47 +1,148 @@
+import datetime
+import gzip
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import shutil
+import time
+
+from handlers.constant import LogFormatEnum
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "prefix": getattr(record, "prefix", ""),
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotates when the file reaches ``max_bytes`` or every ``rotation_interval_in_seconds``.
+
+    Rotated files are gzip compressed and at most ``backup_count`` of them are kept.
+    """
+
+    def __init__(self, filename, max_bytes, backup_count, rotation_interval_in_seconds=None):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+        self.rotation_interval_in_seconds = rotation_interval_in_seconds
+        self.rollover_at = self._next_rollover_at()
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = self._compress
+
+    def _next_rollover_at(self):
+        if not self.rotation_interval_in_seconds:
+            return None
+        return time.time() + self.rotation_interval_in_seconds
+
+    @staticmethod
+    def _compress(source, destination):
+        with open(source, "rb") as source_file, gzip.open(destination, "wb") as destination_file:
+            shutil.copyfileobj(source_file, destination_file)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = self._next_rollover_at()
+
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    # The queue stays in process, so records are formatted by the listener thread only
+    def prepare(self, record):
+        return record
 
 
 class Logger:
-    def __init__(self, logger_name=__name__, log_file_path=None, message_prefix="", log_level="DEBUG"):
+    """Level-gated logger writing from a background thread.
+
+    Records are put on an in-process queue and formatted and written to the
+    console and the log file by a ``QueueListener``. Arguments are formatted
+    lazily, as with ``logging``: pass them after the message
+    (``logger.debug("Signals %s", signals)``) so nothing is built when the level
+    is disabled.
+    """
+
+    def __init__(self, logger_name=__name__, log_file_path=None, message_prefix="", log_level="DEBUG",
+                 log_format=LogFormatEnum.TEXT.value, max_file_size_in_mb=None, backup_count=10,
+                 rotation_interval_in_hours=None):
         # Create a logger object
         self._logger = logging.getLogger(logger_name)
+        self._logger.propagate = False
 
         level = getattr(logging, log_level.upper(), logging.DEBUG)
 
-        self._logger.setLevel(logging.DEBUG)
+        self._logger.setLevel(level)
         self.message_prefix = message_prefix
+        self._extra = {"prefix": message_prefix}
+        self._listener = None
+        self._queue_handler = None
 
         # Check if handlers are already configured
         if not self._logger.handlers:
-            console_handler = logging.StreamHandler()
-            console_handler.setLevel(logging.DEBUG)
+            if log_format == LogFormatEnum.JSON.value:
+                formatter = JsonLinesFormatter()
+            else:
+                formatter = logging.Formatter(
+                    "%(asctime)s - %(levelname)s - %(prefix)s|%(message)s")
 
-            formatter = logging.Formatter(
-                "%(asctime)s - %(levelname)s - %(message)s")
+            console_handler = logging.StreamHandler()
             console_handler.setFormatter(formatter)
-            self._logger.addHandler(console_handler)
+            handlers = [console_handler]
 
             if log_file_path:
                 if not os.path.exists(os.path.dirname(log_file_path)):
                     os.makedirs(os.path.dirname(log_file_path))
-                file_handler = logging.FileHandler(log_file_path)
-                file_handler.setLevel(level)
+                if max_file_size_in_mb or rotation_interval_in_hours:
+                    file_handler = CompressingRotatingFileHandler(
+                        log_file_path, int((max_file_size_in_mb or 0) * 1024 * 1024), backup_count,
+                        rotation_interval_in_hours * 3600 if rotation_interval_in_hours else None)
+                else:
+                    file_handler = logging.FileHandler(log_file_path)
 
                 file_handler.setFormatter(formatter)
-                self._logger.addHandler(file_handler)
+                handlers.append(file_handler)
+
+            self._listener = logging.handlers.QueueListener(
+                queue.SimpleQueue(), *handlers, respect_handler_level=True)
+            self._queue_handler = _RecordQueueHandler(self._listener.queue)
+            self._logger.addHandler(self._queue_handler)
+            self._listener.start()
 
     def get_logger(self):
         return self
 
-    def info(self, message):
-        self._logger.info(f"{self.message_prefix}|{message}")
+    @property
+    def is_debug_enabled(self):
+        return self._logger.isEnabledFor(logging.DEBUG)
+
+    def info(self, message, *args):
+        self._logger.info(message, *args, extra=self._extra)
+
+    def debug(self, message, *args):
+        self._logger.debug(message, *args, extra=self._extra)
 
-    def debug(self, message):
-        self._logger.debug(f"{self.message_prefix}|{message}")
+    def warning(self, message, *args):
+        self._logger.warning(message, *args, extra=self._extra)
 
-    def warning(self, message):
-        self._logger.warning(f"{self.message_prefix}|{message}")
+    def error(self, message, *args):
+        self._logger.error(message, *args, extra=self._extra)
 
-    def error(self, message):
-        self._logger.error(f"{self.message_prefix}|{message}")
+    def close(self):
+        """Write the queued records and stop the background writer."""
+        if self._listener:
+            self._logger.removeHandler(self._queue_handler)
+            self._listener.stop()
+            self._listener = None
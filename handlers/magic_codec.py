@@ -0,0 +1,224 @@
+import json
+import os
+import zlib
+
+
+class MagicNumberCodec:
+    """Encodes (master trader, signal) pairs into position magic numbers.
+
+    Layout of the 63-bit magic number::
+
+        bits 60-62  scheme tag (SCHEME_TAG)
+        bits 32-59  master trader key
+        bits  0-31  signal key
+
+    A numeric ID that fits in its key without the top bit is stored as is.
+    Any other ID is hashed into the keys with the top bit set, and the hash
+    is recorded in a reverse table persisted at ``table_path``. Decoding is
+    then integer arithmetic plus at most one dict lookup. New keys are written
+    by :meth:`save_table` in one batch, and :meth:`prune` drops the keys no
+    open position or journal entry uses any more. Known IDs are looked up in
+    the inverse of the reverse table before probing, so a key freed by
+    :meth:`prune` never hides the key of an ID hashed next to it.
+
+    Magic numbers of the legacy scheme ``int(f"{master}{separator}{signal}")``
+    are still recognized by prefix so positions opened before the migration
+    keep being updated and closed. A magic number carrying the scheme tag is
+    never matched by prefix.
+    """
+
+    SCHEME_TAG = 0b101
+    TAG_SHIFT = 60
+    MASTER_SHIFT = 32
+    MASTER_BITS = 28
+    SIGNAL_BITS = 32
+    MAX_MAGIC_NUMBER = 2 ** 64 - 1
+
+    def __init__(self, logger, table_path, separator_number_string, master_trader_ids, is_legacy_supported=True):
+        self.logger = logger
+        self.table_path = table_path
+        self.separator_number_string = separator_number_string
+        self.is_legacy_supported = is_legacy_supported
+        self._master_ids_by_key = {}
+        self._signal_ids_by_key = {}
+        self._master_keys_by_id = {}
+        self._signal_keys_by_id = {}
+        self._magic_numbers = {}
+        self._master_trader_ids = set()
+        self._legacy_prefixes_by_length = {}
+        self._is_table_modified = False
+        self._load_table()
+        self.set_master_trader_ids(master_trader_ids)
+
+    def set_master_trader_ids(self, master_trader_ids):
+        self._master_trader_ids = {
+            str(master_trader_id) for master_trader_id in master_trader_ids}
+        self._legacy_prefixes_by_length = {}
+        for master_trader_id in self._master_trader_ids:
+            legacy_prefix = f"{master_trader_id}{self.separator_number_string}"
+            self._legacy_prefixes_by_length.setdefault(
+                len(legacy_prefix), {})[legacy_prefix] = master_trader_id
+
+    def _load_table(self):
+        if not self.table_path or not os.path.exists(self.table_path):
+            return
+        try:
+            with open(self.table_path) as content:
+                table = json.load(content)
+        except Exception as e:
+            raise Exception(
+                f'Cannot parse magic number table {self.table_path}. Check it again {e}')
+
+        self._master_ids_by_key = {
+            int(master_key): master_trader_id for master_key, master_trader_id in table["masters"].items()}
+        self._signal_ids_by_key = {
+            int(master_key): {int(signal_key): signal_id for signal_key, signal_id in signal_ids.items()}
+            for master_key, signal_ids in table["signals"].items()
+        }
+        self._master_keys_by_id = {
+            master_trader_id: master_key for master_key, master_trader_id in self._master_ids_by_key.items()}
+        self._signal_keys_by_id = {
+            master_key: {signal_id: signal_key for signal_key, signal_id in signal_ids.items()}
+            for master_key, signal_ids in self._signal_ids_by_key.items()
+        }
+
+    def get_table(self):
+        return {
+            "masters": self._master_ids_by_key,
+            "signals": self._signal_ids_by_key,
+        }
+
+    def save_table(self):
+        """Write the reverse table if keys were added or pruned since it was last written."""
+        if not self._is_table_modified or not self.table_path:
+            return
+        self._is_table_modified = False
+        os.makedirs(os.path.dirname(self.table_path) or ".", exist_ok=True)
+        temporary_path = f"{self.table_path}.tmp"
+        with open(temporary_path, "w") as content:
+            json.dump(self.get_table(), content)
+        os.replace(temporary_path, self.table_path)
+
+    @staticmethod
+    def _to_key(identifier, bits, ids_by_key, keys_by_id):
+        """Return ``(key, is_new_table_entry)`` for ``identifier`` in a ``bits`` wide field."""
+        hashed_flag = 1 << (bits - 1)
+        if identifier.isdigit() and int(identifier) < hashed_flag and str(int(identifier)) == identifier:
+            return int(identifier), False
+
+        key = keys_by_id.get(identifier)
+        if key is not None:
+            return key, False
+
+        # Probing only looks for a free key, a known ID is never searched along the probe chain
+        key_space = hashed_flag
+        hashed_key = zlib.crc32(identifier.encode()) % key_space
+        for probe in range(key_space):
+            key = hashed_flag | ((hashed_key + probe) % key_space)
+            if key not in ids_by_key:
+                ids_by_key[key] = identifier
+                keys_by_id[identifier] = key
+                return key, True
+        raise Exception(f"No magic number key left for {identifier}")
+
+    def encode(self, master_trader_id, external_signal_id):
+        master_trader_id = str(master_trader_id)
+        external_signal_id = str(external_signal_id)
+        magic_number = self._magic_numbers.get(
+            (master_trader_id, external_signal_id))
+        if magic_number is not None:
+            return magic_number
+
+        master_key, is_new_master = self._to_key(
+            master_trader_id, self.MASTER_BITS, self._master_ids_by_key, self._master_keys_by_id)
+        signal_key, is_new_signal = self._to_key(
+            external_signal_id, self.SIGNAL_BITS, self._signal_ids_by_key.setdefault(master_key, {}),
+            self._signal_keys_by_id.setdefault(master_key, {}))
+        if is_new_master or is_new_signal:
+            self._is_table_modified = True
+
+        magic_number = (self.SCHEME_TAG << self.TAG_SHIFT) | (
+            master_key << self.MASTER_SHIFT) | signal_key
+        self._magic_numbers[(master_trader_id, external_signal_id)] = magic_number
+        return magic_number
+
+    def encode_legacy(self, master_trader_id, external_signal_id):
+        if not self.is_legacy_supported:
+            return None
+        try:
+            magic_number = int(
+                f"{master_trader_id}{self.separator_number_string}{external_signal_id}")
+        except ValueError:
+            return None
+        return magic_number if magic_number <= self.MAX_MAGIC_NUMBER else None
+
+    def _split(self, magic_number):
+        master_key = (magic_number >> self.MASTER_SHIFT) & (
+            (1 << self.MASTER_BITS) - 1)
+        signal_key = magic_number & ((1 << self.SIGNAL_BITS) - 1)
+        return master_key, signal_key
+
+    def decode(self, magic_number):
+        """Return ``(master_trader_id, external_signal_id)`` of a magic number of the current scheme."""
+        if magic_number >> self.TAG_SHIFT != self.SCHEME_TAG:
+            return None
+
+        master_key, signal_key = self._split(magic_number)
+        if master_key >> (self.MASTER_BITS - 1):
+            master_trader_id = self._master_ids_by_key.get(master_key)
+        else:
+            master_trader_id = str(master_key)
+        if signal_key >> (self.SIGNAL_BITS - 1):
+            external_signal_id = self._signal_ids_by_key.get(
+                master_key, {}).get(signal_key)
+        else:
+            external_signal_id = str(signal_key)
+
+        if master_trader_id is None:
+            return None
+        return master_trader_id, external_signal_id
+
+    def get_master_trader_ids(self, magic_number):
+        """Return the followed master traders a magic number belongs to."""
+        if not magic_number:
+            return []
+
+        if magic_number >> self.TAG_SHIFT == self.SCHEME_TAG:
+            decoded = self.decode(magic_number)
+            if decoded and decoded[0] in self._master_trader_ids:
+                return [decoded[0]]
+            return []
+        if not self.is_legacy_supported:
+            return []
+
+        magic_number_str = str(magic_number)
+        return [
+            prefixes[magic_number_str[:prefix_length]]
+            for prefix_length, prefixes in self._legacy_prefixes_by_length.items()
+            if magic_number_str[:prefix_length] in prefixes
+        ]
+
+    def prune(self, magic_numbers_in_use):
+        """Drop the hashed IDs that none of ``magic_numbers_in_use`` refers to."""
+        used_keys = {
+            self._split(magic_number) for magic_number in magic_numbers_in_use
+            if magic_number and magic_number >> self.TAG_SHIFT == self.SCHEME_TAG
+        }
+        used_master_keys = {master_key for master_key, _ in used_keys}
+
+        for master_key, signal_ids in list(self._signal_ids_by_key.items()):
+            signal_keys_by_id = self._signal_keys_by_id.get(master_key, {})
+            for signal_key in [signal_key for signal_key in signal_ids if (master_key, signal_key) not in used_keys]:
+                signal_keys_by_id.pop(signal_ids.pop(signal_key), None)
+                self._is_table_modified = True
+            if not signal_ids:
+                del self._signal_ids_by_key[master_key]
+                self._signal_keys_by_id.pop(master_key, None)
+        for master_key in [master_key for master_key in self._master_ids_by_key if master_key not in used_master_keys]:
+            self._master_keys_by_id.pop(self._master_ids_by_key.pop(master_key), None)
+            self._is_table_modified = True
+        # Pruned IDs get their key again on their next encode
+        self._magic_numbers = {
+            ids: magic_number for ids, magic_number in self._magic_numbers.items()
+            if magic_number in magic_numbers_in_use
+        }
@@ -0,0 +1,171 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_IN_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+METRIC_PREFIX = "metatrader_ea_"
+
+
+class Histogram:
+    __slots__ = ("bucket_counts", "count", "sum")
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS_IN_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS_IN_MS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+def _format_labels(labels):
+    return ",".join(f'{name}="{value}"' for name, value in labels)
+
+
+class Metrics:
+    """In-process latency histograms and counters of one terminal.
+
+    Metrics are identified by a name and a sorted tuple of label pairs, and
+    rendered in the Prometheus text format with ``constant_labels`` added to
+    every sample. Recording is thread safe as signal sources are fetched in
+    their own threads.
+    """
+
+    def __init__(self, **constant_labels):
+        self.constant_labels = tuple(sorted(constant_labels.items()))
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value_in_ms, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value_in_ms)
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def time(self, name, **labels):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - started_at) * 1000, **labels)
+
+    def render(self):
+        with self._lock:
+            histograms = {key: (list(histogram.bucket_counts), histogram.count, histogram.sum)
+                          for key, histogram in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        for name in sorted({name for name, _ in histograms}):
+            metric_name = f"{METRIC_PREFIX}{name}"
+            lines.append(f"# TYPE {metric_name} histogram")
+            for (histogram_name, labels), (bucket_counts, count, total) in sorted(histograms.items()):
+                if histogram_name != name:
+                    continue
+                labels = self.constant_labels + labels
+                cumulative_count = 0
+                for upper_bound, bucket_count in zip(LATENCY_BUCKETS_IN_MS + ("+Inf",), bucket_counts):
+                    cumulative_count += bucket_count
+                    lines.append(
+                        f'{metric_name}_bucket{{{_format_labels(labels + (("le", upper_bound),))}}} {cumulative_count}')
+                lines.append(f"{metric_name}_sum{{{_format_labels(labels)}}} {total}")
+                lines.append(f"{metric_name}_count{{{_format_labels(labels)}}} {count}")
+
+        for name in sorted({name for name, _ in counters}):
+            metric_name = f"{METRIC_PREFIX}{name}"
+            lines.append(f"# TYPE {metric_name} counter")
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(
+                        f"{metric_name}{{{_format_labels(self.constant_labels + labels)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, file_path):
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        temporary_path = f"{file_path}.tmp"
+        with open(temporary_path, "w") as content:
+            content.write(self.render())
+        os.replace(temporary_path, file_path)
+
+
+class InstrumentedMt5:
+    """Wraps the MetaTrader5 module to time every terminal call.
+
+    Each call feeds the ``mt5_call_duration_ms`` histogram labelled with the
+    function name, and ``order_send`` results are counted per retcode.
+    Constants and other attributes are passed through.
+    """
+
+    def __init__(self, mt5, metrics: Metrics):
+        self._mt5 = mt5
+        self._metrics = metrics
+        self._wrapped_calls = {}
+
+    def __getattr__(self, name):
+        attribute = getattr(self._mt5, name)
+        if not callable(attribute):
+            return attribute
+
+        wrapped_call = self._wrapped_calls.get(name)
+        if wrapped_call is None:
+            wrapped_call = self._wrapped_calls[name] = self._wrap(name, attribute)
+        return wrapped_call
+
+    def _wrap(self, name, call):
+        metrics = self._metrics
+
+        def timed_call(*args, **kwargs):
+            started_at = time.perf_counter()
+            try:
+                result = call(*args, **kwargs)
+            finally:
+                metrics.observe("mt5_call_duration_ms",
+                                (time.perf_counter() - started_at) * 1000, call=name)
+            if name == "order_send":
+                metrics.increment("mt5_order_retcodes_total",
+                                  retcode=result.retcode if result else "none")
+            return result
+
+        return timed_call
+
+
+def aggregate_metric_files(folder_path, output_path):
+    """Merge the metric files of all terminals in ``folder_path`` into ``output_path``."""
+    samples_by_metric = {}
+    for file_name in sorted(os.listdir(folder_path)):
+        if not file_name.endswith(".prom"):
+            continue
+        try:
+            with open(os.path.join(folder_path, file_name)) as content:
+                lines = content.read().splitlines()
+        except OSError:
+            continue
+
+        type_line = None
+        for line in lines:
+            if line.startswith("# TYPE "):
+                type_line = line
+                samples_by_metric.setdefault(type_line, [])
+            elif line and type_line:
+                samples_by_metric[type_line].append(line)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    temporary_path = f"{output_path}.tmp"
+    with open(temporary_path, "w") as content:
+        for type_line, samples in samples_by_metric.items():
+            content.write("\n".join([type_line] + samples) + "\n")
+    os.replace(temporary_path, output_path)
@@ -0,0 +1,18 @@
+from handlers.classes import BotConfig
+from handlers.constant import Mt5BackendEnum
+
+
+def load_mt5_backend(bot_config: BotConfig):
+    backend_name = bot_config.mt5_backend or Mt5BackendEnum.METATRADER5.value
+
+    if backend_name == Mt5BackendEnum.METATRADER5.value:
+        import MetaTrader5
+        return MetaTrader5
+
+    if backend_name == Mt5BackendEnum.SIMULATED.value:
+        from handlers.simulated_mt5 import SimulatedMt5
+        return SimulatedMt5(bot_config.simulated_mt5)
+
+    raise Exception(
+        f'Unknown mt5 backend {backend_name}. '
+        f'Use one of {[backend.value for backend in Mt5BackendEnum]}')
@@ -1,6 +1,13 @@
-import datetime
-from handlers.constant import SymbolFillingModeEnum, Common, ReturnCodeTradeServer
+import math
+import time
+from handlers.constant import SymbolFillingModeEnum, Common, OrderRetryActionEnum, ReturnCodeTradeServer
+from handlers.account_snapshot import AccountSnapshot
 from handlers.classes import Mt5Setting
+from handlers.deal_index import DealIndex
+from handlers.position_table import PositionTable
+from handlers.quote_snapshot import QuoteSnapshot
+from handlers.server_clock import ServerClock
+from handlers.symbol_catalog import SymbolCatalog
 
 
 class Mt5Handler:
@@ -23,22 +30,99 @@ class Mt5Handler:
                 f"{self.mt5.last_error()} with setting {mt5_setting}")
         self.logger.debug(self.mt5.terminal_info())
         self.bot_info = self.get_bot_info()
+        self.ea_login = self.get_ea_login()
+        # The login cannot change without initializing the terminal again
+        self.ea_comment = f"EA {self.bot_info['login']}"
 
         self.ea_name = mt5_setting.bot_name or "Python EA"
+        self.symbol_catalog = SymbolCatalog(
+            self.mt5, self.logger, mt5_setting.symbol_postfix,
+            ttl_in_seconds=mt5_setting.symbol_cache_ttl_in_seconds,
+            unknown_symbol_ttl_in_seconds=mt5_setting.unknown_symbol_cache_ttl_in_seconds,
+        )
+        self.quote_snapshot = QuoteSnapshot(
+            self.mt5, mt5_setting.max_quote_age_in_ms)
+        self.deal_index = DealIndex(
+            self.mt5, self.logger, mt5_setting.deal_history_retention_in_days)
+        self.position_table = PositionTable(
+            self.mt5, self.logger, mt5_setting.position_full_refresh_interval_in_seconds)
+        self.server_clock = ServerClock(
+            self.mt5, self.logger, self._enable_server_clock_symbols(),
+            refresh_interval_in_seconds=mt5_setting.server_clock_refresh_interval_in_seconds,
+            max_offset_age_in_seconds=mt5_setting.max_server_clock_offset_age_in_seconds,
+        )
+        self.server_clock.start()
+        self.deal_versions = {}
+
+    def apply_mt5_setting(self, mt5_setting: Mt5Setting):
+        """Apply a new setting of the same account without initializing the terminal again."""
+        previous_mt5_setting = self.mt5_setting
+        self.mt5_setting = mt5_setting
+        self.prefered_order_type_filling_name = mt5_setting.type_filling
+        self.copied_volume_coefficient = mt5_setting.copied_volume_coefficient or 1
+        self.max_allowed_order_age_to_copy_in_minutes = mt5_setting.max_allowed_order_age_to_copy_in_minutes
+        self.ea_name = mt5_setting.bot_name or "Python EA"
+
+        if mt5_setting.symbol_postfix != previous_mt5_setting.symbol_postfix:
+            self.symbol_catalog.set_symbol_postfix(mt5_setting.symbol_postfix)
+        # A filling type that worked under the previous setting must not override the reloaded type_filling
+        self.symbol_catalog.clear_working_filling_types()
+        self.symbol_catalog.ttl_in_seconds = mt5_setting.symbol_cache_ttl_in_seconds
+        self.symbol_catalog.unknown_symbol_ttl_in_seconds = mt5_setting.unknown_symbol_cache_ttl_in_seconds
+        self.quote_snapshot.max_quote_age_in_seconds = mt5_setting.max_quote_age_in_ms / 1000
+        self.deal_index.retention_in_days = mt5_setting.deal_history_retention_in_days
+        self.position_table.full_refresh_interval_in_seconds = mt5_setting.position_full_refresh_interval_in_seconds
+        self.server_clock.refresh_interval_in_seconds = mt5_setting.server_clock_refresh_interval_in_seconds
+        self.server_clock.max_offset_age_in_seconds = mt5_setting.max_server_clock_offset_age_in_seconds
+        if (mt5_setting.server_clock_symbols != previous_mt5_setting.server_clock_symbols
+                or mt5_setting.symbol_postfix != previous_mt5_setting.symbol_postfix):
+            self.server_clock.symbols = self._enable_server_clock_symbols()
+
+    def _enable_server_clock_symbols(self):
+        server_clock_symbols = []
+        for api_symbol in self.mt5_setting.server_clock_symbols or Common.DEFAULT_SERVER_CLOCK_SYMBOLS:
+            symbol = self.convert_to_broker_symbol_format(api_symbol)
+            try:
+                server_clock_symbols.append(self.enable_symbol(symbol))
+            except Exception as e:
+                self.logger.warning(
+                    f"Symbol {symbol} cannot be used to sync server time as {e}")
+        return server_clock_symbols
+
+    def is_terminal_alive(self):
+        try:
+            return bool(self.mt5.terminal_info())
+        except Exception:
+            return False
+
+    def begin_cycle(self):
+        if not self.mt5.terminal_info():
+            raise Exception(
+                f"Terminal is not available: {self.mt5.last_error()}\nBot info: {self.bot_info}")
+        self.quote_snapshot.begin_cycle()
+        self.server_clock.refresh_if_due()
+        self.deal_index.refresh()
+        self.position_table.refresh(self.deal_index.new_deals, self.deal_index.is_reloaded)
+
+    def take_account_snapshot(self, magic_codec, master_trader_ids):
+        return AccountSnapshot(
+            self.position_table.positions, self.deal_index.new_deals, self.deal_index.is_reloaded,
+            magic_codec, master_trader_ids, self.deal_versions)
+
+    @staticmethod
+    def is_successful_result(result):
+        return bool(result) and result.retcode in Common.SUCCESSFUL_MT5_TRADE_RETCODE
 
     def convert_to_broker_symbol_format(self, api_signal_symbol):
-        symbol = f"{api_signal_symbol}{self.mt5_setting.symbol_postfix}".replace(
-            "/", "")
-        return symbol
+        return self.symbol_catalog.to_broker_symbol(api_signal_symbol)
 
     def enable_symbol(self, symbol):
-        if not self.is_symbol_exists(symbol):
+        symbol_spec = self.symbol_catalog.enable(symbol)
+        if symbol_spec is None:
             raise Exception(
                 f'Symbol {symbol} does not exist in this terminal {self.mt5_setting.server}')
 
-        selected = self.mt5.symbol_select(symbol, True)
-
-        if not selected:
+        if not symbol_spec.selected:
             raise Exception(
                 f"Exception: Failed to select {symbol}, error code ={self.mt5.last_error()}"
             )
@@ -59,8 +143,12 @@ class Mt5Handler:
         }
 
     def _get_filling_type_by_volume_symbol(self, symbol):
+        working_filling_type = self.symbol_catalog.get_working_filling_type(symbol)
+        if working_filling_type is not None:
+            return working_filling_type
+
         symbol_filling_type_name = SymbolFillingModeEnum(
-            self.mt5.symbol_info(symbol).filling_mode
+            self._get_symbol_spec(symbol).filling_mode
         ).name
 
         allowed_order_filling_types = Common.MAPPING_FILLING_MODE_SYBOL_TO_ORDER[
@@ -71,20 +159,41 @@ class Mt5Handler:
 
         else:
             self.logger.debug(
-                f"Cannot use prefered order filling type: {self.prefered_order_type_filling_name} as it is not allowed"
-                f".Trying to use allowed filling type {allowed_order_filling_types[0]}"
-            )
+                "Cannot use prefered order filling type: %s as it is not allowed.Trying to use allowed filling type %s",
+                self.prefered_order_type_filling_name, allowed_order_filling_types[0])
             return getattr(self.mt5, allowed_order_filling_types[0])
 
+    def _get_fallback_filling_types(self, symbol):
+        """Return the filling types allowed for the symbol, the preferred one first, to fall through
+        when an order is rejected with an invalid filling."""
+        symbol_filling_type_name = SymbolFillingModeEnum(
+            self._get_symbol_spec(symbol).filling_mode).name
+        allowed_order_filling_types = Common.MAPPING_FILLING_MODE_SYBOL_TO_ORDER[symbol_filling_type_name]
+        filling_type_names = sorted(
+            allowed_order_filling_types, key=lambda name: name != self.prefered_order_type_filling_name)
+        return [getattr(self.mt5, filling_type_name) for filling_type_name in filling_type_names]
+
+    def _get_symbol_spec(self, symbol):
+        symbol_spec = self.symbol_catalog.get_symbol_spec(symbol)
+        if symbol_spec is None:
+            raise Exception(
+                f'Symbol {symbol} does not exist in this terminal {self.mt5_setting.server}')
+        return symbol_spec
+
     def _get_volume_with_copied_volume_coefficient(self, volume, symbol):
-        calculated_volume = round(volume * self.copied_volume_coefficient, 2)
-        symbol_info = self.mt5.symbol_info(symbol)
+        symbol_spec = self._get_symbol_spec(symbol)
+        calculated_volume = volume * self.copied_volume_coefficient
+
+        if symbol_spec.volume_step:
+            calculated_volume = math.floor(
+                round(calculated_volume / symbol_spec.volume_step, 6)) * symbol_spec.volume_step
+        calculated_volume = round(calculated_volume, 2)
 
-        if calculated_volume > symbol_info.volume_max:
-            return symbol_info.max
+        if calculated_volume > symbol_spec.volume_max:
+            return symbol_spec.volume_max
 
-        elif calculated_volume < symbol_info.volume_min:
-            return symbol_info.volume_min
+        elif calculated_volume < symbol_spec.volume_min:
+            return symbol_spec.volume_min
 
         else:
             return calculated_volume
@@ -99,7 +208,7 @@ class Mt5Handler:
     def _validate_result(self, request, result):
         if not result:
             return self.logger.error(
-                f"\t\t[Error]: {self.mt5.last_error()}\nBot info: {self.get_bot_info()}")
+                f"\t\t[Error]: {self.mt5.last_error()}\nBot info: {self.bot_info}")
 
         retcode = result[0]
         retcode_enum = self._get_server_enum(retcode)
@@ -117,10 +226,10 @@ class Mt5Handler:
                 and result.comment not in request["comment"]
         ):
             return self.logger.warning(
-                f"\t\t[Probally Error Retcode: {retcode_enum.name} ({retcode})] Request comment is {result.comment}\nBot info: {self.get_bot_info()}")
+                f"\t\t[Probally Error Retcode: {retcode_enum.name} ({retcode})] Request comment is {result.comment}\nBot info: {self.bot_info}")
 
         return self.logger.debug(
-            f"\t[OK Retcode: {retcode_enum.name} ({retcode})]: {result.comment}")
+            "\t[OK Retcode: %s (%s)]: %s", retcode_enum.name, retcode, result.comment)
 
     def close_trade_by_position(self, position):
         # Determine the order type to use when closing a position
@@ -135,7 +244,7 @@ class Mt5Handler:
             "action": self.mt5.TRADE_ACTION_DEAL,
             "type": closing_order_type,
             "price": self.get_market_price_by_order_type_symbol(
-                closing_order_type, position.symbol
+                closing_order_type, position.symbol, force_refresh=True
             ),
             "symbol": position.symbol,
             "volume": position.volume,
@@ -147,11 +256,7 @@ class Mt5Handler:
         return self.send_order_request(request)
 
     def is_symbol_exists(self, symbol: str) -> bool:
-        symbol_info = self.mt5.symbol_info(symbol)
-        if symbol_info is None:
-            return False
-        else:
-            return True
+        return self.symbol_catalog.get_symbol_spec(symbol) is not None
 
     def open_trade(
             self, symbol, volume, order_type, stop_loss, take_profit, magic_number
@@ -161,7 +266,7 @@ class Mt5Handler:
             "symbol": symbol,
             "volume": self._get_volume_with_copied_volume_coefficient(volume, symbol),
             "type": order_type,
-            "price": self.get_market_price_by_order_type_symbol(order_type, symbol),
+            "price": self.get_market_price_by_order_type_symbol(order_type, symbol, force_refresh=True),
             "sl": stop_loss,
             "tp": take_profit,
             "magic": magic_number,
@@ -172,33 +277,21 @@ class Mt5Handler:
         result = self.send_order_request(request)
         if result and (order_ticket := getattr(result, "order", None)):
             self.logger.debug(
-                f"Created order with ticket {order_ticket} (magic number {magic_number})"
-            )
+                "Created order with ticket %s (magic number %s)", order_ticket, magic_number)
         else:
             self.logger.error(
-                f"[Error] Cannot create order \nBot info: {self.get_bot_info()}")
-
-    def get_market_price_by_order_type_symbol(self, mt5_order_type_code, symbol):
-        symbol_info_tick = self.mt5.symbol_info_tick(symbol)
-
-        if not symbol_info_tick:
-            raise Exception("Cannot get tick. Perhaps the market is closed")
-
-        if self.mt5.ORDER_TYPE_SELL == mt5_order_type_code:
-            return self.mt5.symbol_info_tick(symbol).bid
-
-        elif self.mt5.ORDER_TYPE_BUY == mt5_order_type_code:
-            return self.mt5.symbol_info_tick(symbol).ask
+                f"[Error] Cannot create order \nBot info: {self.bot_info}")
+        return result
 
-        else:
-            raise Exception(f"Invalid code: {mt5_order_type_code}")
+    def get_market_price_by_order_type_symbol(self, mt5_order_type_code, symbol, force_refresh=False):
+        return self.quote_snapshot.get_price(mt5_order_type_code, symbol, force_refresh)
 
     def get_ea_login(self):
         account_info = self.mt5.account_info()
         return f'{account_info.login}@{account_info.server}({account_info.name})'
 
     def get_ea_comment(self):
-        return f"EA {self.mt5.account_info().login}"
+        return self.ea_comment
 
     def update_trade(
             self, position_ticket, symbol, stop_loss, take_profit, magic_number
@@ -216,38 +309,87 @@ class Mt5Handler:
         return self.send_order_request(request)
 
     def send_order_request(self, request):
-        self.logger.debug(
-            f"\n\t[Sending request for account {self.get_ea_login()}]\n {request}\n")
-        result = self.mt5.order_send(request)
+        """Send ``request`` and retry it within the cycle when its retcode allows it.
+
+        Requotes and price changes are sent again at the current price, unless
+        an open moved more than ``max_order_slippage_in_pips`` from its first
+        price or no slippage limit is set. An invalid filling falls through the
+        other filling types allowed for the symbol, and rate limits or a lost
+        connection are retried after an exponential backoff. Retries stop after
+        ``max_order_attempts`` or ``order_retry_deadline_in_ms``. The filling
+        type of a successful order is remembered for its symbol until the
+        setting is reloaded.
+        """
+        deadline = time.monotonic() + self.mt5_setting.order_retry_deadline_in_ms / 1000
+        first_price = request.get("price")
+        tried_filling_types = {request.get("type_filling")}
+        attempt = 1
+        result = self._send_order_request(request)
+        while attempt < self.mt5_setting.max_order_attempts and time.monotonic() < deadline:
+            retry_action = Common.ORDER_RETRY_ACTION_BY_RETCODE.get(result.retcode) if result else None
+            if retry_action is None:
+                break
+
+            if retry_action == OrderRetryActionEnum.REPRICE:
+                if first_price is None:
+                    break
+                price = self.get_market_price_by_order_type_symbol(request["type"], request["symbol"], force_refresh=True)
+                max_slippage_in_pips = self.mt5_setting.max_order_slippage_in_pips
+                # Closes are sent again at any price, opens only within the configured slippage
+                if not request.get("position") and (max_slippage_in_pips is None or abs(
+                        price - first_price) > max_slippage_in_pips * self._get_symbol_spec(request["symbol"]).pip_size):
+                    self.logger.warning(
+                        f"Order for {request['symbol']} is not sent again as the price moved from {first_price} "
+                        f"to {price}, over {max_slippage_in_pips} pips")
+                    break
+                request = {**request, "price": price}
+            elif retry_action == OrderRetryActionEnum.NEXT_FILLING_TYPE:
+                if "type_filling" not in request:
+                    break
+                filling_type = next((
+                    filling_type for filling_type in self._get_fallback_filling_types(request["symbol"])
+                    if filling_type not in tried_filling_types), None)
+                if filling_type is None:
+                    break
+                tried_filling_types.add(filling_type)
+                request = {**request, "type_filling": filling_type}
+            else:
+                backoff_in_seconds = min(
+                    self.mt5_setting.order_retry_min_backoff_in_ms / 1000 * 2 ** (attempt - 1),
+                    deadline - time.monotonic())
+                if backoff_in_seconds <= 0:
+                    break
+                time.sleep(backoff_in_seconds)
+
+            attempt += 1
+            self.logger.warning(
+                f"Order for {request.get('symbol')} failed with {self._get_retcode_name(result.retcode)}. "
+                f"Attempt {attempt}/{self.mt5_setting.max_order_attempts} after {retry_action.name}")
+            result = self._send_order_request(request)
+
+        if self.is_successful_result(result):
+            self.position_table.apply_order_result(request, result)
+            if "type_filling" in request:
+                self.symbol_catalog.set_working_filling_type(request["symbol"], request["type_filling"])
         self._validate_result(request, result)
         return result
 
-    def get_history_deal_within_x_days(self, x_days):
-        start_time = datetime.datetime.now(
-            datetime.timezone.utc) - datetime.timedelta(days=x_days)
-        # as this library has with end time.  Perhaps time zone diff
-        end_time = datetime.datetime.now(
-            datetime.timezone.utc) + datetime.timedelta(days=2)
-
-        return self.mt5.history_deals_get(start_time, end_time)
+    def _send_order_request(self, request):
+        self.logger.debug(
+            "\n\t[Sending request for account %s]\n %s\n", self.ea_login, request)
+        sent_at = time.perf_counter()
+        result = self.mt5.order_send(request)
+        latency_in_ms = (time.perf_counter() - sent_at) * 1000
+        self.logger.debug("\tOrder request answered in %.1fms", latency_in_ms)
+        return result
 
-    def get_current_open_position(self):
-        return self.mt5.positions_get()
+    def _get_retcode_name(self, retcode):
+        retcode_enum = self._get_server_enum(retcode)
+        return f"{retcode_enum.name if retcode_enum else 'UNKNOWN'} ({retcode})"
 
     def get_server_time(self):
-        symbol = self.enable_symbol(self.convert_to_broker_symbol_format
-                                    ("EURUSD"))
-        now = datetime.datetime.now(datetime.timezone.utc)
-        ticks = self.mt5.copy_ticks_range(
-            symbol, now - datetime.timedelta(seconds=60), now, self.mt5.COPY_TICKS_ALL)
-
-        if len(ticks) > 0:
-            return ticks[-1][0]
-        else:
-            self.logger.error(
-                "No ticks received. Cannot determine server time.")
-            return None
+        return self.server_clock.now()
 
     def shutdown(self):
-        self.logger.info(f"{self.get_bot_info()}")
+        self.logger.info(f"{self.bot_info}")
         self.mt5.shutdown()
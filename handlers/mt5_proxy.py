@@ -0,0 +1,100 @@
+import threading
+import time
+
+from handlers.constant import Mt5CachePolicyEnum
+
+# Read-only calls answered from the cache, with their invalidation policy and TTL in seconds
+DEFAULT_CACHE_POLICIES = {
+    "version": (Mt5CachePolicyEnum.SESSION, None),
+    "terminal_info": (Mt5CachePolicyEnum.CYCLE, None),
+    "account_info": (Mt5CachePolicyEnum.TTL, 1.0),
+}
+# Calls that change the account or terminal state and drop the cycle and TTL caches
+STATE_CHANGING_CALLS = {"initialize", "login", "shutdown", "order_send", "symbol_select"}
+
+
+class Mt5Proxy:
+    """Memoizes read-only MetaTrader 5 calls and counts the terminal round-trips.
+
+    ``SESSION`` results are kept until the terminal is initialized again,
+    ``CYCLE`` results until the next :meth:`begin_cycle` and ``TTL`` results
+    for their TTL. Empty results are never cached. Each cycle's round-trips
+    are counted, and a warning is logged when a cycle uses more than
+    ``call_budget_per_cycle``.
+    """
+
+    def __init__(self, mt5, logger, metrics=None, call_budget_per_cycle=None, cache_policies=None):
+        self._mt5 = mt5
+        self._logger = logger
+        self._metrics = metrics
+        self.call_budget_per_cycle = call_budget_per_cycle
+        self.cache_policies = DEFAULT_CACHE_POLICIES if cache_policies is None else cache_policies
+        self.call_counts = {}
+        self.cycle_call_counts = {}
+        self.cache_hit_counts = {}
+        self._cached_results = {}
+        self._wrapped_calls = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._mt5, name)
+        if not callable(attribute):
+            return attribute
+
+        wrapped_call = self._wrapped_calls.get(name)
+        if wrapped_call is None:
+            wrapped_call = self._wrapped_calls[name] = self._wrap(name, attribute)
+        return wrapped_call
+
+    def _wrap(self, name, call):
+        cache_policy, ttl_in_seconds = self.cache_policies.get(name, (None, None))
+
+        def proxied_call(*args, **kwargs):
+            if cache_policy is not None:
+                key = (name, args, tuple(sorted(kwargs.items())))
+                cached_result = self._cached_results.get(key)
+                if cached_result is not None and (
+                        cached_result[1] is None or time.monotonic() < cached_result[1]):
+                    with self._lock:
+                        self.cache_hit_counts[name] = self.cache_hit_counts.get(name, 0) + 1
+                    return cached_result[0]
+
+            with self._lock:
+                self.call_counts[name] = self.call_counts.get(name, 0) + 1
+                self.cycle_call_counts[name] = self.cycle_call_counts.get(name, 0) + 1
+            if name in STATE_CHANGING_CALLS:
+                self.invalidate(keep_session=name not in {"initialize", "login", "shutdown"})
+
+            result = call(*args, **kwargs)
+            if cache_policy is not None and result:
+                expires_at = time.monotonic() + ttl_in_seconds \
+                    if cache_policy == Mt5CachePolicyEnum.TTL else None
+                self._cached_results[key] = (result, expires_at, cache_policy)
+            return result
+
+        return proxied_call
+
+    def invalidate(self, keep_session=True):
+        self._cached_results = {
+            key: cached_result for key, cached_result in self._cached_results.items()
+            if keep_session and cached_result[2] == Mt5CachePolicyEnum.SESSION
+        }
+
+    def begin_cycle(self):
+        """Close the accounting of the previous cycle and drop the ``CYCLE`` cache."""
+        with self._lock:
+            cycle_call_counts, self.cycle_call_counts = self.cycle_call_counts, {}
+        self._cached_results = {
+            key: cached_result for key, cached_result in self._cached_results.items()
+            if cached_result[2] != Mt5CachePolicyEnum.CYCLE
+        }
+
+        cycle_call_count = sum(cycle_call_counts.values())
+        if self._metrics:
+            self._metrics.increment("mt5_calls_total", cycle_call_count)
+            self._metrics.observe("mt5_calls_per_cycle", cycle_call_count)
+        if self.call_budget_per_cycle is not None and cycle_call_count > self.call_budget_per_cycle:
+            self._logger.warning(
+                f"The last cycle made {cycle_call_count} terminal calls, over the budget of "
+                f"{self.call_budget_per_cycle}: {dict(sorted(cycle_call_counts.items(), key=lambda item: -item[1]))}")
+        return cycle_call_counts
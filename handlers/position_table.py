@@ -0,0 +1,112 @@
+import time
+from collections import namedtuple
+
+# Position fields read by the handlers, for positions updated from our own order results
+CachedPosition = namedtuple(
+    "CachedPosition", ["ticket", "time", "type", "magic", "identifier", "volume", "price_open", "sl", "tp",
+                       "symbol", "comment"])
+
+
+class PositionTable:
+    """Open positions of the account, downloaded again only when the account changed.
+
+    Each refresh polls ``positions_total``. ``positions_get`` is only called
+    when the count differs from the table, when the deal history brought deals
+    other than the ones of our own orders, or every
+    ``full_refresh_interval_in_seconds`` to catch changes without a deal, such
+    as a stop loss moved by hand. Results of our own ``order_send`` calls are
+    applied to the table right away, so they do not force a download.
+    Pending orders are not polled: one only opens a position by filling,
+    which adds a deal.
+    """
+
+    def __init__(self, mt5, logger, full_refresh_interval_in_seconds):
+        self.mt5 = mt5
+        self.logger = logger
+        self.full_refresh_interval_in_seconds = full_refresh_interval_in_seconds
+        self._positions_by_ticket = {}
+        self._expected_deal_tickets = set()
+        self._fetched_at = None
+        self._is_stale = True
+        self.is_fetched = False
+        self.fetched_at_time = None
+
+    @property
+    def positions(self):
+        return tuple(self._positions_by_ticket.values())
+
+    def invalidate(self):
+        self._is_stale = True
+
+    def refresh(self, new_deals, is_deal_history_reloaded):
+        """Bring the table up to date; ``is_fetched`` tells whether the positions were downloaded."""
+        self.is_fetched = False
+        positions_total = self.mt5.positions_total()
+        unexpected_deals = [deal for deal in new_deals if deal.ticket not in self._expected_deal_tickets]
+        self._expected_deal_tickets.clear()
+
+        if (self._is_stale or is_deal_history_reloaded or unexpected_deals
+                or positions_total is None or positions_total != len(self._positions_by_ticket)
+                or time.monotonic() - self._fetched_at >= self.full_refresh_interval_in_seconds):
+            return self.fetch()
+        return False
+
+    def fetch(self):
+        positions = self.mt5.positions_get()
+        if positions is None:
+            self._is_stale = True
+            self.logger.error(f"Cannot get open positions: {self.mt5.last_error()}")
+            return False
+
+        self._positions_by_ticket = {position.ticket: position for position in positions}
+        self._fetched_at = time.monotonic()
+        self.fetched_at_time = time.time()
+        self._is_stale = False
+        self.is_fetched = True
+        return True
+
+    def apply_order_result(self, request, result):
+        """Apply the successful ``order_send`` result of ``request`` to the table."""
+        if result.deal:
+            self._expected_deal_tickets.add(result.deal)
+
+        position_ticket = request.get("position")
+        if request.get("action") == self.mt5.TRADE_ACTION_SLTP:
+            position = self._positions_by_ticket.get(position_ticket)
+            if position is None:
+                self._is_stale = True
+                return
+            self._positions_by_ticket[position_ticket] = self._to_cached_position(
+                position, sl=request.get("sl", position.sl), tp=request.get("tp", position.tp))
+            return
+
+        if request.get("action") != self.mt5.TRADE_ACTION_DEAL or not result.volume:
+            self._is_stale = True
+            return
+
+        if position_ticket:
+            position = self._positions_by_ticket.get(position_ticket)
+            if position is None:
+                self._is_stale = True
+            elif result.volume >= position.volume:
+                del self._positions_by_ticket[position_ticket]
+            else:
+                self._positions_by_ticket[position_ticket] = self._to_cached_position(
+                    position, volume=round(position.volume - result.volume, 8))
+            return
+
+        if not result.order:
+            self._is_stale = True
+            return
+        # The position of a market order takes the ticket of the order
+        self._positions_by_ticket[result.order] = CachedPosition(
+            result.order, int(time.time()), request["type"], request.get("magic", 0), result.order, result.volume,
+            result.price, request.get("sl", 0.0), request.get("tp", 0.0), request["symbol"],
+            request.get("comment", ""))
+
+    @staticmethod
+    def _to_cached_position(position, **changes):
+        return CachedPosition(**{
+            field: changes[field] if field in changes else getattr(position, field)
+            for field in CachedPosition._fields
+        })
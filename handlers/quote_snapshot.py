@@ -0,0 +1,45 @@
+import time
+
+
+class QuoteSnapshot:
+    """Keeps one ``symbol_info_tick`` per symbol for the current cycle.
+
+    Validation and order pricing read the same tick. A tick older than
+    ``max_quote_age_in_ms`` is fetched again, and callers about to send an
+    order pass ``force_refresh`` to get the latest price.
+    """
+
+    def __init__(self, mt5, max_quote_age_in_ms):
+        self.mt5 = mt5
+        self.max_quote_age_in_seconds = max_quote_age_in_ms / 1000
+        self._ticks = {}
+
+    def begin_cycle(self):
+        self._ticks.clear()
+
+    def get_tick(self, symbol, force_refresh=False):
+        now = time.monotonic()
+        if not force_refresh:
+            cached_tick = self._ticks.get(symbol)
+            if cached_tick is not None and now - cached_tick[0] <= self.max_quote_age_in_seconds:
+                return cached_tick[1]
+
+        tick = self.mt5.symbol_info_tick(symbol)
+        if not tick:
+            self._ticks.pop(symbol, None)
+            raise Exception("Cannot get tick. Perhaps the market is closed")
+
+        self._ticks[symbol] = (now, tick)
+        return tick
+
+    def get_price(self, mt5_order_type_code, symbol, force_refresh=False):
+        tick = self.get_tick(symbol, force_refresh)
+
+        if self.mt5.ORDER_TYPE_SELL == mt5_order_type_code:
+            return tick.bid
+
+        elif self.mt5.ORDER_TYPE_BUY == mt5_order_type_code:
+            return tick.ask
+
+        else:
+            raise Exception(f"Invalid code: {mt5_order_type_code}")
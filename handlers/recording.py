@@ -0,0 +1,304 @@
+import datetime
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from collections import deque, namedtuple
+
+import requests
+
+from handlers.controller_client import ControllerResponse
+
+RECORDING_FORMAT_VERSION = 1
+# Call arguments and settings never written to a recording
+SECRET_ARGUMENTS = {"password"}
+MASKED_VALUE = "***"
+# Request fields an order_send result is matched by; prices and filling types vary between runs
+ORDER_REQUEST_KEY_FIELDS = ("action", "symbol", "type", "magic", "position")
+
+
+def to_recorded(value):
+    """Convert a MetaTrader 5 value into JSON, keeping the type name of named tuples."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, datetime.datetime):
+        return {"_dt": value.timestamp()}
+    if hasattr(value, "_asdict"):
+        recorded = {"_t": type(value).__name__}
+        for field_name, field_value in value._asdict().items():
+            recorded[field_name] = to_recorded(field_value)
+        return recorded
+    if isinstance(value, dict):
+        return {str(key): to_recorded(field_value) for key, field_value in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_recorded(item) for item in value]
+    return repr(value)
+
+
+_recorded_types = {}
+
+
+def from_recorded(value):
+    if isinstance(value, list):
+        return tuple(from_recorded(item) for item in value)
+    if not isinstance(value, dict):
+        return value
+    if "_dt" in value and len(value) == 1:
+        return datetime.datetime.fromtimestamp(value["_dt"], datetime.timezone.utc)
+
+    type_name = value.get("_t")
+    fields = {key: from_recorded(field_value) for key, field_value in value.items() if key != "_t"}
+    if type_name is None:
+        return fields
+    recorded_type = _recorded_types.get((type_name, tuple(fields)))
+    if recorded_type is None:
+        recorded_type = _recorded_types[(type_name, tuple(fields))] = namedtuple(type_name, fields)
+    return recorded_type(**fields)
+
+
+def mask_secrets(values: dict):
+    return {key: MASKED_VALUE if key in SECRET_ARGUMENTS else value for key, value in values.items()}
+
+
+def describe_decision(cycle, intent, result):
+    """Return the diffable record of an executed order intent."""
+    parameters = getattr(intent.execute, "keywords", None) or {}
+    return {
+        "cycle": cycle,
+        "intent": intent.intent_type.name,
+        "key": list(intent.key),
+        "master_trader_id": str(intent.master_trader_id),
+        "description": intent.description,
+        "parameters": {
+            key: value for key, value in sorted(parameters.items())
+            if value is None or isinstance(value, (bool, int, float, str))
+        },
+        "retcode": getattr(result, "retcode", None),
+    }
+
+
+class Recorder:
+    """Writes what a terminal process sees to a gzip compressed JSON lines file.
+
+    Events are buffered in memory and written at the end of each cycle, so a
+    recording cut short by a crash still holds every finished cycle. Events
+    recorded before the first cycle belong to the set-up of the bot.
+    """
+
+    def __init__(self, recording_path):
+        self.recording_path = recording_path
+        os.makedirs(os.path.dirname(recording_path) or ".", exist_ok=True)
+        self._file = gzip.open(recording_path, "wt", encoding="utf-8")
+        self._events = []
+        self._lock = threading.Lock()
+        self.cycle = 0
+
+    def _add(self, event):
+        line = json.dumps(event, separators=(",", ":"), default=repr)
+        with self._lock:
+            self._events.append(line)
+
+    def write_header(self, bot_config: dict, mt5_setting: dict, constants, magic_numbers, journal_entries):
+        self._file.write(json.dumps({
+            "e": "header",
+            "version": RECORDING_FORMAT_VERSION,
+            "time": time.time(),
+            "bot_config": bot_config,
+            "mt5_setting": mask_secrets(mt5_setting),
+            "constants": constants,
+            "magic_numbers": magic_numbers,
+            "journal": journal_entries,
+        }, default=repr) + "\n")
+        self.flush()
+
+    def record_call(self, name, args, kwargs, result):
+        self._add({"e": "call", "n": name, "a": to_recorded(args),
+                   "k": to_recorded(mask_secrets(kwargs)), "r": to_recorded(result)})
+
+    def begin_cycle(self, server_time_offset_in_seconds):
+        self.cycle += 1
+        self._add({"e": "cycle", "t": time.time(), "m": time.monotonic(), "o": server_time_offset_in_seconds})
+
+    def record_response(self, source, resp):
+        self._add({"e": "response", "s": source, "c": resp.status_code, "p": resp.payload, "i": resp.is_modified,
+                   "f": resp.fetched_at})
+
+    def record_setting(self, mt5_setting: dict):
+        self._add({"e": "setting", "s": mask_secrets(mt5_setting)})
+
+    def record_decision(self, intent, result):
+        self._add({"e": "decision", **describe_decision(self.cycle, intent, result)})
+
+    def flush(self):
+        with self._lock:
+            events, self._events = self._events, []
+        for line in events:
+            self._file.write(line + "\n")
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+def read_recording(recording_path):
+    """Yield the events of a recording, up to the last complete one."""
+    try:
+        with gzip.open(recording_path, "rt", encoding="utf-8") as recording:
+            for line in recording:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    return
+    except (EOFError, zlib.error):
+        # The process was stopped while writing, the flushed cycles are complete
+        return
+
+
+class RecordingMt5:
+    """Passes MetaTrader 5 calls through and records their arguments and results.
+
+    Only calls made on the thread that created it, the trading loop, are
+    recorded. A call from another thread cannot be placed in a cycle, so it
+    is passed through unrecorded.
+    """
+
+    def __init__(self, mt5, recorder: Recorder):
+        self._mt5 = mt5
+        self._recorder = recorder
+        self._wrapped_calls = {}
+        self._thread_id = threading.get_ident()
+
+    def get_constants(self):
+        return {
+            name: getattr(self._mt5, name) for name in dir(self._mt5)
+            if name.isupper() and isinstance(getattr(self._mt5, name), int)
+        }
+
+    def __getattr__(self, name):
+        attribute = getattr(self._mt5, name)
+        if not callable(attribute):
+            return attribute
+
+        wrapped_call = self._wrapped_calls.get(name)
+        if wrapped_call is None:
+            wrapped_call = self._wrapped_calls[name] = self._wrap(name, attribute)
+        return wrapped_call
+
+    def _wrap(self, name, call):
+        recorder = self._recorder
+
+        def recorded_call(*args, **kwargs):
+            result = call(*args, **kwargs)
+            if threading.get_ident() == self._thread_id:
+                recorder.record_call(name, args, kwargs, result)
+            return result
+
+        return recorded_call
+
+
+class ReplayMt5:
+    """Answers MetaTrader 5 calls from a recording, one cycle at a time.
+
+    A call gets the next result recorded in the current cycle for the same
+    function and arguments. Dates are left out of the match, as they come
+    from the wall clock. ``order_send`` results are matched by the action,
+    symbol, type, magic number and position of the request. A call the
+    recording has no result for in this cycle gets the last result of the
+    same call, then of the same function, or None.
+    """
+
+    def __init__(self, constants):
+        self._constants = constants
+        self._results = {}
+        self._last_results = {}
+        self._last_results_by_name = {}
+        self.unmatched_call_counts = {}
+
+    @staticmethod
+    def get_call_key(name, args, kwargs):
+        if name == "order_send":
+            request = args[0] if args else kwargs.get("request", {})
+            return (name,) + tuple(request.get(field) for field in ORDER_REQUEST_KEY_FIELDS)
+        recorded_args = [None if isinstance(arg, dict) and "_dt" in arg else arg for arg in args]
+        recorded_kwargs = {
+            key: None if isinstance(value, dict) and "_dt" in value else value
+            for key, value in mask_secrets(kwargs).items()
+        }
+        return name, json.dumps([recorded_args, recorded_kwargs], sort_keys=True, default=repr)
+
+    def load_cycle(self, call_events):
+        self._results = {}
+        for event in call_events:
+            key = self.get_call_key(event["n"], event["a"], event["k"])
+            self._results.setdefault(key, deque()).append(event["r"])
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self._constants:
+            return self._constants[name]
+
+        def replayed_call(*args, **kwargs):
+            key = self.get_call_key(name, to_recorded(args), to_recorded(kwargs))
+            results = self._results.get(key)
+            if results:
+                result = results.popleft()
+                self._last_results[key] = self._last_results_by_name[name] = result
+            elif key in self._last_results:
+                result = self._last_results[key]
+            else:
+                self.unmatched_call_counts[name] = self.unmatched_call_counts.get(name, 0) + 1
+                result = self._last_results_by_name.get(name)
+            return from_recorded(result)
+
+        return replayed_call
+
+
+class ReplaySignalSource:
+    """Serves the controller responses of the current recorded cycle.
+
+    It takes the place of the shared signal receiver, so sources are read in
+    order without network calls. A source that did not answer in the recorded
+    cycle is unavailable.
+    """
+
+    def __init__(self):
+        self.responses = {}
+
+    def load_cycle(self, response_events):
+        self.responses = {
+            event["s"]: ControllerResponse(event["c"], event["p"], event["i"], event.get("f"))
+            for event in response_events}
+
+    def get(self, source):
+        return self.responses.get(source) or ControllerResponse(
+            requests.codes.service_unavailable, None, True)
+
+    def wait_for_next_cycle(self, has_changes, has_pending_signals=False):
+        return
+
+
+class VirtualClock:
+    """Replaces ``time.time`` and ``time.monotonic`` with a clock set by the replay."""
+
+    def __init__(self, wall_time, monotonic_time=0.0):
+        self.wall_time = wall_time
+        self.monotonic_time = monotonic_time
+        self._original_time = None
+        self._original_monotonic = None
+
+    def set(self, wall_time, monotonic_time):
+        self.wall_time = wall_time
+        self.monotonic_time = monotonic_time
+
+    def __enter__(self):
+        self._original_time, self._original_monotonic = time.time, time.monotonic
+        time.time = lambda: self.wall_time
+        time.monotonic = lambda: self.monotonic_time
+        return self
+
+    def __exit__(self, *exc_info):
+        time.time, time.monotonic = self._original_time, self._original_monotonic
@@ -0,0 +1,101 @@
+import time
+from collections import deque
+
+
+class ServerClock:
+    """Estimates the offset between the trade server clock and the local clock.
+
+    Samples come from ``symbol_info_tick`` of a few liquid symbols. A tick only
+    counts as a sample when its time moved since the previous read. Until the
+    first such sample, a tick within ``QUARTER_HOUR_TOLERANCE_IN_SECONDS`` of a
+    whole quarter-hour offset bootstraps the estimate, as broker time zones are
+    quarter-hour aligned. During quiet markets the last offset is kept.
+
+    Sampling runs on the trading loop through :meth:`refresh_if_due`, so its
+    terminal calls never overlap the calls of a cycle and are accounted to it.
+    """
+
+    QUARTER_HOUR_IN_SECONDS = 900
+    QUARTER_HOUR_TOLERANCE_IN_SECONDS = 60
+    MAX_SAMPLES = 20
+
+    def __init__(self, mt5, logger, symbols, refresh_interval_in_seconds, max_offset_age_in_seconds):
+        self.mt5 = mt5
+        self.logger = logger
+        self.symbols = list(symbols)
+        self.refresh_interval_in_seconds = refresh_interval_in_seconds
+        self.max_offset_age_in_seconds = max_offset_age_in_seconds
+        self.offset_in_seconds = None
+        self._samples = deque(maxlen=self.MAX_SAMPLES)
+        self._last_tick_time_msc = {}
+        self._last_sampled_at = None
+        self._refreshed_at = None
+        self._is_stale_reported = False
+
+    def _snap_to_quarter_hour(self, raw_offset_in_seconds):
+        snapped_offset = round(
+            raw_offset_in_seconds / self.QUARTER_HOUR_IN_SECONDS) * self.QUARTER_HOUR_IN_SECONDS
+        if abs(raw_offset_in_seconds - snapped_offset) <= self.QUARTER_HOUR_TOLERANCE_IN_SECONDS:
+            return snapped_offset
+        return None
+
+    def refresh(self):
+        self._refreshed_at = time.monotonic()
+        sampled = False
+        for symbol in self.symbols:
+            tick = self.mt5.symbol_info_tick(symbol)
+            local_time = time.time()
+            if not tick or not tick.time_msc:
+                continue
+
+            raw_offset = tick.time_msc / 1000 - local_time
+            previous_tick_time_msc = self._last_tick_time_msc.get(symbol)
+            self._last_tick_time_msc[symbol] = tick.time_msc
+
+            if previous_tick_time_msc is not None and tick.time_msc > previous_tick_time_msc:
+                self._add_sample(local_time, raw_offset)
+                sampled = True
+            elif self.offset_in_seconds is None and (snapped_offset := self._snap_to_quarter_hour(raw_offset)) is not None:
+                self.offset_in_seconds = snapped_offset
+                self._last_sampled_at = local_time
+                sampled = True
+
+        if sampled:
+            self._is_stale_reported = False
+        elif self.is_stale() and not self._is_stale_reported:
+            self._is_stale_reported = True
+            self.logger.warning(
+                f"No fresh tick on {self.symbols} for {self.max_offset_age_in_seconds}s. "
+                f"Keep using server time offset {self.offset_in_seconds}s")
+        return sampled
+
+    def _add_sample(self, local_time, offset_in_seconds):
+        self._samples.append((local_time, offset_in_seconds))
+        # A tick is stamped before it reaches us, so the largest recent offset is the closest one
+        self.offset_in_seconds = max(offset for _, offset in self._samples)
+        self._last_sampled_at = local_time
+
+    def is_stale(self):
+        return self._last_sampled_at is None or time.time() - self._last_sampled_at > self.max_offset_age_in_seconds
+
+    def now(self):
+        if self.offset_in_seconds is None:
+            return None
+        return time.time() + self.offset_in_seconds
+
+    def refresh_if_due(self):
+        """Refresh the offset once ``refresh_interval_in_seconds`` passed since the last refresh."""
+        if self._refreshed_at is not None and \
+                time.monotonic() - self._refreshed_at < self.refresh_interval_in_seconds:
+            return False
+        try:
+            return self.refresh()
+        except Exception as e:
+            self.logger.error(f"Cannot refresh server time offset: {e}")
+            return False
+
+    def start(self):
+        self.refresh()
+        if self.offset_in_seconds is None:
+            self.logger.error(
+                f"No ticks received on {self.symbols}. Cannot determine server time yet.")
@@ -0,0 +1,68 @@
+from dataclasses import fields
+
+from handlers.classes import MasterTrader, TradeSignal
+
+# Fields sent by the controller, in TradeSignal constructor order
+TRADE_SIGNAL_PAYLOAD_FIELDS = tuple(
+    field.name for field in fields(TradeSignal) if field.name not in {
+        "magic_numbers", "legacy_magic_number", "time_diff", "price_diff"}
+)
+
+
+class SignalDecoder:
+    """Decodes controller payloads into :class:`MasterTrader` records.
+
+    The ``TradeSignal`` of a signal whose ``id`` and fields are unchanged since
+    the previous payload of the same source is reused instead of rebuilt. The
+    payload itself is left untouched.
+    """
+
+    def __init__(self, mt5_handler, logger):
+        self.mt5_handler = mt5_handler
+        self.logger = logger
+        self._signals_by_source = {}
+
+    def decode(self, source_id, master_traders_from_api) -> list[MasterTrader]:
+        known_signals = self._signals_by_source.get(source_id, {})
+        decoded_signals = {}
+        master_traders = []
+        for master_trader_from_api in master_traders_from_api:
+            master_trader = MasterTrader(
+                source=master_trader_from_api['source'], external_trader_id=master_trader_from_api['external_trader_id'], signals=[])
+
+            for signal_from_api in master_trader_from_api["signals"]:
+                signal_values = tuple(
+                    map(signal_from_api.get, TRADE_SIGNAL_PAYLOAD_FIELDS))
+                known_signal = known_signals.get(signal_values[0])
+                if known_signal is not None and known_signal[0] == signal_values:
+                    signal = known_signal[1]
+                else:
+                    signal = self._build_signal(
+                        master_trader, signal_values)
+                    if signal is None:
+                        continue
+
+                decoded_signals[signal_values[0]] = (signal_values, signal)
+                master_trader.signals.append(signal)
+
+            master_traders.append(master_trader)
+
+        self._signals_by_source[source_id] = decoded_signals
+        return master_traders
+
+    def invalidate(self):
+        self._signals_by_source.clear()
+
+    def _build_signal(self, master_trader, signal_values):
+        signal = TradeSignal(*signal_values)
+        signal.symbol = self.mt5_handler.convert_to_broker_symbol_format(
+            signal.symbol)
+        try:
+            self.mt5_handler.enable_symbol(signal.symbol)
+        except Exception as e:
+            self.logger.debug(
+                "Signal %s:%s will be IGNORED as we cannot enable this symbol as %s",
+                master_trader.external_trader_id, signal.external_signal_id, e)
+            master_trader.invalid_symbol_signal_count += 1
+            return None
+        return signal
@@ -0,0 +1,220 @@
+import datetime
+import queue
+import time
+
+import requests
+
+from handlers.classes import BotConfig, Mt5Setting
+from handlers.controller_client import ControllerClient, ControllerResponse
+from handlers.logger import Logger
+from handlers.signal_transport import LongPollingTransport, build_signal_transport
+
+
+def collect_master_trader_subscriptions(mt5_settings: list[Mt5Setting]):
+    subscriptions = {}
+    for mt5_setting in mt5_settings:
+        for source, master_trader_ids in mt5_setting.master_traders.items():
+            subscriptions.setdefault(source, set()).update(
+                str(master_trader_id) for master_trader_id in master_trader_ids or [])
+    return {
+        source: sorted(master_trader_ids)
+        for source, master_trader_ids in subscriptions.items() if master_trader_ids
+    }
+
+
+class SharedSignalFetcher:
+    """Polls the controller once for every terminal process.
+
+    The union of the master traders followed by all terminals is fetched per
+    source. After every fetch, each worker queue receives the time each of its
+    sources was last fetched successfully, and the slice of master traders its
+    terminal follows when that slice changed. A source that keeps failing
+    thus reaches the worker as an ageing payload.
+
+    ``control_queue`` carries ``(WORKER_QUEUE, bot_name, queue)`` when a worker
+    is (re)started with a new queue, which then receives the full slice, and
+    ``(MT5_SETTINGS, mt5_settings)`` when the terminals were reconfigured.
+    """
+
+    WORKER_QUEUE = "worker_queue"
+    MT5_SETTINGS = "mt5_settings"
+
+    def __init__(self, bot_config: BotConfig, mt5_settings: list[Mt5Setting], worker_queues, control_queue=None):
+        self.bot_config = bot_config
+        self.control_queue = control_queue
+        self.worker_queues = dict(worker_queues)
+        self.signal_transport = None
+        self._sent_payloads = {}
+        self._fetched_at_by_source = {}
+        self.set_mt5_settings(mt5_settings)
+
+    def set_mt5_settings(self, mt5_settings: list[Mt5Setting]):
+        self.subscriptions = collect_master_trader_subscriptions(mt5_settings)
+        self.worker_subscriptions = {
+            mt5_setting.bot_name: {
+                source: {str(master_trader_id)
+                         for master_trader_id in master_trader_ids or []}
+                for source, master_trader_ids in mt5_setting.master_traders.items()
+            }
+            for mt5_setting in mt5_settings
+        }
+        for bot_name in set(self.worker_queues) - set(self.worker_subscriptions):
+            del self.worker_queues[bot_name]
+            self._sent_payloads.pop(bot_name, None)
+        if isinstance(self.signal_transport, LongPollingTransport):
+            self.signal_transport.sources = list(self.subscriptions)
+
+    def _fetch(self, controller_client, logger):
+        payloads = {}
+        has_changes = False
+        for source, master_trader_ids in self.subscriptions.items():
+            params = {"source": source,
+                      "external_trader_ids": ','.join(master_trader_ids)}
+            try:
+                resp = controller_client.get(
+                    "/master_traders/", params=params)
+            except requests.RequestException as e:
+                logger.error(
+                    f"Cannot get data of source {source} from server: {e}")
+                continue
+
+            if resp.status_code not in [requests.codes.created, requests.codes.ok]:
+                logger.error(
+                    f"Cannot get data of source {source} from server. Status code {resp.status_code}")
+                continue
+
+            payloads[source] = resp.payload or []
+            self._fetched_at_by_source[source] = time.time()
+            has_changes = has_changes or resp.is_modified
+        return payloads, has_changes
+
+    def apply_control_message(self, message):
+        if message[0] == self.WORKER_QUEUE:
+            _, bot_name, worker_queue = message
+            self.worker_queues[bot_name] = worker_queue
+            self._sent_payloads.pop(bot_name, None)
+        elif message[0] == self.MT5_SETTINGS:
+            self.set_mt5_settings(message[1])
+
+    def _apply_control_messages(self, logger):
+        while self.control_queue is not None:
+            try:
+                message = self.control_queue.get_nowait()
+            except queue.Empty:
+                return
+            self.apply_control_message(message)
+            logger.info(
+                f"Fetch {self.subscriptions} for {list(self.worker_queues)}")
+
+    def _publish(self, payloads):
+        for bot_name, worker_queue in self.worker_queues.items():
+            if bot_name not in self.worker_subscriptions:
+                continue
+            worker_payloads = {
+                source: [
+                    master_trader for master_trader in payloads[source]
+                    if str(master_trader["external_trader_id"]) in master_trader_ids
+                ]
+                for source, master_trader_ids in self.worker_subscriptions[bot_name].items()
+                if source in payloads
+            }
+            sent_payloads = self._sent_payloads.setdefault(bot_name, {})
+            modified_sources = {
+                source for source, worker_payload in worker_payloads.items()
+                if sent_payloads.get(source) != worker_payload
+            }
+            fetched_at_by_source = {
+                source: self._fetched_at_by_source.get(source) for source in self.worker_subscriptions[bot_name]}
+            if modified_sources:
+                sent_payloads.update(worker_payloads)
+            else:
+                worker_payloads = {}
+            worker_queue.put((worker_payloads, modified_sources, fetched_at_by_source))
+
+    def run(self):
+        formatted_date = datetime.datetime.now().strftime("%Y-%m-%d_%H_%M_%S")
+        logger = Logger(
+            logger_name="shared_signal_fetcher",
+            log_file_path=f"{self.bot_config.log_folder_path}/shared_signal_fetcher/{formatted_date}.log",
+            message_prefix="shared_signal_fetcher", log_level=self.bot_config.log_level,
+            log_format=self.bot_config.log_format, max_file_size_in_mb=self.bot_config.log_max_file_size_in_mb,
+            backup_count=self.bot_config.log_backup_count,
+            rotation_interval_in_hours=self.bot_config.log_rotation_interval_in_hours,
+        ).get_logger()
+        controller_client = ControllerClient(
+            self.bot_config.base_controller_url, logger,
+            connect_timeout_in_seconds=self.bot_config.controller_connect_timeout_in_seconds,
+            read_timeout_in_seconds=self.bot_config.controller_read_timeout_in_seconds,
+            max_retries=self.bot_config.controller_max_retries,
+        )
+        self.signal_transport = build_signal_transport(
+            self.bot_config, list(self.subscriptions), controller_client, logger)
+        logger.info(
+            f"Fetch {self.subscriptions} for {list(self.worker_queues)}")
+
+        try:
+            while True:
+                self._apply_control_messages(logger)
+                payloads, has_changes = self._fetch(controller_client, logger)
+                self._publish(payloads)
+                self.signal_transport.wait_for_next_cycle(has_changes)
+        finally:
+            controller_client.close()
+            logger.close()
+
+
+class SharedSignalReceiver:
+    """Worker side of the :class:`SharedSignalFetcher`.
+
+    It doubles as the signal transport of the worker: waiting for the next
+    cycle means waiting for the next modified payload on the queue, or at most
+    ``max_wait_in_seconds`` so pending signals are validated again. Responses
+    carry the time their payload was fetched. Only the first update is waited
+    for; a source the fetcher has not fetched yet is then unavailable.
+    """
+
+    def __init__(self, signal_queue, max_wait_in_seconds):
+        self.signal_queue = signal_queue
+        self.max_wait_in_seconds = max_wait_in_seconds
+        self.payloads = {}
+        self.modified_sources = set()
+        self.fetched_at_by_source = {}
+        self._is_received = False
+
+    def _apply(self, message):
+        payloads, modified_sources, fetched_at_by_source = message
+        self.payloads.update(payloads)
+        self.modified_sources.update(modified_sources)
+        self.fetched_at_by_source.update(fetched_at_by_source)
+        self._is_received = True
+        return bool(modified_sources)
+
+    def _receive(self, timeout):
+        """Apply the queued updates, waiting up to ``timeout`` for the first; return whether one was modified."""
+        try:
+            is_modified = self._apply(self.signal_queue.get(timeout=timeout))
+        except queue.Empty:
+            return False
+
+        while True:
+            try:
+                is_modified = self._apply(self.signal_queue.get_nowait()) or is_modified
+            except queue.Empty:
+                return is_modified
+
+    def wait_for_next_cycle(self, has_changes, has_pending_signals=False):
+        deadline = time.monotonic() + self.max_wait_in_seconds
+        while (timeout := deadline - time.monotonic()) > 0:
+            if self._receive(timeout):
+                return
+
+    def get(self, source):
+        if not self._is_received:
+            self._receive(self.max_wait_in_seconds)
+        if source not in self.payloads:
+            return ControllerResponse(requests.codes.service_unavailable, None, True)
+
+        is_modified = source in self.modified_sources
+        self.modified_sources.discard(source)
+        return ControllerResponse(
+            requests.codes.ok, self.payloads[source], is_modified, self.fetched_at_by_source.get(source))
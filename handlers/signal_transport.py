@@ -0,0 +1,114 @@
+import time
+
+import requests
+
+from handlers.classes import BotConfig
+from handlers.constant import SignalTransportEnum
+from handlers.controller_client import ControllerClient
+
+
+class PollingTransport:
+    """Waits between cycles with an interval adapted to signal activity.
+
+    The interval drops to ``min_interval_in_seconds`` as soon as a cycle sees a
+    change or leaves signals pending, and doubles on every idle cycle up to
+    ``max_interval_in_seconds``.
+    """
+
+    def __init__(self, min_interval_in_seconds, max_interval_in_seconds, backoff_factor=2.0):
+        self.min_interval_in_seconds = min_interval_in_seconds
+        self.max_interval_in_seconds = max(
+            max_interval_in_seconds, min_interval_in_seconds)
+        self.backoff_factor = backoff_factor
+        self.interval_in_seconds = min_interval_in_seconds
+
+    def wait_for_next_cycle(self, has_changes, has_pending_signals=False):
+        if has_changes or has_pending_signals:
+            self.interval_in_seconds = self.min_interval_in_seconds
+        else:
+            self.interval_in_seconds = min(
+                self.interval_in_seconds * self.backoff_factor, self.max_interval_in_seconds)
+        time.sleep(self.interval_in_seconds)
+
+
+class LongPollingTransport:
+    """Blocks on the controller ``/master_traders/changes/`` endpoint between cycles.
+
+    The controller answers as soon as a signal of one of ``sources`` changes
+    after ``cursor``, or with 204 once ``timeout_in_seconds`` elapsed. While
+    signals or order intents are pending, the polling transport waits instead
+    so they are checked again within its interval; changes made meanwhile are
+    returned by the next long poll from the same cursor. When the endpoint
+    fails, or answers with a body that cannot be decoded, the polling
+    transport is used until the next retry.
+    """
+
+    PATH = "/master_traders/changes/"
+    # Answers arriving faster than this are throttled so a flapping feed cannot spin the loop
+    MIN_CYCLE_INTERVAL_IN_SECONDS = 0.05
+    RETRY_AFTER_FAILURE_IN_SECONDS = 60
+
+    def __init__(self, controller_client: ControllerClient, sources, timeout_in_seconds,
+                 fallback_transport: PollingTransport, logger):
+        self.controller_client = controller_client
+        self.sources = sources
+        self.timeout_in_seconds = timeout_in_seconds
+        self.fallback_transport = fallback_transport
+        self.logger = logger
+        self.cursor = None
+        self._retry_at = 0.0
+        self._last_returned_at = 0.0
+
+    def wait_for_next_cycle(self, has_changes, has_pending_signals=False):
+        if has_pending_signals or time.monotonic() < self._retry_at:
+            return self.fallback_transport.wait_for_next_cycle(has_changes, has_pending_signals)
+
+        throttle = self.MIN_CYCLE_INTERVAL_IN_SECONDS - \
+            (time.monotonic() - self._last_returned_at)
+        if throttle > 0:
+            time.sleep(throttle)
+
+        params = {"sources": ",".join(self.sources),
+                  "timeout": self.timeout_in_seconds}
+        if self.cursor is not None:
+            params["cursor"] = self.cursor
+
+        try:
+            resp = self.controller_client.get(
+                self.PATH, params=params, max_retries=0, conditional=False,
+                timeout=(self.controller_client.timeout[0], self.timeout_in_seconds + 5))
+        except (requests.RequestException, ValueError) as e:
+            # A malformed body fails JSON decoding with a ValueError
+            return self._fall_back(f"{e}", has_changes)
+
+        if resp.status_code == requests.codes.ok:
+            if resp.payload is not None and not isinstance(resp.payload, dict):
+                return self._fall_back(f"unexpected body {resp.payload!r}", has_changes)
+            self.cursor = (resp.payload or {}).get("cursor", self.cursor)
+        elif resp.status_code != requests.codes.no_content:
+            return self._fall_back(f"status code {resp.status_code}", has_changes)
+
+        self._last_returned_at = time.monotonic()
+
+    def _fall_back(self, reason, has_changes):
+        self.logger.error(
+            f"Long polling {self.PATH} failed with {reason}. "
+            f"Use polling for {self.RETRY_AFTER_FAILURE_IN_SECONDS}s")
+        self._retry_at = time.monotonic() + self.RETRY_AFTER_FAILURE_IN_SECONDS
+        return self.fallback_transport.wait_for_next_cycle(has_changes)
+
+
+def build_signal_transport(bot_config: BotConfig, sources, controller_client: ControllerClient, logger):
+    polling_transport = PollingTransport(
+        bot_config.min_poll_interval_in_seconds, bot_config.max_poll_interval_in_seconds)
+
+    if bot_config.signal_transport == SignalTransportEnum.POLLING.value:
+        return polling_transport
+
+    if bot_config.signal_transport == SignalTransportEnum.LONG_POLLING.value:
+        return LongPollingTransport(controller_client, sources,
+                                    bot_config.long_poll_timeout_in_seconds, polling_transport, logger)
+
+    raise Exception(
+        f'Unknown signal transport {bot_config.signal_transport}. '
+        f'Use one of {[transport.value for transport in SignalTransportEnum]}')
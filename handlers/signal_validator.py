@@ -0,0 +1,90 @@
+import datetime
+import time
+from collections import namedtuple
+
+import dateutil.parser
+import numpy as np
+
+from handlers.classes import TradeSignal, TradeType
+from handlers.constant import SignalRejectReasonEnum
+
+SignalValidation = namedtuple(
+    "SignalValidation", ["accepted", "reasons", "price_differences_in_pips", "ages_in_seconds", "current_prices"])
+
+
+class SignalValidator:
+    """Checks the age and price deviation of a batch of signals in one pass.
+
+    Prices come from the cycle quote snapshot and deviations are measured in
+    pips of each symbol: ``10 * point`` for 3 and 5 digit quotes, ``point``
+    otherwise. A signal is rejected as ``TOO_OLD`` before its price is looked
+    at, so an expired signal is never reported as a price deviation.
+    """
+
+    def __init__(self, mt5_handler, max_price_difference_in_pips, max_order_age_in_minutes):
+        self.mt5_handler = mt5_handler
+        self.max_price_difference_in_pips = max_price_difference_in_pips
+        self.max_order_age_in_seconds = max_order_age_in_minutes * 60
+        self._signal_timestamps = {}
+
+    def _get_signal_timestamp(self, signal_time):
+        signal_timestamp = self._signal_timestamps.get(signal_time)
+        if signal_timestamp is None:
+            parsed_time = dateutil.parser.parse(signal_time)
+            # The controller sends UTC times, a time without offset must not be read as the host local time
+            if parsed_time.tzinfo is None:
+                parsed_time = parsed_time.replace(tzinfo=datetime.timezone.utc)
+            signal_timestamp = parsed_time.timestamp()
+            if len(self._signal_timestamps) > 10_000:
+                self._signal_timestamps.clear()
+            self._signal_timestamps[signal_time] = signal_timestamp
+        return signal_timestamp
+
+    def _get_quotes(self, symbol):
+        """Return ``(bid, ask, pip_size)`` of ``symbol``, NaN for what is unavailable."""
+        symbol_spec = self.mt5_handler.symbol_catalog.get_symbol_spec(symbol)
+        if symbol_spec is None:
+            return np.nan, np.nan, np.nan
+        pip_size = symbol_spec.pip_size
+
+        try:
+            tick = self.mt5_handler.quote_snapshot.get_tick(symbol)
+        except Exception:
+            return np.nan, np.nan, pip_size
+        return tick.bid, tick.ask, pip_size
+
+    def validate(self, signals: list[TradeSignal]) -> SignalValidation:
+        quotes_by_symbol = {
+            symbol: self._get_quotes(symbol) for symbol in {signal.symbol for signal in signals}}
+        signal_count = len(signals)
+        quotes = np.array([quotes_by_symbol[signal.symbol] for signal in signals],
+                          dtype=np.float64).reshape(signal_count, 3)
+        is_buy = np.fromiter((signal.type == TradeType.BUY.value for signal in signals),
+                             dtype=bool, count=signal_count)
+        signal_prices = np.fromiter((signal.price_order for signal in signals),
+                                    dtype=np.float64, count=signal_count)
+        signal_timestamps = np.fromiter((self._get_signal_timestamp(signal.time) for signal in signals),
+                                        dtype=np.float64, count=signal_count)
+
+        server_time = self.mt5_handler.get_server_time()
+        ages_in_seconds = (server_time if server_time is not None else time.time()) - \
+            signal_timestamps
+        current_prices = np.where(is_buy, quotes[:, 1], quotes[:, 0])
+        price_differences_in_pips = np.abs(
+            current_prices - signal_prices) / quotes[:, 2]
+
+        reasons = np.full(
+            signal_count, SignalRejectReasonEnum.ACCEPTED.value, dtype=np.int8)
+        reasons[np.isnan(price_differences_in_pips)] = SignalRejectReasonEnum.NO_QUOTE.value
+        reasons[price_differences_in_pips >
+                self.max_price_difference_in_pips] = SignalRejectReasonEnum.PRICE_DEVIATION.value
+        reasons[ages_in_seconds >
+                self.max_order_age_in_seconds] = SignalRejectReasonEnum.TOO_OLD.value
+
+        for signal, price_difference_in_pips, age_in_seconds in zip(
+                signals, price_differences_in_pips.tolist(), ages_in_seconds.tolist()):
+            signal.price_diff = price_difference_in_pips
+            signal.time_diff = datetime.timedelta(seconds=age_in_seconds)
+
+        return SignalValidation(reasons == SignalRejectReasonEnum.ACCEPTED.value, reasons,
+                                price_differences_in_pips, ages_in_seconds, current_prices)
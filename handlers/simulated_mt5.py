@@ -0,0 +1,443 @@
+import datetime
+import math
+import random
+import threading
+import time
+from collections import deque, namedtuple
+
+from handlers.classes import SimulatedMt5Setting
+from handlers.constant import ReturnCodeTradeServer, SymbolFillingModeEnum
+
+# Records mirror the named tuples returned by the MetaTrader5 package so the
+# handlers can read them with the same attribute names.
+TerminalInfo = namedtuple(
+    "TerminalInfo", ["connected", "trade_allowed", "name", "company", "path", "data_path", "build"])
+AccountInfo = namedtuple(
+    "AccountInfo", ["login", "server", "name", "currency", "leverage", "balance", "equity", "trade_allowed"])
+SymbolInfo = namedtuple(
+    "SymbolInfo", ["name", "select", "visible", "digits", "point", "spread", "filling_mode", "volume_min",
+                   "volume_max", "volume_step", "trade_contract_size", "bid", "ask", "time"])
+Tick = namedtuple(
+    "Tick", ["time", "bid", "ask", "last", "volume", "time_msc", "flags", "volume_real"])
+TradePosition = namedtuple(
+    "TradePosition", ["ticket", "time", "time_msc", "time_update", "time_update_msc", "type", "magic",
+                      "identifier", "reason", "volume", "price_open", "sl", "tp", "price_current", "swap",
+                      "profit", "symbol", "comment", "external_id"])
+TradeDeal = namedtuple(
+    "TradeDeal", ["ticket", "order", "time", "time_msc", "type", "entry", "magic", "position_id", "reason",
+                  "volume", "price", "commission", "swap", "profit", "fee", "symbol", "comment", "external_id"])
+OrderSendResult = namedtuple(
+    "OrderSendResult", ["retcode", "deal", "order", "volume", "price", "bid", "ask", "comment", "request_id",
+                        "retcode_external", "request"])
+
+DEFAULT_SIMULATED_SYMBOLS = {
+    "EURUSD": {"price": 1.08, "digits": 5, "volatility": 0.00005},
+    "GBPUSD": {"price": 1.26, "digits": 5, "volatility": 0.00006},
+    "USDJPY": {"price": 150.0, "digits": 3, "volatility": 0.005},
+    "AUDUSD": {"price": 0.66, "digits": 5, "volatility": 0.00004},
+    "USDCAD": {"price": 1.36, "digits": 5, "volatility": 0.00005},
+    "XAUUSD": {"price": 2000.0, "digits": 2, "volatility": 0.15},
+}
+
+
+class SimulatedMt5:
+    """Pure-Python stand-in for the MetaTrader5 module.
+
+    It keeps one account in memory, drives a random-walk price feed per symbol
+    and sleeps for a configurable latency on each call so that cycle timings
+    are comparable with a real terminal.
+    """
+
+    ORDER_TYPE_BUY = 0
+    ORDER_TYPE_SELL = 1
+    POSITION_TYPE_BUY = 0
+    POSITION_TYPE_SELL = 1
+    DEAL_TYPE_BUY = 0
+    DEAL_TYPE_SELL = 1
+    DEAL_ENTRY_IN = 0
+    DEAL_ENTRY_OUT = 1
+    DEAL_ENTRY_INOUT = 2
+    DEAL_ENTRY_OUT_BY = 3
+    TRADE_ACTION_DEAL = 1
+    TRADE_ACTION_SLTP = 6
+    ORDER_FILLING_FOK = 0
+    ORDER_FILLING_IOC = 1
+    ORDER_FILLING_RETURN = 2
+    COPY_TICKS_ALL = -1
+    COPY_TICKS_INFO = 1
+    COPY_TICKS_TRADE = 2
+
+    _FILLING_MODE_FLAGS = {
+        ORDER_FILLING_FOK: SymbolFillingModeEnum.SYMBOL_FILLING_FOK.value,
+        ORDER_FILLING_IOC: SymbolFillingModeEnum.SYMBOL_FILLING_IOC.value,
+    }
+    _MAX_TICK_HISTORY = 10_000
+
+    def __init__(self, simulated_mt5_setting: SimulatedMt5Setting = None):
+        setting = simulated_mt5_setting or SimulatedMt5Setting()
+        self.default_latency_in_seconds = (setting.default_latency_in_ms or 0) / 1000
+        self.latency_in_seconds = {
+            call_name: latency_in_ms / 1000
+            for call_name, latency_in_ms in (setting.latency_in_ms or {}).items()
+        }
+        self.server_time_offset_in_seconds = setting.server_time_offset_in_seconds or 0
+        self.tick_interval_in_seconds = (setting.tick_interval_in_ms or 250) / 1000
+        self._random = random.Random(setting.seed)
+        self._lock = threading.RLock()
+
+        self._symbols = {}
+        for symbol, symbol_setting in (setting.symbols or DEFAULT_SIMULATED_SYMBOLS).items():
+            self.add_symbol(symbol, **symbol_setting)
+
+        self._initialized = False
+        self._login = None
+        self._server = None
+        self._path = None
+        self._last_error = (1, "Success")
+        self._positions = {}
+        self._deals = []
+        self._next_ticket = 100_000
+        self._queued_retcodes = deque()
+        self.call_counts = {}
+
+        for retcode in ReturnCodeTradeServer:
+            setattr(self, retcode.name, retcode.value)
+
+    def add_symbol(self, symbol, price, digits=5, point=None, volatility=None, spread_in_points=10,
+                   filling_mode=SymbolFillingModeEnum.SYMBOL_FILLING_ALL.value, volume_min=0.01,
+                   volume_max=100.0, volume_step=0.01, trade_contract_size=100_000):
+        point = point or 10 ** -digits
+        self._symbols[symbol] = {
+            "digits": digits,
+            "point": point,
+            "mid": float(price),
+            "volatility": volatility if volatility is not None else price * 0.00005,
+            "spread_in_points": spread_in_points,
+            "filling_mode": filling_mode,
+            "volume_min": volume_min,
+            "volume_max": volume_max,
+            "volume_step": volume_step,
+            "trade_contract_size": trade_contract_size,
+            "selected": False,
+            "ticks": deque(maxlen=self._MAX_TICK_HISTORY),
+        }
+
+    def set_price(self, symbol, price):
+        with self._lock:
+            self._symbols[symbol]["mid"] = float(price)
+            self._append_tick(symbol, self._server_now())
+
+    def queue_order_retcodes(self, *retcodes):
+        """Make the next ``order_send`` calls fail with the given retcodes."""
+        self._queued_retcodes.extend(retcodes)
+
+    def _call(self, call_name):
+        self.call_counts[call_name] = self.call_counts.get(call_name, 0) + 1
+        latency = self.latency_in_seconds.get(
+            call_name, self.default_latency_in_seconds)
+        if latency:
+            time.sleep(latency)
+
+    def _server_now(self):
+        return time.time() + self.server_time_offset_in_seconds
+
+    def _allocate_ticket(self):
+        self._next_ticket += 1
+        return self._next_ticket
+
+    @staticmethod
+    def _to_timestamp(value):
+        if isinstance(value, datetime.datetime):
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=datetime.timezone.utc)
+            return value.timestamp()
+        return float(value)
+
+    def _append_tick(self, symbol, server_now):
+        symbol_state = self._symbols[symbol]
+        half_spread = symbol_state["spread_in_points"] * \
+            symbol_state["point"] / 2
+        digits = symbol_state["digits"]
+        bid = round(symbol_state["mid"] - half_spread, digits)
+        ask = round(symbol_state["mid"] + half_spread, digits)
+        time_msc = int(server_now * 1000)
+        symbol_state["ticks"].append(
+            Tick(int(server_now), bid, ask, 0.0, 0, time_msc, 6, 0.0))
+
+    def _advance_price_feed(self, symbol):
+        symbol_state = self._symbols[symbol]
+        server_now = self._server_now()
+        ticks = symbol_state["ticks"]
+        last_tick_time = ticks[-1].time_msc / 1000 if ticks else None
+
+        if last_tick_time is None:
+            self._append_tick(symbol, server_now)
+            return
+
+        elapsed = server_now - last_tick_time
+        if elapsed < self.tick_interval_in_seconds:
+            return
+
+        steps = min(int(elapsed / self.tick_interval_in_seconds),
+                    self._MAX_TICK_HISTORY)
+        step_volatility = symbol_state["volatility"]
+        for step in range(steps, 0, -1):
+            symbol_state["mid"] = max(
+                symbol_state["mid"] +
+                self._random.gauss(0, step_volatility),
+                symbol_state["point"])
+            self._append_tick(
+                symbol, server_now - (step - 1) * self.tick_interval_in_seconds)
+
+    def _current_tick(self, symbol):
+        self._advance_price_feed(symbol)
+        return self._symbols[symbol]["ticks"][-1]
+
+    def initialize(self, login=None, server=None, password=None, path=None, **kwargs):
+        self._call("initialize")
+        self._initialized = True
+        self._login = login or 1
+        self._server = server or "Simulated-Server"
+        self._path = path or "simulated/terminal64.exe"
+        return True
+
+    def shutdown(self):
+        self._call("shutdown")
+        self._initialized = False
+        return True
+
+    def last_error(self):
+        return self._last_error
+
+    def terminal_info(self):
+        self._call("terminal_info")
+        if not self._initialized:
+            return None
+        return TerminalInfo(True, True, "Simulated MetaTrader 5", "Simulated", self._path, "simulated/data", 0)
+
+    def account_info(self):
+        self._call("account_info")
+        if not self._initialized:
+            return None
+        with self._lock:
+            profit = sum(
+                position.profit for position in self._positions.values())
+        balance = 100_000.0
+        return AccountInfo(self._login, self._server, f"Simulated {self._login}", "USD", 100, balance,
+                           balance + profit, True)
+
+    def symbol_info(self, symbol):
+        self._call("symbol_info")
+        symbol_state = self._symbols.get(symbol)
+        if symbol_state is None:
+            self._last_error = (-1, f"Symbol {symbol} not found")
+            return None
+        with self._lock:
+            tick = self._current_tick(symbol)
+        return SymbolInfo(symbol, symbol_state["selected"], symbol_state["selected"], symbol_state["digits"],
+                          symbol_state["point"], symbol_state["spread_in_points"],
+                          symbol_state["filling_mode"], symbol_state["volume_min"],
+                          symbol_state["volume_max"], symbol_state["volume_step"],
+                          symbol_state["trade_contract_size"], tick.bid, tick.ask, tick.time)
+
+    def symbol_select(self, symbol, enable=True):
+        self._call("symbol_select")
+        symbol_state = self._symbols.get(symbol)
+        if symbol_state is None:
+            self._last_error = (-1, f"Symbol {symbol} not found")
+            return False
+        symbol_state["selected"] = enable
+        return True
+
+    def symbols_total(self):
+        self._call("symbols_total")
+        return len(self._symbols)
+
+    def symbol_info_tick(self, symbol):
+        self._call("symbol_info_tick")
+        if symbol not in self._symbols:
+            self._last_error = (-1, f"Symbol {symbol} not found")
+            return None
+        with self._lock:
+            return self._current_tick(symbol)
+
+    def copy_ticks_range(self, symbol, date_from, date_to, flags=COPY_TICKS_ALL):
+        self._call("copy_ticks_range")
+        if symbol not in self._symbols:
+            self._last_error = (-1, f"Symbol {symbol} not found")
+            return None
+        start_time = self._to_timestamp(date_from)
+        end_time = self._to_timestamp(date_to)
+        with self._lock:
+            self._advance_price_feed(symbol)
+            return [
+                tick for tick in self._symbols[symbol]["ticks"]
+                if start_time <= tick.time_msc / 1000 <= end_time
+            ]
+
+    def positions_total(self):
+        self._call("positions_total")
+        return len(self._positions)
+
+    def positions_get(self, symbol=None, ticket=None, group=None):
+        self._call("positions_get")
+        with self._lock:
+            positions = [self._mark_to_market(position)
+                         for position in self._positions.values()]
+        if symbol is not None:
+            positions = [
+                position for position in positions if position.symbol == symbol]
+        if ticket is not None:
+            positions = [
+                position for position in positions if position.ticket == ticket]
+        return tuple(positions)
+
+    def orders_total(self):
+        self._call("orders_total")
+        return 0
+
+    def orders_get(self, symbol=None, ticket=None, group=None):
+        self._call("orders_get")
+        return ()
+
+    def history_deals_total(self, date_from, date_to):
+        self._call("history_deals_total")
+        return len(self._select_deals(date_from, date_to))
+
+    def history_deals_get(self, date_from=None, date_to=None, group=None, ticket=None, position=None):
+        self._call("history_deals_get")
+        with self._lock:
+            if ticket is not None:
+                return tuple(deal for deal in self._deals if deal.order == ticket)
+            if position is not None:
+                return tuple(deal for deal in self._deals if deal.position_id == position)
+        return tuple(self._select_deals(date_from, date_to))
+
+    def _select_deals(self, date_from, date_to):
+        start_time = self._to_timestamp(date_from)
+        end_time = self._to_timestamp(date_to)
+        with self._lock:
+            return [deal for deal in self._deals if start_time <= deal.time <= end_time]
+
+    def _mark_to_market(self, position):
+        tick = self._current_tick(position.symbol)
+        symbol_state = self._symbols[position.symbol]
+        if position.type == self.POSITION_TYPE_BUY:
+            price_current = tick.bid
+            profit = (price_current - position.price_open)
+        else:
+            price_current = tick.ask
+            profit = (position.price_open - price_current)
+        profit *= position.volume * symbol_state["trade_contract_size"]
+        return position._replace(price_current=price_current, profit=round(profit, 2))
+
+    def _reject(self, request, retcode, comment, tick=None):
+        return OrderSendResult(retcode, 0, 0, 0.0, 0.0, tick.bid if tick else 0.0, tick.ask if tick else 0.0,
+                               comment, 0, 0, request)
+
+    def order_send(self, request):
+        self._call("order_send")
+        with self._lock:
+            symbol = request.get("symbol")
+            if symbol not in self._symbols:
+                self._last_error = (-2, f"Invalid symbol {symbol}")
+                return None
+
+            tick = self._current_tick(symbol)
+            if self._queued_retcodes:
+                retcode = self._queued_retcodes.popleft()
+                return self._reject(request, retcode, ReturnCodeTradeServer(retcode).name, tick)
+
+            action = request.get("action")
+            if action == self.TRADE_ACTION_SLTP:
+                return self._modify_position(request, tick)
+            if action == self.TRADE_ACTION_DEAL:
+                if not self._is_filling_allowed(symbol, request.get("type_filling")):
+                    return self._reject(request, self.TRADE_RETCODE_INVALID_FILL, "Unsupported filling mode", tick)
+                if request.get("position"):
+                    return self._close_position(request, tick)
+                return self._open_position(request, tick)
+
+            return self._reject(request, self.TRADE_RETCODE_INVALID, "Invalid request", tick)
+
+    def _is_filling_allowed(self, symbol, type_filling):
+        if type_filling is None or type_filling == self.ORDER_FILLING_RETURN:
+            return True
+        filling_flag = self._FILLING_MODE_FLAGS.get(type_filling)
+        return bool(filling_flag and self._symbols[symbol]["filling_mode"] & filling_flag)
+
+    def _is_volume_valid(self, symbol, volume):
+        symbol_state = self._symbols[symbol]
+        if volume is None or not symbol_state["volume_min"] <= volume <= symbol_state["volume_max"]:
+            return False
+        steps = volume / symbol_state["volume_step"]
+        return math.isclose(steps, round(steps), abs_tol=1e-6)
+
+    def _add_deal(self, request, order_ticket, deal_type, entry, volume, price, position_id, profit=0.0):
+        server_now = self._server_now()
+        deal = TradeDeal(self._allocate_ticket(), order_ticket, int(server_now), int(server_now * 1000), deal_type,
+                         entry, request.get("magic", 0), position_id, 3, volume, price, 0.0, 0.0, profit, 0.0,
+                         request["symbol"], request.get("comment", ""), "")
+        self._deals.append(deal)
+        return deal
+
+    def _open_position(self, request, tick):
+        symbol = request["symbol"]
+        volume = request.get("volume")
+        if not self._is_volume_valid(symbol, volume):
+            return self._reject(request, self.TRADE_RETCODE_INVALID_VOLUME, "Invalid volume", tick)
+
+        order_type = request.get("type")
+        if order_type == self.ORDER_TYPE_BUY:
+            price = tick.ask
+        elif order_type == self.ORDER_TYPE_SELL:
+            price = tick.bid
+        else:
+            return self._reject(request, self.TRADE_RETCODE_INVALID, "Invalid order type", tick)
+
+        order_ticket = self._allocate_ticket()
+        server_now = self._server_now()
+        self._positions[order_ticket] = TradePosition(
+            order_ticket, int(server_now), int(server_now * 1000), int(server_now), int(server_now * 1000),
+            order_type, request.get("magic", 0), order_ticket, 3, volume, price, request.get("sl", 0.0),
+            request.get("tp", 0.0), price, 0.0, 0.0, symbol, request.get("comment", ""), "")
+        deal = self._add_deal(request, order_ticket, order_type, self.DEAL_ENTRY_IN,
+                              volume, price, order_ticket)
+        return OrderSendResult(self.TRADE_RETCODE_DONE, deal.ticket, order_ticket, volume, price, tick.bid,
+                               tick.ask, "Request executed", 0, 0, request)
+
+    def _close_position(self, request, tick):
+        position = self._positions.get(request["position"])
+        if position is None:
+            return self._reject(request, self.TRADE_RETCODE_POSITION_CLOSED, "Position doesn't exist", tick)
+
+        position = self._mark_to_market(position)
+        volume = request.get("volume") or position.volume
+        if volume < position.volume and not math.isclose(volume, position.volume):
+            if not self._is_volume_valid(position.symbol, volume):
+                return self._reject(request, self.TRADE_RETCODE_INVALID_VOLUME, "Invalid volume", tick)
+            # A partial close leaves the rest of the volume open on the same position
+            profit = round(position.profit * volume / position.volume, 2)
+            self._positions[position.ticket] = position._replace(volume=round(position.volume - volume, 8))
+        else:
+            volume = position.volume
+            profit = position.profit
+            del self._positions[position.ticket]
+        closing_type = self.DEAL_TYPE_SELL if position.type == self.POSITION_TYPE_BUY else self.DEAL_TYPE_BUY
+        order_ticket = self._allocate_ticket()
+        deal = self._add_deal(request, order_ticket, closing_type, self.DEAL_ENTRY_OUT, volume,
+                              position.price_current, position.ticket, profit)
+        return OrderSendResult(self.TRADE_RETCODE_DONE, deal.ticket, order_ticket, volume,
+                               position.price_current, tick.bid, tick.ask, "Request executed", 0, 0, request)
+
+    def _modify_position(self, request, tick):
+        position = self._positions.get(request.get("position"))
+        if position is None:
+            return self._reject(request, self.TRADE_RETCODE_POSITION_CLOSED, "Position doesn't exist", tick)
+
+        server_now = self._server_now()
+        self._positions[position.ticket] = position._replace(
+            sl=request.get("sl", position.sl), tp=request.get("tp", position.tp),
+            time_update=int(server_now), time_update_msc=int(server_now * 1000))
+        return OrderSendResult(self.TRADE_RETCODE_DONE, 0, 0, 0.0, 0.0, tick.bid, tick.ask, "Request executed",
+                               0, 0, request)
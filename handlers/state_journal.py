@@ -0,0 +1,131 @@
+import dataclasses
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from handlers.constant import SignalLifecycleStateEnum
+
+
+@dataclasses.dataclass(slots=True)
+class SignalJournalEntry:
+    magic_number: int
+    master_trader_id: Optional[str]
+    external_signal_id: Optional[str]
+    ticket: Optional[int]
+    position_id: Optional[int]
+    state: str
+    time: float
+
+
+class StateJournal:
+    """Durable record of the copied signals of one terminal.
+
+    Each copy is keyed by its magic number and links the master trader and
+    signal to the ticket of the order or deal and its lifecycle state. It is
+    written to SQLite as soon as an order succeeds or a closing deal is seen
+    in the deal history, and loaded in memory at start-up. A closed signal is
+    then never copied again, even once its deal left the history window.
+
+    The time of the last deal the journal was brought up to date with is kept
+    as the deal watermark. A restarted process only needs the deal history
+    from there to confirm which open copies were closed meanwhile.
+    """
+
+    def __init__(self, database_path, logger, retention_in_days):
+        self.database_path = database_path
+        self.logger = logger
+        os.makedirs(os.path.dirname(database_path) or ".", exist_ok=True)
+        self._connection = sqlite3.connect(database_path, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS copied_signals ("
+            "magic_number INTEGER PRIMARY KEY, master_trader_id TEXT, external_signal_id TEXT, "
+            "ticket INTEGER, position_id INTEGER, state TEXT NOT NULL, time REAL NOT NULL)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS journal_state (name TEXT PRIMARY KEY, value REAL)")
+        self._connection.execute(
+            "DELETE FROM copied_signals WHERE state = ? AND time < ?",
+            (SignalLifecycleStateEnum.CLOSED.value, time.time() - retention_in_days * 86400))
+        self._entries = {
+            row[0]: SignalJournalEntry(*row)
+            for row in self._connection.execute(
+                "SELECT magic_number, master_trader_id, external_signal_id, ticket, position_id, state, time "
+                "FROM copied_signals ORDER BY time")
+        }
+        self._entries_by_position_id = {
+            entry.position_id: entry for entry in self._entries.values() if entry.position_id}
+        row = self._connection.execute(
+            "SELECT value FROM journal_state WHERE name = 'deal_watermark'").fetchone()
+        self._deal_watermark = row[0] if row else None
+        self.logger.info(
+            f"Loaded {len(self._entries)} copied signal(s) from {database_path}")
+
+    def get_entries(self):
+        return [dataclasses.astuple(entry) for entry in self._entries.values()]
+
+    def restore(self, entries):
+        """Write entries returned by :meth:`get_entries` of another journal."""
+        for entry in entries:
+            self._write(SignalJournalEntry(*entry))
+
+    def get_magic_numbers(self):
+        return set(self._entries)
+
+    def get(self, magic_number) -> Optional[SignalJournalEntry]:
+        return self._entries.get(magic_number)
+
+    def get_by_position_id(self, position_id) -> Optional[SignalJournalEntry]:
+        return self._entries_by_position_id.get(position_id)
+
+    def get_closed(self, magic_number) -> Optional[SignalJournalEntry]:
+        entry = self._entries.get(magic_number)
+        if entry is not None and entry.state == SignalLifecycleStateEnum.CLOSED.value:
+            return entry
+        return None
+
+    def _write(self, entry: SignalJournalEntry):
+        self._entries[entry.magic_number] = entry
+        if entry.position_id:
+            self._entries_by_position_id[entry.position_id] = entry
+        try:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO copied_signals VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (entry.magic_number, entry.master_trader_id, entry.external_signal_id, entry.ticket,
+                 entry.position_id, entry.state, entry.time))
+        except sqlite3.Error as e:
+            self.logger.error(
+                f"Cannot write signal {entry} to {self.database_path} as {e}")
+
+    def record_open(self, magic_number, master_trader_id, external_signal_id, ticket):
+        # The position of a market order takes the ticket of the order
+        self._write(SignalJournalEntry(
+            magic_number, master_trader_id, external_signal_id, ticket, ticket,
+            SignalLifecycleStateEnum.OPEN.value, time.time()))
+
+    def record_closed(self, magic_number, master_trader_id, external_signal_id, ticket, position_id, closed_at):
+        if self.get_closed(magic_number):
+            return
+        entry = self._entries.get(magic_number)
+        self._write(SignalJournalEntry(
+            magic_number, master_trader_id or (entry and entry.master_trader_id),
+            external_signal_id or (entry and entry.external_signal_id), ticket, position_id,
+            SignalLifecycleStateEnum.CLOSED.value, closed_at))
+
+    def get_deal_watermark(self) -> Optional[float]:
+        return self._deal_watermark
+
+    def set_deal_watermark(self, deal_time):
+        if deal_time is None or deal_time == self._deal_watermark:
+            return
+        self._deal_watermark = deal_time
+        try:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO journal_state VALUES ('deal_watermark', ?)", (deal_time,))
+        except sqlite3.Error as e:
+            self.logger.error(
+                f"Cannot write the deal watermark to {self.database_path} as {e}")
+
+    def close(self):
+        self._connection.close()
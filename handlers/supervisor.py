@@ -0,0 +1,180 @@
+import ctypes
+import multiprocessing
+import os
+import sys
+import time
+
+
+def get_rss_in_bytes():
+    """Return the resident set size of the current process, 0 when unknown."""
+    if sys.platform == "win32":
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(
+                ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return 0
+        return counters.WorkingSetSize
+
+    try:
+        with open("/proc/self/statm") as content:
+            return int(content.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class WorkerHeartbeat:
+    """Health of a worker process, written by the worker and read by the supervisor.
+
+    The values live in a ``multiprocessing.Array`` so reading them costs no
+    message passing: the wall clock time of the last finished cycle, its
+    latency, the process RSS and the number of finished cycles.
+    """
+
+    LAST_CYCLE_AT = 0
+    CYCLE_LATENCY_IN_MS = 1
+    RSS_IN_BYTES = 2
+    CYCLE_COUNT = 3
+
+    def __init__(self):
+        self.values = multiprocessing.Array("d", 4)
+
+    def beat(self, cycle_latency_in_ms):
+        rss_in_bytes = get_rss_in_bytes()
+        with self.values.get_lock():
+            self.values[self.LAST_CYCLE_AT] = time.time()
+            self.values[self.CYCLE_LATENCY_IN_MS] = cycle_latency_in_ms
+            self.values[self.RSS_IN_BYTES] = rss_in_bytes
+            self.values[self.CYCLE_COUNT] += 1
+
+    def read(self):
+        with self.values.get_lock():
+            return list(self.values)
+
+
+class SupervisedProcess:
+    def __init__(self, name, target, get_args, heartbeat: WorkerHeartbeat = None, on_restart=None, daemon=False):
+        self.name = name
+        self.target = target
+        self.get_args = get_args
+        self.heartbeat = heartbeat
+        self.on_restart = on_restart
+        self.daemon = daemon
+        self.process = None
+        self.started_at = 0.0
+        self.failure_count = 0
+        self.restart_at = 0.0
+
+
+class WorkerSupervisor:
+    """Starts the worker processes and restarts the dead or hung ones.
+
+    A worker is hung when it finished no cycle for ``heartbeat_timeout_in_seconds``
+    (counted from its start for the first cycle). Restarts are delayed by an
+    exponential backoff from ``min_backoff_in_seconds`` to
+    ``max_backoff_in_seconds``, which resets once a worker stayed up longer
+    than the maximum backoff.
+    """
+
+    CHECK_INTERVAL_IN_SECONDS = 1.0
+    TERMINATE_TIMEOUT_IN_SECONDS = 10
+
+    def __init__(self, logger, heartbeat_timeout_in_seconds, min_backoff_in_seconds, max_backoff_in_seconds,
+                 on_check=None):
+        self.logger = logger
+        self.heartbeat_timeout_in_seconds = heartbeat_timeout_in_seconds
+        self.min_backoff_in_seconds = min_backoff_in_seconds
+        self.max_backoff_in_seconds = max(max_backoff_in_seconds, min_backoff_in_seconds)
+        self.on_check = on_check
+        self.supervised_processes = []
+
+    def add(self, name, target, get_args, heartbeat: WorkerHeartbeat = None, on_restart=None, daemon=False):
+        """Supervise ``target``, started with the arguments returned by ``get_args`` on every (re)start."""
+        self.supervised_processes.append(
+            SupervisedProcess(name, target, get_args, heartbeat, on_restart, daemon))
+
+    def _start(self, supervised_process: SupervisedProcess):
+        if supervised_process.process is not None and supervised_process.on_restart:
+            supervised_process.on_restart()
+        supervised_process.process = multiprocessing.Process(
+            target=supervised_process.target, args=supervised_process.get_args(), daemon=supervised_process.daemon,
+            name=supervised_process.name)
+        supervised_process.started_at = time.time()
+        supervised_process.process.start()
+
+    def _get_unhealthy_reason(self, supervised_process: SupervisedProcess):
+        if not supervised_process.process.is_alive():
+            return f"exited with code {supervised_process.process.exitcode}"
+
+        if supervised_process.heartbeat is None:
+            return None
+        last_cycle_at = max(
+            supervised_process.heartbeat.read()[WorkerHeartbeat.LAST_CYCLE_AT], supervised_process.started_at)
+        if time.time() - last_cycle_at > self.heartbeat_timeout_in_seconds:
+            return f"finished no cycle for {time.time() - last_cycle_at:.0f}s"
+        return None
+
+    def _stop(self, supervised_process: SupervisedProcess):
+        process = supervised_process.process
+        if process is None or not process.is_alive():
+            return
+        process.terminate()
+        process.join(self.TERMINATE_TIMEOUT_IN_SECONDS)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def _get(self, name):
+        for supervised_process in self.supervised_processes:
+            if supervised_process.name == name:
+                return supervised_process
+        raise Exception(f"Process {name} is not supervised")
+
+    def remove(self, name):
+        supervised_process = self._get(name)
+        self.supervised_processes.remove(supervised_process)
+        self._stop(supervised_process)
+
+    def restart(self, name):
+        """Restart a process now, without counting it as a failure."""
+        supervised_process = self._get(name)
+        self._stop(supervised_process)
+        supervised_process.restart_at = 0.0
+        self._start(supervised_process)
+
+    def _schedule_restart(self, supervised_process: SupervisedProcess, reason):
+        self._stop(supervised_process)
+
+        if time.time() - supervised_process.started_at > self.max_backoff_in_seconds:
+            supervised_process.failure_count = 0
+        supervised_process.failure_count += 1
+        backoff = min(self.min_backoff_in_seconds * 2 ** (supervised_process.failure_count - 1),
+                      self.max_backoff_in_seconds)
+        supervised_process.restart_at = time.monotonic() + backoff
+        self.logger.error(
+            f"Process {supervised_process.name} {reason}. "
+            f"Restart {supervised_process.failure_count} in {backoff:.0f}s")
+
+    def run(self):
+        while True:
+            for supervised_process in list(self.supervised_processes):
+                if supervised_process.process is None or supervised_process.restart_at:
+                    if time.monotonic() >= supervised_process.restart_at:
+                        supervised_process.restart_at = 0.0
+                        self._start(supervised_process)
+                    continue
+
+                reason = self._get_unhealthy_reason(supervised_process)
+                if reason:
+                    self._schedule_restart(supervised_process, reason)
+
+            if self.on_check:
+                self.on_check()
+            time.sleep(self.CHECK_INTERVAL_IN_SECONDS)
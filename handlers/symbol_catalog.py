@@ -0,0 +1,121 @@
+import time
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class SymbolSpec:
+    name: str
+    selected: bool
+    filling_mode: int
+    volume_min: float
+    volume_max: float
+    volume_step: float
+    digits: int
+    point: float
+    resolved_at: float
+
+    @property
+    def pip_size(self):
+        return self.point * 10 if self.digits in (3, 5) else self.point
+
+
+class SymbolCatalog:
+    """Caches the static symbol properties the bot needs from the terminal.
+
+    Known symbols are refreshed after ``ttl_in_seconds``. Unknown symbols are
+    remembered for ``unknown_symbol_ttl_in_seconds`` so an invalid signal does
+    not cost a ``symbol_info`` round-trip on every cycle. The filling type an
+    order last succeeded with is remembered per symbol and tried first.
+    """
+
+    def __init__(self, mt5, logger, symbol_postfix, ttl_in_seconds, unknown_symbol_ttl_in_seconds):
+        self.mt5 = mt5
+        self.logger = logger
+        self.symbol_postfix = symbol_postfix or ""
+        self.ttl_in_seconds = ttl_in_seconds
+        self.unknown_symbol_ttl_in_seconds = unknown_symbol_ttl_in_seconds
+        self._broker_symbols = {}
+        self._symbol_specs = {}
+        self._unknown_symbols = {}
+        self._working_filling_types = {}
+
+    def to_broker_symbol(self, api_signal_symbol):
+        broker_symbol = self._broker_symbols.get(api_signal_symbol)
+        if broker_symbol is None:
+            broker_symbol = f"{api_signal_symbol}{self.symbol_postfix}".replace(
+                "/", "")
+            self._broker_symbols[api_signal_symbol] = broker_symbol
+        return broker_symbol
+
+    def get_symbol_spec(self, symbol):
+        now = time.monotonic()
+        unknown_since = self._unknown_symbols.get(symbol)
+        if unknown_since is not None:
+            if now - unknown_since < self.unknown_symbol_ttl_in_seconds:
+                return None
+            del self._unknown_symbols[symbol]
+
+        symbol_spec = self._symbol_specs.get(symbol)
+        if symbol_spec is not None and now - symbol_spec.resolved_at < self.ttl_in_seconds:
+            return symbol_spec
+
+        return self._resolve(symbol, now)
+
+    def _resolve(self, symbol, now):
+        symbol_info = self.mt5.symbol_info(symbol)
+        if symbol_info is None:
+            self._symbol_specs.pop(symbol, None)
+            self._unknown_symbols[symbol] = now
+            self.logger.debug(
+                "Symbol %s is unknown. It will not be checked again for %ss",
+                symbol, self.unknown_symbol_ttl_in_seconds)
+            return None
+
+        symbol_spec = SymbolSpec(
+            name=symbol,
+            selected=bool(symbol_info.select),
+            filling_mode=symbol_info.filling_mode,
+            volume_min=symbol_info.volume_min,
+            volume_max=symbol_info.volume_max,
+            volume_step=symbol_info.volume_step,
+            digits=symbol_info.digits,
+            point=symbol_info.point,
+            resolved_at=now,
+        )
+        self._symbol_specs[symbol] = symbol_spec
+        return symbol_spec
+
+    def enable(self, symbol):
+        symbol_spec = self.get_symbol_spec(symbol)
+        if symbol_spec is None:
+            return None
+
+        if not symbol_spec.selected:
+            if not self.mt5.symbol_select(symbol, True):
+                return symbol_spec
+            symbol_spec.selected = True
+
+        return symbol_spec
+
+    def get_working_filling_type(self, symbol):
+        return self._working_filling_types.get(symbol)
+
+    def set_working_filling_type(self, symbol, filling_type):
+        self._working_filling_types[symbol] = filling_type
+
+    def clear_working_filling_types(self):
+        self._working_filling_types.clear()
+
+    def set_symbol_postfix(self, symbol_postfix):
+        self.symbol_postfix = symbol_postfix or ""
+        self._broker_symbols.clear()
+
+    def invalidate(self, symbol=None):
+        if symbol is None:
+            self._symbol_specs.clear()
+            self._unknown_symbols.clear()
+            self._working_filling_types.clear()
+            return
+        self._symbol_specs.pop(symbol, None)
+        self._unknown_symbols.pop(symbol, None)
+        self._working_filling_types.pop(symbol, None)
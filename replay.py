@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+from dacite import from_dict
+
+from bot import TradingFromSignal
+from handlers.classes import BotConfig, Mt5Setting
+from handlers.recording import ReplayMt5, ReplaySignalSource, VirtualClock, describe_decision, read_recording
+
+
+def split_recording(events):
+    """Return the header, the set-up events and the events of each recorded cycle."""
+    header = next(events, None)
+    if not header or header.get("e") != "header":
+        raise Exception("The recording has no header")
+
+    setup = {"calls": [], "responses": [], "settings": [], "decisions": []}
+    cycles = []
+    current = setup
+    for event in events:
+        if event["e"] == "cycle":
+            current = {"cycle": event, "calls": [], "responses": [], "settings": [], "decisions": []}
+            cycles.append(current)
+        elif event["e"] == "call":
+            current["calls"].append(event)
+        elif event["e"] == "response":
+            current["responses"].append(event)
+        elif event["e"] == "setting":
+            current["settings"].append(event["s"])
+        elif event["e"] == "decision":
+            current["decisions"].append({key: value for key, value in event.items() if key != "e"})
+    return header, setup, cycles
+
+
+def sort_decisions(decisions):
+    # Sources answer in any order live, so decisions are compared in a stable order within each cycle
+    return sorted(decisions, key=lambda decision: (decision["cycle"], json.dumps(decision, sort_keys=True)))
+
+
+def write_decision_log(decision_log_path, decisions):
+    with open(decision_log_path, "w") as decision_log:
+        for decision in decisions:
+            decision_log.write(json.dumps(decision, sort_keys=True) + "\n")
+
+
+def replay(recording_path, output_folder_path, log_level="WARNING"):
+    """Run the recorded cycles of a terminal through ``TradingFromSignal`` on a virtual clock.
+
+    Cycles run back to back; the clock jumps to the recorded time of each one.
+    The executed decisions are written to ``decisions.jsonl`` and the recorded
+    ones to ``recorded_decisions.jsonl`` in ``output_folder_path``, one JSON
+    object per line so that two runs can be compared with ``diff``.
+    """
+    header, setup, cycles = split_recording(read_recording(recording_path))
+    mt5_setting = from_dict(Mt5Setting, header["mt5_setting"])
+    bot_config = from_dict(BotConfig, {
+        **header["bot_config"],
+        "log_folder_path": output_folder_path,
+        "log_level": log_level,
+        "state_folder_path": f"{output_folder_path}/state",
+        "metrics_folder_path": f"{output_folder_path}/metrics",
+        "recording_folder_path": None,
+    })
+
+    # Start from the magic number table and the journal the recorded process started with
+    state_folder_path = f"{bot_config.state_folder_path}/{mt5_setting.bot_name}"
+    shutil.rmtree(state_folder_path, ignore_errors=True)
+    os.makedirs(state_folder_path)
+    with open(f"{state_folder_path}/magic_numbers.json", "w") as magic_numbers:
+        json.dump(header["magic_numbers"], magic_numbers)
+
+    replay_mt5 = ReplayMt5(header["constants"])
+    replay_mt5.load_cycle(setup["calls"])
+    signal_source = ReplaySignalSource()
+    decisions = []
+    cycle_number = 0
+    first_cycle = cycles[0]["cycle"] if cycles else {"t": header["time"], "m": 0.0}
+
+    with VirtualClock(header["time"], first_cycle["m"]) as clock:
+        bot = TradingFromSignal(mt5_setting, bot_config, mt5=replay_mt5)
+        bot.state_journal.restore(header["journal"])
+        # Controller responses come from the recording, in source order
+        bot.signal_receiver = bot.signal_transport = signal_source
+        bot.execution_queue.on_executed = lambda intent, result: decisions.append(
+            describe_decision(cycle_number, intent, result))
+
+        started_at = time.perf_counter()
+        try:
+            for cycle_number, cycle in enumerate(cycles, start=1):
+                clock.set(cycle["cycle"]["t"], cycle["cycle"]["m"])
+                bot.mt5_handler.server_clock.offset_in_seconds = cycle["cycle"]["o"]
+                bot.mt5_handler.server_clock._last_sampled_at = cycle["cycle"]["t"]
+                replay_mt5.load_cycle(cycle["calls"])
+                signal_source.load_cycle(cycle["responses"])
+                try:
+                    bot.run_cycle()
+                except Exception as e:
+                    decisions.append({"cycle": cycle_number, "error": f"{e}"})
+
+                # A reloaded setting is applied after the cycle it was received in
+                for setting in cycle["settings"]:
+                    bot.apply_mt5_setting(from_dict(Mt5Setting, setting))
+            elapsed_in_seconds = time.perf_counter() - started_at
+        finally:
+            bot.shutdown()
+
+    decisions = sort_decisions(decisions)
+    recorded_decisions = sort_decisions(
+        [decision for cycle in cycles for decision in cycle["decisions"]])
+    write_decision_log(f"{output_folder_path}/decisions.jsonl", decisions)
+    write_decision_log(f"{output_folder_path}/recorded_decisions.jsonl", recorded_decisions)
+
+    recorded_duration_in_seconds = cycles[-1]["cycle"]["t"] - cycles[0]["cycle"]["t"] if cycles else 0.0
+    return {
+        "cycles": len(cycles),
+        "decisions": len(decisions),
+        "recorded_decisions": len(recorded_decisions),
+        "is_matching_recording": decisions == recorded_decisions,
+        "elapsed_in_seconds": round(elapsed_in_seconds, 3),
+        "recorded_duration_in_seconds": round(recorded_duration_in_seconds, 3),
+        "cycles_per_second": round(len(cycles) / elapsed_in_seconds, 1) if elapsed_in_seconds else None,
+        "speedup": round(recorded_duration_in_seconds / elapsed_in_seconds, 1) if elapsed_in_seconds else None,
+        "unmatched_mt5_calls": replay_mt5.unmatched_call_counts,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay a terminal recording offline and write its decision log")
+    parser.add_argument("recording_path")
+    parser.add_argument("output_folder_path")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    print(json.dumps(replay(args.recording_path, args.output_folder_path, args.log_level), indent=2))
@@ -0,0 +1,94 @@
+import logging
+import time
+
+import pytest
+
+from bot import TradingFromSignal
+from handlers.classes import BotConfig, Mt5Setting, SimulatedMt5Setting
+from handlers.fake_controller import FakeController
+from handlers.simulated_mt5 import SimulatedMt5
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("tests")
+
+
+@pytest.fixture
+def mt5():
+    simulated_mt5 = SimulatedMt5(SimulatedMt5Setting(seed=1))
+    simulated_mt5.initialize(login=1, server="Simulated", password="", path="")
+    return simulated_mt5
+
+
+@pytest.fixture
+def monotonic_clock(monkeypatch):
+    """Replace ``time.monotonic`` with a clock that only moves when the test advances it."""
+    clock = [time.monotonic()]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+
+    def advance(seconds):
+        clock[0] += seconds
+
+    return advance
+
+
+@pytest.fixture
+def open_position(mt5):
+    """Open a market position on the simulated terminal and return the order result."""
+
+    def open_position(symbol="EURUSD", volume=0.1, magic=0, order_type=None):
+        return mt5.order_send({
+            "action": mt5.TRADE_ACTION_DEAL,
+            "symbol": symbol,
+            "volume": volume,
+            "type": mt5.ORDER_TYPE_BUY if order_type is None else order_type,
+            "magic": magic,
+            "type_filling": mt5.ORDER_FILLING_IOC,
+        })
+
+    return open_position
+
+
+@pytest.fixture
+def close_position(mt5):
+    """Close a position on the simulated terminal and return the order result."""
+
+    def close_position(position_ticket, symbol="EURUSD", volume=0.1, magic=0):
+        return mt5.order_send({
+            "action": mt5.TRADE_ACTION_DEAL,
+            "symbol": symbol,
+            "volume": volume,
+            "type": mt5.ORDER_TYPE_SELL,
+            "position": position_ticket,
+            "magic": magic,
+            "type_filling": mt5.ORDER_FILLING_IOC,
+        })
+
+    return close_position
+
+
+@pytest.fixture
+def fake_controller():
+    fake_controller = FakeController().start()
+    yield fake_controller
+    fake_controller.stop()
+
+
+@pytest.fixture
+def mt5_setting():
+    return Mt5Setting(
+        server="Simulated", login_id=1, password="", setup_path="", copied_volume_coefficient=1,
+        symbol_postfix="", master_traders={"mql5": ["1"]}, bot_name="terminal", type_filling="ORDER_FILLING_FOK",
+        max_allowed_order_age_to_copy_in_minutes=30, max_allowed_price_difference_in_pips=1000)
+
+
+@pytest.fixture
+def bot(mt5, mt5_setting, fake_controller, tmp_path):
+    """A TradingFromSignal on the simulated terminal, following master trader 1 of source mql5."""
+    bot_config = BotConfig(
+        base_controller_url=fake_controller.base_url, log_folder_path=str(tmp_path / "logs"), log_level="WARNING",
+        mt5_backend="simulated")
+    bot = TradingFromSignal(mt5_setting, bot_config, mt5=mt5)
+    yield bot
+    bot.shutdown()
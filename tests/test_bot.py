@@ -0,0 +1,164 @@
+import datetime
+import time
+
+import pytest
+import requests
+
+from handlers.classes import TradeSignal
+from handlers.constant import SignalLifecycleStateEnum
+from handlers.controller_client import ControllerResponse
+from handlers.fake_controller import build_signal
+
+
+@pytest.fixture
+def signal(mt5):
+    """A fresh BUY signal of master trader 1 at the current EURUSD price."""
+
+    def signal(external_signal_id="10", symbol="EURUSD", stop_loss=0.0, take_profit=0.0):
+        return build_signal(
+            int(external_signal_id), external_signal_id, symbol, "BUY", 0.1, mt5.symbol_info_tick(symbol).ask,
+            datetime.datetime.now(datetime.timezone.utc).isoformat(), stop_loss, take_profit)
+
+    return signal
+
+
+@pytest.fixture
+def decoded_signal(bot, mt5):
+    """The signal of master trader 1 as reconciled, with its magic numbers."""
+
+    def decoded_signal(external_signal_id="10", symbol="EURUSD"):
+        price = mt5.symbol_info_tick(symbol).ask
+        return TradeSignal(
+            int(external_signal_id), external_signal_id, symbol, "BUY", 0.1,
+            datetime.datetime.now(datetime.timezone.utc).isoformat(), price, price,
+            magic_numbers=bot.magic_codec.encode("1", external_signal_id),
+            legacy_magic_number=bot.magic_codec.encode_legacy("1", external_signal_id))
+
+    return decoded_signal
+
+
+@pytest.fixture
+def begin_cycle(bot):
+    """Refresh the deal history, the positions and the account snapshot as ``run_cycle`` does first."""
+
+    def begin_cycle():
+        bot.mt5_handler.begin_cycle()
+        bot.take_account_snapshot()
+
+    return begin_cycle
+
+
+class RelayedSignalSource:
+    """Stands in for the shared signal receiver with a payload fetched at ``fetched_at``."""
+
+    def __init__(self, payload, fetched_at):
+        self.payload = payload
+        self.fetched_at = fetched_at
+
+    def get(self, source):
+        return ControllerResponse(requests.codes.ok, self.payload, True, self.fetched_at)
+
+
+def test_signals_are_not_opened_from_a_stale_relayed_payload(bot, mt5, fake_controller, signal):
+    fake_controller.set_signals("mql5", "1", [signal()])
+    relayed_signal_source = RelayedSignalSource(
+        fake_controller.get_master_traders("mql5", ["1"]),
+        time.time() - bot.bot_config.max_shared_signal_age_in_seconds - 1)
+    bot.signal_receiver = relayed_signal_source
+
+    bot.run_cycle()
+
+    assert mt5.positions_total() == 0
+    assert bot.has_pending_signals
+
+    relayed_signal_source.fetched_at = time.time()
+    bot.run_cycle()
+
+    assert mt5.positions_total() == 1
+    assert not bot.has_pending_signals
+
+
+def test_closed_journal_entry_is_not_copied_again(bot, mt5, fake_controller, signal, decoded_signal, begin_cycle):
+    copied_signal = decoded_signal()
+    bot.state_journal.record_closed(copied_signal.magic_numbers, "1", "10", 6001, 5001, time.time())
+    begin_cycle()
+
+    closed_copy, unconfirmed_copy = bot.find_closed_copy("1", copied_signal)
+
+    assert (closed_copy.ticket, unconfirmed_copy) == (6001, None)
+
+    fake_controller.set_signals("mql5", "1", [signal()])
+    bot.run_cycle()
+
+    assert mt5.positions_total() == 0
+    assert not bot.has_pending_signals
+
+
+def test_closing_deal_is_found_through_the_opening_deal_position(
+        bot, decoded_signal, begin_cycle, open_position, close_position):
+    copied_signal = decoded_signal()
+    open_result = open_position(magic=copied_signal.magic_numbers)
+    close_result = close_position(open_result.order)
+    begin_cycle()
+
+    closed_copy, unconfirmed_copy = bot.find_closed_copy("1", copied_signal)
+
+    assert (closed_copy.ticket, unconfirmed_copy) == (close_result.deal, None)
+    closed_entry = bot.state_journal.get_closed(copied_signal.magic_numbers)
+    assert (closed_entry.external_signal_id, closed_entry.ticket, closed_entry.position_id) == \
+        ("10", close_result.deal, open_result.order)
+
+
+def test_unconfirmed_copy_is_checked_again_while_the_position_table_is_stale(
+        bot, mt5, decoded_signal, begin_cycle):
+    copied_signal = decoded_signal()
+    begin_cycle()
+    # A copy was opened after the positions were downloaded, its position is not in the table yet
+    bot.state_journal.record_open(copied_signal.magic_numbers, "1", "10", 5001)
+    bot.mt5_handler.position_table.fetched_at_time -= 1
+
+    copied_at = bot.state_journal.get(copied_signal.magic_numbers).time
+
+    assert bot.find_closed_copy("1", copied_signal) == (None, (5001, copied_at))
+    assert not bot.process_signals_from_master_trader("1", [copied_signal])
+
+    begin_cycle()
+
+    assert bot.mt5_handler.position_table.is_fetched
+    assert bot.process_signals_from_master_trader("1", [copied_signal])
+    bot.execution_queue.execute()
+    assert mt5.positions_total() == 0
+
+
+def test_partially_closed_copy_stays_open_in_the_journal(bot, mt5, fake_controller, signal, close_position):
+    fake_controller.set_signals("mql5", "1", [signal()])
+    bot.run_cycle()
+    position = mt5.positions_get()[0]
+
+    close_position(position.ticket, volume=0.05, magic=position.magic)
+    bot.run_cycle()
+
+    assert bot.state_journal.get(position.magic).state == SignalLifecycleStateEnum.OPEN.value
+    assert [(open_position.ticket, open_position.volume) for open_position in mt5.positions_get()] == \
+        [(position.ticket, 0.05)]
+
+    close_result = close_position(position.ticket, volume=0.05, magic=position.magic)
+    bot.run_cycle()
+
+    assert bot.state_journal.get_closed(position.magic).ticket == close_result.deal
+    assert mt5.positions_total() == 0
+
+
+def test_manual_close_is_journaled_through_the_opening_deal_magic(
+        bot, mt5, decoded_signal, open_position, close_position):
+    copied_signal = decoded_signal()
+    open_result = open_position(magic=copied_signal.magic_numbers)
+    bot.run_cycle()
+
+    # A position closed by hand has a closing deal without magic number
+    close_result = close_position(open_result.order, magic=0)
+    bot.run_cycle()
+
+    closed_entry = bot.state_journal.get_closed(copied_signal.magic_numbers)
+    assert (closed_entry.master_trader_id, closed_entry.external_signal_id, closed_entry.ticket) == \
+        ("1", "10", close_result.deal)
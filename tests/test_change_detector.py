@@ -0,0 +1,70 @@
+import pytest
+
+from handlers.change_detector import ReconciliationChangeDetector
+from handlers.classes import TradeSignal
+
+
+@pytest.fixture
+def change_detector():
+    return ReconciliationChangeDetector(full_resync_interval_in_seconds=60)
+
+
+@pytest.fixture
+def signals():
+    """Signals of master trader 1, built with the given stop loss on the first one."""
+
+    def signals(stop_loss=0.0):
+        return [
+            TradeSignal(1, "10", "EURUSD", "BUY", 0.1, "2024-01-01T00:00:00Z", 1.08, 1.08, stop_loss),
+            TradeSignal(2, "11", "USDJPY", "SELL", 0.2, "2024-01-01T00:00:00Z", 150.0, 150.0),
+        ]
+
+    return signals
+
+
+def test_unknown_master_trader_is_reconciled(change_detector, signals):
+    assert change_detector.should_reconcile("1", change_detector.fingerprint("1", signals()), (1, 0))
+
+
+def test_settled_master_trader_is_skipped_until_something_changes(change_detector, signals):
+    signal_fingerprint = change_detector.fingerprint("1", signals())
+    change_detector.mark_settled("1", signal_fingerprint, (1, 0))
+
+    assert not change_detector.should_reconcile("1", change_detector.fingerprint("1", signals()), (1, 0))
+    assert change_detector.should_reconcile("1", signal_fingerprint, (2, 0))
+    assert change_detector.should_reconcile("1", change_detector.fingerprint("1", signals(stop_loss=1.0)), (1, 0))
+
+
+def test_settled_master_trader_is_reconciled_after_resync_interval(change_detector, signals, monotonic_clock):
+    signal_fingerprint = change_detector.fingerprint("1", signals())
+    change_detector.mark_settled("1", signal_fingerprint, (1, 0))
+
+    monotonic_clock(59)
+    assert not change_detector.should_reconcile("1", signal_fingerprint, (1, 0))
+
+    monotonic_clock(1)
+    assert change_detector.should_reconcile("1", signal_fingerprint, (1, 0))
+
+
+def test_invalidate_forgets_settled_state(change_detector, signals):
+    signal_fingerprint = change_detector.fingerprint("1", signals())
+    change_detector.mark_settled("1", signal_fingerprint, (1, 0))
+    change_detector.mark_settled("2", signal_fingerprint, (1, 0))
+
+    change_detector.invalidate("1")
+    assert change_detector.should_reconcile("1", signal_fingerprint, (1, 0))
+    assert not change_detector.should_reconcile("2", signal_fingerprint, (1, 0))
+
+    change_detector.invalidate()
+    assert change_detector.should_reconcile("2", signal_fingerprint, (1, 0))
+
+
+def test_fingerprint_of_the_same_signal_list_is_cached(change_detector, signals):
+    signal_list = signals()
+    signal_fingerprint = change_detector.fingerprint("1", signal_list)
+
+    # The fingerprint is kept for the list object, a decoded payload is never changed in place
+    signal_list[0].stop_loss = 1.0
+
+    assert change_detector.fingerprint("1", signal_list) == signal_fingerprint
+    assert change_detector.fingerprint("1", list(signal_list)) != signal_fingerprint
@@ -0,0 +1,168 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from handlers.controller_client import ControllerClient
+from handlers.fake_controller import build_signal
+
+MASTER_TRADERS_PATH = "/master_traders/"
+PARAMS = {"source": "mql5", "external_trader_ids": "1"}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(ControllerClient, "RETRY_BACKOFF_IN_SECONDS", 0.0)
+
+
+@pytest.fixture
+def controller_client(logger):
+    """Return a client for a base URL; every client is closed after the test."""
+    controller_clients = []
+
+    def controller_client(base_url, max_retries=2):
+        controller_clients.append(ControllerClient(
+            base_url, logger, connect_timeout_in_seconds=1, read_timeout_in_seconds=2, max_retries=max_retries))
+        return controller_clients[-1]
+
+    yield controller_client
+    for client in controller_clients:
+        client.close()
+
+
+def test_unchanged_response_is_revalidated_with_etag(controller_client, fake_controller):
+    fake_controller.set_signals("mql5", "1", [build_signal(1, 10, "EURUSD", "BUY", 0.1, 1.08, "2024-01-01")])
+    client = controller_client(fake_controller.base_url)
+
+    first_response = client.get(MASTER_TRADERS_PATH, params=PARAMS)
+    second_response = client.get(MASTER_TRADERS_PATH, params=PARAMS)
+
+    assert first_response.is_modified
+    assert first_response.payload[0]["signals"][0]["external_signal_id"] == "10"
+    assert not second_response.is_modified
+    assert second_response.status_code == requests.codes.ok
+    assert second_response.payload is first_response.payload
+    assert fake_controller.not_modified_count == 1
+
+
+def test_changed_response_is_decoded_again(controller_client, fake_controller):
+    fake_controller.set_signals("mql5", "1", [])
+    client = controller_client(fake_controller.base_url)
+    client.get(MASTER_TRADERS_PATH, params=PARAMS)
+
+    fake_controller.set_signals("mql5", "1", [build_signal(1, 10, "EURUSD", "BUY", 0.1, 1.08, "2024-01-01")])
+    response = client.get(MASTER_TRADERS_PATH, params=PARAMS)
+
+    assert response.is_modified
+    assert len(response.payload[0]["signals"]) == 1
+    assert fake_controller.not_modified_count == 0
+
+
+def test_unconditional_request_sends_no_etag(controller_client, fake_controller):
+    client = controller_client(fake_controller.base_url)
+    client.get(MASTER_TRADERS_PATH, params=PARAMS, conditional=False)
+
+    response = client.get(MASTER_TRADERS_PATH, params=PARAMS, conditional=False)
+
+    assert response.is_modified
+    assert fake_controller.not_modified_count == 0
+
+
+class FlakyServer:
+    """Answers with the queued status codes, then ``200`` with an empty JSON list."""
+
+    def __init__(self, status_codes):
+        self.status_codes = list(status_codes)
+        self.request_count = 0
+        server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.request_count += 1
+                status_code = server.status_codes.pop(0) if server.status_codes else 200
+                body = b"[]" if status_code == 200 else b""
+                self.send_response(status_code)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), RequestHandler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+@pytest.fixture
+def flaky_server():
+    servers = []
+
+    def start(*status_codes):
+        servers.append(FlakyServer(status_codes))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def test_retryable_status_codes_are_retried(controller_client, flaky_server):
+    server = flaky_server(503, 429)
+    client = controller_client(server.base_url)
+
+    response = client.get(MASTER_TRADERS_PATH)
+
+    assert (response.status_code, response.payload) == (requests.codes.ok, [])
+    assert server.request_count == 3
+
+
+def test_retries_stop_after_max_retries(controller_client, flaky_server):
+    server = flaky_server(503, 503, 503, 503)
+    client = controller_client(server.base_url, max_retries=2)
+
+    response = client.get(MASTER_TRADERS_PATH)
+
+    assert (response.status_code, response.payload) == (503, None)
+    assert server.request_count == 3
+
+
+def test_client_errors_are_not_retried(controller_client, flaky_server):
+    server = flaky_server(404)
+    client = controller_client(server.base_url)
+
+    assert client.get(MASTER_TRADERS_PATH).status_code == 404
+    assert server.request_count == 1
+
+
+def test_connection_error_is_raised_after_retries(controller_client, flaky_server):
+    server = flaky_server()
+    base_url = server.base_url
+    server.stop()
+    client = controller_client(base_url, max_retries=1)
+
+    with pytest.raises(requests.ConnectionError):
+        client.get(MASTER_TRADERS_PATH)
+
+
+
+def test_each_thread_gets_its_own_session(controller_client, fake_controller):
+    client = controller_client(fake_controller.base_url)
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(client.session))
+    thread.start()
+    thread.join()
+
+    assert client.session is client.session
+    assert sessions[0] is not client.session
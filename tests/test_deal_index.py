@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from handlers.deal_index import DealIndex
+
+
+@pytest.fixture
+def deal_index(mt5, logger):
+    return DealIndex(mt5, logger, retention_in_days=10)
+
+
+def test_first_refresh_loads_the_history(deal_index, open_position):
+    result = open_position(magic=7)
+
+    assert deal_index.refresh()
+
+    assert deal_index.is_reloaded
+    assert deal_index.get_deal_by_magic(7).ticket == result.deal
+
+
+def test_unchanged_history_is_checked_by_count_only(deal_index, mt5, open_position):
+    open_position(magic=7)
+    deal_index.refresh()
+
+    assert not deal_index.refresh()
+
+    assert not deal_index.is_reloaded
+    assert deal_index.new_deals == []
+    assert mt5.call_counts["history_deals_total"] == 1
+    assert mt5.call_counts["history_deals_get"] == 1
+
+
+def test_new_deals_are_downloaded_as_a_tail(deal_index, open_position):
+    first_result = open_position(magic=7)
+    deal_index.refresh()
+
+    second_result = open_position(magic=8)
+    assert deal_index.refresh()
+
+    assert not deal_index.is_reloaded
+    assert [deal.ticket for deal in deal_index.new_deals] == [second_result.deal]
+    assert deal_index.get_deal_by_magic(7).ticket == first_result.deal
+    assert deal_index.get_deal_by_magic(8).ticket == second_result.deal
+    # The first deal shares the watermark second, it is downloaded again but not reported as new
+    assert not deal_index.refresh()
+    assert deal_index.watermark[1] == 2
+
+
+def test_closing_deals_are_indexed_by_position(deal_index, open_position, close_position):
+    open_result = open_position(magic=7)
+    deal_index.refresh()
+
+    close_result = close_position(open_result.order, magic=7)
+    deal_index.refresh()
+
+    closing_deal = deal_index.get_closing_deal(open_result.order)
+    assert closing_deal.ticket == close_result.deal
+    assert deal_index.is_closing_deal(closing_deal)
+    assert deal_index.get_opening_deal(open_result.order).ticket == open_result.deal
+    assert not deal_index.is_closing_deal(deal_index.get_opening_deal(open_result.order))
+    assert deal_index.closing_deals == [closing_deal]
+
+
+def test_full_reload_after_interval(deal_index, mt5):
+    deal_index.full_reload_interval_in_seconds = 0
+    deal_index.refresh()
+
+    deal_index.refresh()
+
+    assert deal_index.is_reloaded
+    assert mt5.call_counts.get("history_deals_total", 0) == 0
+
+
+def test_reload_resumes_from_time(deal_index, open_position):
+    open_position(magic=7)
+    resume_from_time = time.time() + 10
+    deal_index.resume_from_time = resume_from_time
+
+    deal_index.refresh()
+
+    assert deal_index.get_deal_by_magic(7) is None
+    assert deal_index.watermark == (pytest.approx(resume_from_time - DealIndex.WATERMARK_OVERLAP_IN_SECONDS), 0)
+    assert deal_index.resume_from_time is None
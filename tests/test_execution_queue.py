@@ -0,0 +1,126 @@
+import pytest
+
+from handlers.constant import OrderIntentTypeEnum
+from handlers.execution_queue import ExecutionQueue
+from handlers.metrics import Metrics
+
+
+@pytest.fixture
+def metrics():
+    return Metrics(terminal="terminal")
+
+
+@pytest.fixture
+def execution_queue(logger, metrics):
+    execution_queue = ExecutionQueue(
+        logger, lambda result: result == "done", cycle_deadline_in_seconds=5, metrics=metrics)
+    execution_queue.begin_cycle()
+    return execution_queue
+
+
+@pytest.fixture
+def executed():
+    return []
+
+
+@pytest.fixture
+def submit(execution_queue, executed):
+    """Queue an intent that records its description when executed and returns ``result``."""
+
+    def submit(intent_type, key, master_trader_id="1", result="done"):
+        description = f"{intent_type.name} {key}"
+
+        def execute():
+            executed.append(description)
+            return result
+
+        execution_queue.submit(intent_type, key, master_trader_id, description, execute)
+
+    return submit
+
+
+def test_intents_run_closes_then_modifications_then_opens(execution_queue, submit, executed):
+    submit(OrderIntentTypeEnum.OPEN, ("a",))
+    submit(OrderIntentTypeEnum.MODIFY, ("b",))
+    submit(OrderIntentTypeEnum.OPEN, ("c",))
+    submit(OrderIntentTypeEnum.CLOSE, ("d",))
+
+    assert execution_queue.execute() == set()
+    assert executed == ["CLOSE ('d',)", "MODIFY ('b',)", "OPEN ('a',)", "OPEN ('c',)"]
+
+
+def test_duplicate_intent_keeps_the_most_urgent(execution_queue, submit, executed):
+    submit(OrderIntentTypeEnum.MODIFY, ("a",))
+    submit(OrderIntentTypeEnum.CLOSE, ("a",))
+    submit(OrderIntentTypeEnum.OPEN, ("a",))
+    submit(OrderIntentTypeEnum.CLOSE, ("a",))
+
+    execution_queue.execute()
+
+    assert executed == ["CLOSE ('a',)"]
+
+
+def test_failed_intent_leaves_its_master_trader_unsettled(execution_queue, submit, executed):
+    submit(OrderIntentTypeEnum.OPEN, ("a",), master_trader_id="1", result=None)
+    submit(OrderIntentTypeEnum.OPEN, ("b",), master_trader_id="2")
+
+    def raise_error():
+        raise Exception("No connection")
+
+    execution_queue.submit(OrderIntentTypeEnum.CLOSE, ("c",), "3", "CLOSE ('c',)", raise_error)
+
+    assert execution_queue.execute() == {"1", "3"}
+    assert executed == ["OPEN ('a',)", "OPEN ('b',)"]
+
+
+def test_intents_past_the_deadline_are_dropped(execution_queue, submit, executed, monotonic_clock):
+    execution_queue.begin_cycle()
+    submit(OrderIntentTypeEnum.CLOSE, ("a",), master_trader_id="1")
+    submit(OrderIntentTypeEnum.OPEN, ("b",), master_trader_id="2")
+
+    def modify_slowly():
+        monotonic_clock(10)
+        executed.append("MODIFY ('c',)")
+        return "done"
+
+    execution_queue.submit(OrderIntentTypeEnum.MODIFY, ("c",), "3", "MODIFY ('c',)", modify_slowly)
+
+    assert execution_queue.execute() == {"2"}
+    assert executed == ["CLOSE ('a',)", "MODIFY ('c',)"]
+
+
+def test_begin_cycle_drops_intents_left_by_a_failed_cycle(execution_queue, submit, executed):
+    submit(OrderIntentTypeEnum.OPEN, ("a",))
+
+    execution_queue.begin_cycle()
+    submit(OrderIntentTypeEnum.OPEN, ("b",))
+    execution_queue.execute()
+
+    assert executed == ["OPEN ('b',)"]
+
+
+def test_executed_intents_are_reported(execution_queue, submit):
+    reported = []
+    execution_queue.on_executed = lambda intent, result: reported.append((intent.key, result))
+    submit(OrderIntentTypeEnum.OPEN, ("a",))
+
+    execution_queue.execute()
+
+    assert reported == [(("a",), "done")]
+
+
+def test_intent_latency_is_observed_per_intent_type(execution_queue, submit, metrics, monotonic_clock):
+    submit(OrderIntentTypeEnum.CLOSE, ("a",))
+    submit(OrderIntentTypeEnum.OPEN, ("b",))
+    submit(OrderIntentTypeEnum.OPEN, ("c",))
+    monotonic_clock(0.2)
+
+    execution_queue.execute()
+
+    rendered_metrics = metrics.render()
+    assert 'metatrader_ea_order_intent_latency_ms_count{terminal="terminal",intent="CLOSE"} 1' in rendered_metrics
+    assert 'metatrader_ea_order_intent_latency_ms_count{terminal="terminal",intent="OPEN"} 2' in rendered_metrics
+    assert 'metatrader_ea_order_intent_latency_ms_bucket{terminal="terminal",intent="CLOSE",le="100"} 0' \
+        in rendered_metrics
+    assert 'metatrader_ea_order_intent_latency_ms_bucket{terminal="terminal",intent="CLOSE",le="250"} 1' \
+        in rendered_metrics
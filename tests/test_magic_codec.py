@@ -0,0 +1,151 @@
+import json
+import os
+
+import pytest
+
+from handlers.magic_codec import MagicNumberCodec
+
+
+@pytest.fixture
+def table_path(tmp_path):
+    return str(tmp_path / "magic_numbers.json")
+
+
+@pytest.fixture
+def magic_codec(logger, table_path):
+    """Build a codec on the shared table, as a restarted terminal would."""
+
+    def magic_codec(master_trader_ids=("123", "trader-a"), is_legacy_supported=True, separator_number_string="33"):
+        return MagicNumberCodec(logger, table_path, separator_number_string, master_trader_ids, is_legacy_supported)
+
+    return magic_codec
+
+
+def test_numeric_ids_round_trip_without_table_entry(magic_codec, table_path):
+    codec = magic_codec()
+
+    magic_number = codec.encode(123, 456)
+
+    assert magic_number >> MagicNumberCodec.TAG_SHIFT == MagicNumberCodec.SCHEME_TAG
+    assert magic_number < 2 ** 63
+    assert codec.decode(magic_number) == ("123", "456")
+    assert codec.get_table() == {"masters": {}, "signals": {123: {}}}
+    codec.save_table()
+    assert not os.path.exists(table_path)
+
+
+def test_hashed_ids_round_trip_through_saved_table(magic_codec):
+    codec = magic_codec()
+    magic_number = codec.encode("trader-a", "signal-1")
+    numeric_master_magic_number = codec.encode("123", "99999999999")
+
+    assert codec.decode(magic_number) == ("trader-a", "signal-1")
+    assert codec.decode(numeric_master_magic_number) == ("123", "99999999999")
+    assert codec.encode("trader-a", "signal-1") == magic_number
+
+    codec.save_table()
+    reloaded_codec = magic_codec()
+    assert reloaded_codec.decode(magic_number) == ("trader-a", "signal-1")
+    assert reloaded_codec.encode("trader-a", "signal-1") == magic_number
+
+
+def test_leading_zero_id_is_hashed(magic_codec):
+    codec = magic_codec()
+
+    magic_number = codec.encode("123", "007")
+
+    assert codec.decode(magic_number) == ("123", "007")
+    assert codec.decode(codec.encode("123", "7")) == ("123", "7")
+    assert codec.encode("123", "7") != magic_number
+
+
+def test_table_is_written_only_when_modified(magic_codec, table_path):
+    codec = magic_codec()
+    codec.encode("trader-a", "signal-1")
+    codec.save_table()
+    with open(table_path, "w") as content:
+        json.dump({"masters": {}, "signals": {}}, content)
+
+    codec.encode("trader-a", "signal-1")
+    codec.save_table()
+
+    with open(table_path) as content:
+        assert json.load(content) == {"masters": {}, "signals": {}}
+
+
+def test_get_master_trader_ids_of_tagged_magic_numbers(magic_codec):
+    codec = magic_codec()
+    followed_magic_number = codec.encode("trader-a", "signal-1")
+    unfollowed_magic_number = codec.encode("trader-b", "signal-1")
+
+    assert codec.get_master_trader_ids(followed_magic_number) == ["trader-a"]
+    assert codec.get_master_trader_ids(unfollowed_magic_number) == []
+    assert codec.get_master_trader_ids(0) == []
+
+
+def test_tagged_magic_number_is_never_matched_by_legacy_prefix(magic_codec):
+    magic_number = magic_codec().encode("999", "1")
+    # A followed master trader whose legacy prefix is the start of the tagged magic number
+    codec = magic_codec(master_trader_ids=(str(magic_number)[0],), separator_number_string=str(magic_number)[1:3])
+
+    assert codec.get_master_trader_ids(magic_number) == []
+
+
+def test_legacy_magic_numbers_are_matched_by_prefix(magic_codec):
+    codec = magic_codec(master_trader_ids=("123", "45"))
+
+    legacy_magic_number = codec.encode_legacy("123", "456")
+
+    assert legacy_magic_number == 12333456
+    assert codec.decode(legacy_magic_number) is None
+    assert codec.get_master_trader_ids(legacy_magic_number) == ["123"]
+    assert codec.get_master_trader_ids(4533456) == ["45"]
+    assert codec.get_master_trader_ids(4443356) == []
+
+
+def test_legacy_fallback_can_be_disabled(magic_codec):
+    codec = magic_codec(is_legacy_supported=False)
+
+    assert codec.encode_legacy("123", "456") is None
+    assert codec.get_master_trader_ids(12333456) == []
+
+
+def test_legacy_magic_number_out_of_range_is_not_encoded(magic_codec):
+    codec = magic_codec()
+
+    assert codec.encode_legacy("trader-a", "1") is None
+    assert codec.encode_legacy("9" * 10, "9" * 10) is None
+
+
+def test_prune_drops_unused_hashed_ids(magic_codec):
+    codec = magic_codec()
+    kept_magic_number = codec.encode("trader-a", "signal-1")
+    codec.encode("trader-a", "signal-2")
+    codec.encode("trader-c", "signal-1")
+
+    codec.prune({kept_magic_number})
+    codec.save_table()
+
+    reloaded_codec = magic_codec()
+    assert reloaded_codec.get_table() == codec.get_table()
+    assert list(reloaded_codec.get_table()["masters"].values()) == ["trader-a"]
+    assert [list(signal_ids.values()) for signal_ids in reloaded_codec.get_table()["signals"].values()] == \
+        [["signal-1"]]
+    assert reloaded_codec.decode(kept_magic_number) == ("trader-a", "signal-1")
+
+
+def test_pruned_key_keeps_colliding_ids_encoded_after_restart(magic_codec):
+    codec = magic_codec()
+    # Both IDs hash to the same key, the second one is placed on the next key by probing
+    pruned_magic_number = codec.encode("trader-a", "s3985819")
+    kept_magic_number = codec.encode("trader-a", "s4420602")
+    assert kept_magic_number == pruned_magic_number + 1
+
+    codec.prune({kept_magic_number})
+    codec.save_table()
+    reloaded_codec = magic_codec()
+
+    assert reloaded_codec.encode("trader-a", "s4420602") == kept_magic_number
+    assert reloaded_codec.decode(kept_magic_number) == ("trader-a", "s4420602")
+    # The freed key is given to the next new ID hashed on it
+    assert reloaded_codec.encode("trader-a", "s3985819") == pruned_magic_number
@@ -0,0 +1,136 @@
+import time
+
+import pytest
+
+from handlers.mt5_handler import Mt5Handler
+
+
+@pytest.fixture
+def mt5_handler(mt5, logger, mt5_setting):
+    # EURUSD only moves when a test moves it
+    mt5.add_symbol("EURUSD", 1.08, volatility=0)
+    return Mt5Handler(mt5, logger, mt5_setting)
+
+
+@pytest.fixture
+def sent_requests(mt5, monkeypatch):
+    """Record the requests reaching the terminal."""
+    recorded_requests = []
+    order_send = mt5.order_send
+
+    def recording_order_send(request):
+        recorded_requests.append(request)
+        return order_send(request)
+
+    monkeypatch.setattr(mt5, "order_send", recording_order_send)
+    return recorded_requests
+
+
+@pytest.fixture
+def move_price_after_send(mt5, monkeypatch):
+    """Move the price of a symbol once the next order request was answered."""
+
+    def move_price_after_send(symbol, price):
+        order_send = mt5.order_send
+
+        def order_send_then_move_price(request):
+            result = order_send(request)
+            mt5.set_price(symbol, price)
+            return result
+
+        monkeypatch.setattr(mt5, "order_send", order_send_then_move_price)
+
+    return move_price_after_send
+
+
+@pytest.fixture
+def open_trade(mt5_handler, mt5):
+    def open_trade(symbol="EURUSD", volume=0.1):
+        return mt5_handler.open_trade(
+            symbol=symbol, volume=volume, order_type=mt5.ORDER_TYPE_BUY, stop_loss=0.0, take_profit=0.0,
+            magic_number=7)
+
+    return open_trade
+
+
+def test_requote_within_the_slippage_is_sent_again_at_the_new_price(
+        mt5, open_trade, sent_requests, move_price_after_send):
+    first_ask = mt5.symbol_info_tick("EURUSD").ask
+    move_price_after_send("EURUSD", 1.0803)
+    mt5.queue_order_retcodes(mt5.TRADE_RETCODE_REQUOTE)
+
+    result = open_trade()
+
+    assert result.retcode == mt5.TRADE_RETCODE_DONE
+    assert [request["price"] for request in sent_requests] == [first_ask, mt5.symbol_info_tick("EURUSD").ask]
+    assert result.price == pytest.approx(first_ask + 0.0003)
+
+
+def test_requote_beyond_the_slippage_is_not_sent_again(mt5, open_trade, sent_requests, move_price_after_send):
+    move_price_after_send("EURUSD", 1.0806)
+    mt5.queue_order_retcodes(mt5.TRADE_RETCODE_REQUOTE)
+
+    result = open_trade()
+
+    assert result.retcode == mt5.TRADE_RETCODE_REQUOTE
+    assert len(sent_requests) == 1
+    assert mt5.positions_total() == 0
+
+
+def test_close_is_sent_again_at_any_price(mt5, mt5_handler, open_trade, sent_requests, move_price_after_send):
+    open_trade()
+    position = mt5.positions_get()[0]
+    move_price_after_send("EURUSD", 1.0900)
+    mt5.queue_order_retcodes(mt5.TRADE_RETCODE_PRICE_CHANGED)
+
+    result = mt5_handler.close_trade_by_position(position)
+
+    assert result.retcode == mt5.TRADE_RETCODE_DONE
+    assert sent_requests[-1]["price"] == mt5.symbol_info_tick("EURUSD").bid
+    assert mt5.positions_total() == 0
+
+
+def test_invalid_filling_falls_through_the_allowed_filling_types(mt5, open_trade, sent_requests):
+    mt5.queue_order_retcodes(mt5.TRADE_RETCODE_INVALID_FILL)
+
+    assert open_trade().retcode == mt5.TRADE_RETCODE_DONE
+    assert [request["type_filling"] for request in sent_requests] == [mt5.ORDER_FILLING_FOK, mt5.ORDER_FILLING_IOC]
+
+    # The filling type that worked is sent first, ORDER_FILLING_RETURN is never tried as EURUSD does not allow it
+    sent_requests.clear()
+    mt5.queue_order_retcodes(mt5.TRADE_RETCODE_INVALID_FILL, mt5.TRADE_RETCODE_INVALID_FILL)
+
+    assert open_trade().retcode == mt5.TRADE_RETCODE_INVALID_FILL
+    assert [request["type_filling"] for request in sent_requests] == [mt5.ORDER_FILLING_IOC, mt5.ORDER_FILLING_FOK]
+
+
+def test_working_filling_type_is_remembered_until_the_setting_is_reloaded(
+        mt5, mt5_handler, mt5_setting, open_trade, sent_requests):
+    mt5.queue_order_retcodes(mt5.TRADE_RETCODE_INVALID_FILL)
+    open_trade()
+
+    open_trade()
+    mt5_handler.apply_mt5_setting(mt5_setting)
+    open_trade()
+
+    assert [request["type_filling"] for request in sent_requests] == [
+        mt5.ORDER_FILLING_FOK, mt5.ORDER_FILLING_IOC, mt5.ORDER_FILLING_IOC, mt5.ORDER_FILLING_FOK]
+
+
+def test_backoff_stops_at_the_retry_deadline(mt5, mt5_setting, open_trade, sent_requests, monotonic_clock, monkeypatch):
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        monotonic_clock(seconds)
+
+    monkeypatch.setattr(time, "sleep", sleep)
+    mt5_setting.order_retry_min_backoff_in_ms = 500
+    mt5.queue_order_retcodes(*[mt5.TRADE_RETCODE_TOO_MANY_REQUESTS] * mt5_setting.max_order_attempts)
+
+    result = open_trade()
+
+    assert result.retcode == mt5.TRADE_RETCODE_TOO_MANY_REQUESTS
+    # 0.5s and 1s backoffs, then the 0.5s left until the 2s deadline
+    assert sleeps == [0.5, 1.0, 0.5]
+    assert len(sent_requests) == 4
@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+
+import pytest
+
+from handlers.position_table import PositionTable
+
+
+@pytest.fixture
+def position_table(mt5, logger):
+    """A position table not downloaded yet, its first refresh fetches the positions."""
+    return PositionTable(mt5, logger, full_refresh_interval_in_seconds=3600)
+
+
+def test_unchanged_account_is_not_downloaded(position_table, mt5, open_position):
+    open_position()
+    assert position_table.refresh([], False)
+
+    assert not position_table.refresh([], False)
+
+    assert not position_table.is_fetched
+    assert mt5.call_counts["positions_get"] == 1
+    assert len(position_table.positions) == 1
+
+
+def test_changed_position_count_is_downloaded(position_table, open_position):
+    position_table.refresh([], False)
+
+    result = open_position()
+
+    assert position_table.refresh([], False)
+    assert [position.ticket for position in position_table.positions] == [result.order]
+
+
+def test_unexpected_deal_is_downloaded(position_table, mt5):
+    position_table.refresh([], False)
+
+    assert position_table.refresh([SimpleNamespace(ticket=1)], False)
+    assert position_table.refresh([], True)
+    assert mt5.call_counts["positions_get"] == 3
+
+
+def test_own_open_is_applied_without_download(position_table, mt5):
+    position_table.refresh([], False)
+    request = {"action": mt5.TRADE_ACTION_DEAL, "symbol": "EURUSD", "volume": 0.1, "type": mt5.ORDER_TYPE_BUY,
+               "magic": 7, "sl": 1.0, "tp": 1.2, "type_filling": mt5.ORDER_FILLING_IOC}
+    result = mt5.order_send(request)
+
+    position_table.apply_order_result(request, result)
+    deal = mt5.history_deals_get(ticket=result.order)[0]
+
+    assert not position_table.refresh([deal], False)
+    position, = position_table.positions
+    assert (position.ticket, position.magic, position.volume, position.sl, position.tp) == \
+        (result.order, 7, 0.1, 1.0, 1.2)
+
+
+def test_own_partial_and_full_close_are_applied(position_table, mt5, open_position, close_position):
+    open_result = open_position(volume=0.3)
+    position_table.refresh([], False)
+
+    for volume, remaining_volumes in ((0.1, [0.2]), (0.2, [])):
+        close_result = close_position(open_result.order, volume=volume)
+        position_table.apply_order_result(close_result.request, close_result)
+        deal = mt5.history_deals_get(ticket=close_result.order)[0]
+
+        assert not position_table.refresh([deal], False)
+        assert [position.volume for position in position_table.positions] == remaining_volumes
+
+
+def test_own_sltp_change_is_applied(position_table, mt5, open_position):
+    open_result = open_position()
+    position_table.refresh([], False)
+    request = {"action": mt5.TRADE_ACTION_SLTP, "symbol": "EURUSD", "position": open_result.order,
+               "sl": 1.0, "tp": 1.5}
+
+    position_table.apply_order_result(request, mt5.order_send(request))
+
+    assert not position_table.refresh([], False)
+    assert (position_table.positions[0].sl, position_table.positions[0].tp) == (1.0, 1.5)
+
+
+def test_result_for_unknown_position_forces_download(position_table, mt5, open_position, close_position):
+    open_result = open_position()
+    position_table.refresh([], False)
+    close_result = close_position(open_result.order)
+
+    position_table.apply_order_result(
+        {"action": mt5.TRADE_ACTION_SLTP, "symbol": "EURUSD", "position": 1}, SimpleNamespace(deal=0, volume=0))
+    deal = mt5.history_deals_get(ticket=close_result.order)[0]
+
+    assert position_table.refresh([deal], False)
+    assert position_table.positions == ()
+
+
+def test_invalidate_forces_download(position_table):
+    position_table.refresh([], False)
+
+    position_table.invalidate()
+
+    assert position_table.refresh([], False)
@@ -0,0 +1,113 @@
+import queue
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from handlers.controller_client import ControllerResponse
+from handlers.signal_fetcher import SharedSignalFetcher, SharedSignalReceiver
+
+
+class StubControllerClient:
+    """Answers ``/master_traders/`` with the payload of each source, or fails for sources without one."""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+
+    def get(self, path, params=None):
+        payload = self.payloads.get(params["source"])
+        if payload is None:
+            raise requests.ConnectionError("Connection refused")
+        return ControllerResponse(requests.codes.ok, payload, True)
+
+
+@pytest.fixture
+def worker_queue():
+    return queue.Queue()
+
+
+@pytest.fixture
+def fetcher(worker_queue):
+    mt5_setting = SimpleNamespace(bot_name="terminal", master_traders={"mql5": [1], "zulu": [2]})
+    return SharedSignalFetcher(SimpleNamespace(), [mt5_setting], {"terminal": worker_queue})
+
+
+@pytest.fixture
+def receiver(worker_queue):
+    return SharedSignalReceiver(worker_queue, max_wait_in_seconds=0.5)
+
+
+def fetch_and_publish(fetcher, logger, payloads):
+    fetched_payloads, _ = fetcher._fetch(StubControllerClient(payloads), logger)
+    fetcher._publish(fetched_payloads)
+
+
+def test_payload_carries_the_time_it_was_fetched(fetcher, receiver, logger):
+    fetched_after = time.time()
+    fetch_and_publish(fetcher, logger, {"mql5": [{"external_trader_id": "1", "signals": []}]})
+
+    response = receiver.get("mql5")
+
+    assert (response.status_code, response.payload, response.is_modified) == \
+        (requests.codes.ok, [{"external_trader_id": "1", "signals": []}], True)
+    assert fetched_after <= response.fetched_at <= time.time()
+
+
+def test_failing_source_keeps_its_last_fetch_time(fetcher, receiver, logger, monkeypatch):
+    payloads = {"mql5": [{"external_trader_id": "1", "signals": []}]}
+    fetch_and_publish(fetcher, logger, payloads)
+    fetched_at = receiver.get("mql5").fetched_at
+
+    monkeypatch.setattr(time, "time", lambda: fetched_at + 60)
+    fetch_and_publish(fetcher, logger, {})
+    fetch_and_publish(fetcher, logger, {})
+    receiver.wait_for_next_cycle(False)
+    response = receiver.get("mql5")
+
+    assert (response.payload, response.is_modified, response.fetched_at) == (payloads["mql5"], False, fetched_at)
+
+
+def test_unchanged_payload_refreshes_the_fetch_time_without_waking_the_worker(fetcher, receiver, logger):
+    payloads = {"mql5": [{"external_trader_id": "1", "signals": []}]}
+    fetch_and_publish(fetcher, logger, payloads)
+    first_fetched_at = receiver.get("mql5").fetched_at
+
+    fetch_and_publish(fetcher, logger, payloads)
+    started_at = time.monotonic()
+    receiver.wait_for_next_cycle(False)
+    response = receiver.get("mql5")
+
+    assert time.monotonic() - started_at >= receiver.max_wait_in_seconds
+    assert not response.is_modified
+    assert response.fetched_at >= first_fetched_at
+
+
+def test_modified_payload_wakes_the_worker(fetcher, receiver, logger):
+    fetch_and_publish(fetcher, logger, {"mql5": []})
+    receiver.get("mql5")
+    fetch_and_publish(fetcher, logger, {"mql5": [{"external_trader_id": "1", "signals": []}]})
+
+    started_at = time.monotonic()
+    receiver.wait_for_next_cycle(False)
+
+    assert time.monotonic() - started_at < receiver.max_wait_in_seconds
+    assert receiver.get("mql5").is_modified
+
+
+def test_source_never_fetched_is_unavailable_without_waiting(fetcher, receiver, logger):
+    fetch_and_publish(fetcher, logger, {"mql5": []})
+    receiver.get("mql5")
+
+    started_at = time.monotonic()
+    response = receiver.get("zulu")
+
+    assert response.status_code == requests.codes.service_unavailable
+    assert time.monotonic() - started_at < receiver.max_wait_in_seconds
+
+
+def test_first_update_is_waited_for(receiver):
+    started_at = time.monotonic()
+
+    assert receiver.get("mql5").status_code == requests.codes.service_unavailable
+    assert time.monotonic() - started_at >= receiver.max_wait_in_seconds
@@ -0,0 +1,112 @@
+import time
+
+import pytest
+import requests
+
+from handlers.controller_client import ControllerResponse
+from handlers.signal_transport import LongPollingTransport, PollingTransport
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record ``time.sleep`` calls instead of sleeping."""
+    recorded_sleeps = []
+    monkeypatch.setattr(time, "sleep", recorded_sleeps.append)
+    return recorded_sleeps
+
+
+@pytest.fixture
+def polling_transport():
+    return PollingTransport(min_interval_in_seconds=1.0, max_interval_in_seconds=4.0)
+
+
+class StubControllerClient:
+    """Answers long polls with the queued responses, raising the queued exceptions."""
+
+    timeout = (3.0, 10.0)
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, path, params=None, **kwargs):
+        self.requests.append(dict(params))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def long_polling_transport(polling_transport, logger):
+    def long_polling_transport(*responses):
+        return LongPollingTransport(StubControllerClient(*responses), ["mql5", "zulu"], 25, polling_transport, logger)
+
+    return long_polling_transport
+
+
+def test_idle_polling_backs_off_to_the_max_interval(polling_transport, sleeps):
+    for _ in range(4):
+        polling_transport.wait_for_next_cycle(False)
+
+    assert sleeps == [2.0, 4.0, 4.0, 4.0]
+
+
+def test_change_resets_the_poll_interval(polling_transport, sleeps):
+    polling_transport.wait_for_next_cycle(False)
+    polling_transport.wait_for_next_cycle(True)
+
+    assert sleeps == [2.0, 1.0]
+
+
+def test_pending_signals_reset_the_poll_interval(polling_transport, sleeps):
+    polling_transport.wait_for_next_cycle(False)
+    polling_transport.wait_for_next_cycle(False, has_pending_signals=True)
+    polling_transport.wait_for_next_cycle(False, has_pending_signals=True)
+
+    assert sleeps == [2.0, 1.0, 1.0]
+
+
+def test_long_poll_follows_the_cursor(long_polling_transport, sleeps):
+    transport = long_polling_transport(
+        ControllerResponse(requests.codes.ok, {"cursor": 7}, True),
+        ControllerResponse(requests.codes.no_content, None, True))
+
+    transport.wait_for_next_cycle(False)
+    transport.wait_for_next_cycle(True)
+
+    assert transport.controller_client.requests == [
+        {"sources": "mql5,zulu", "timeout": 25},
+        {"sources": "mql5,zulu", "timeout": 25, "cursor": 7},
+    ]
+    assert transport.cursor == 7
+    assert all(sleep <= LongPollingTransport.MIN_CYCLE_INTERVAL_IN_SECONDS for sleep in sleeps)
+
+
+def test_pending_signals_are_polled_without_long_poll(long_polling_transport, sleeps):
+    transport = long_polling_transport()
+
+    transport.wait_for_next_cycle(False, has_pending_signals=True)
+
+    assert transport.controller_client.requests == []
+    assert sleeps == [1.0]
+
+
+@pytest.mark.parametrize("response", [
+    requests.ConnectionError("Connection refused"),
+    ValueError("Expecting value"),
+    ControllerResponse(requests.codes.not_found, None, True),
+    ControllerResponse(requests.codes.ok, ["not", "a", "cursor"], True),
+])
+def test_failed_long_poll_falls_back_to_polling(long_polling_transport, sleeps, monotonic_clock, response):
+    transport = long_polling_transport(response, ControllerResponse(requests.codes.no_content, None, True))
+
+    transport.wait_for_next_cycle(False)
+    transport.wait_for_next_cycle(False)
+
+    assert len(transport.controller_client.requests) == 1
+    assert sleeps == [2.0, 4.0]
+
+    monotonic_clock(LongPollingTransport.RETRY_AFTER_FAILURE_IN_SECONDS)
+    transport.wait_for_next_cycle(False)
+    assert len(transport.controller_client.requests) == 2
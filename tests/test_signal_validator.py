@@ -0,0 +1,119 @@
+import datetime
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from handlers.classes import TradeSignal
+from handlers.constant import SignalRejectReasonEnum
+from handlers.signal_validator import SignalValidator
+from handlers.symbol_catalog import SymbolSpec
+
+SYMBOL_SPECS = {
+    "EURUSD": SymbolSpec("EURUSD", True, 3, 0.01, 100, 0.01, 5, 0.00001, 0),
+    "USDJPY": SymbolSpec("USDJPY", True, 3, 0.01, 100, 0.01, 3, 0.001, 0),
+    "XAUUSD": SymbolSpec("XAUUSD", True, 3, 0.01, 100, 0.01, 2, 0.01, 0),
+    "GBPUSD": SymbolSpec("GBPUSD", True, 3, 0.01, 100, 0.01, 5, 0.00001, 0),
+}
+TICKS = {
+    "EURUSD": SimpleNamespace(bid=1.1000, ask=1.1001),
+    "USDJPY": SimpleNamespace(bid=150.00, ask=150.01),
+    "XAUUSD": SimpleNamespace(bid=2000.0, ask=2000.3),
+}
+
+
+def get_tick(symbol):
+    if symbol not in TICKS:
+        raise Exception(f"No tick for {symbol}")
+    return TICKS[symbol]
+
+
+@pytest.fixture
+def validator():
+    mt5_handler = SimpleNamespace(
+        symbol_catalog=SimpleNamespace(get_symbol_spec=SYMBOL_SPECS.get),
+        quote_snapshot=SimpleNamespace(get_tick=get_tick),
+        get_server_time=time.time,
+    )
+    return SignalValidator(mt5_handler, max_price_difference_in_pips=20, max_order_age_in_minutes=60)
+
+
+@pytest.fixture
+def signal():
+    """A signal of master trader 1 sent ``age_in_minutes`` ago."""
+
+    def signal(symbol, price_order, trade_type="BUY", age_in_minutes=0):
+        signal_time = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=age_in_minutes)
+        return TradeSignal(1, "1", symbol, trade_type, 0.1, signal_time.isoformat(), price_order, price_order)
+
+    return signal
+
+
+def test_price_deviation_is_measured_in_pips_of_each_symbol(validator, signal):
+    signals = [
+        signal("EURUSD", 1.1011),
+        signal("EURUSD", 1.0980),
+        signal("USDJPY", 150.2),
+        signal("USDJPY", 149.0),
+        signal("XAUUSD", 1999.9, trade_type="SELL"),
+        signal("XAUUSD", 2003.0),
+    ]
+
+    validation = validator.validate(signals)
+
+    assert validation.accepted.tolist() == [True, False, True, False, True, False]
+    assert validation.price_differences_in_pips.round(1).tolist() == [10.0, 21.0, 19.0, 101.0, 10.0, 270.0]
+    assert validation.current_prices.tolist() == [1.1001, 1.1001, 150.01, 150.01, 2000.0, 2000.3]
+    assert signals[1].price_diff == pytest.approx(21.0)
+
+
+def test_old_signal_is_rejected_before_its_price(validator, signal):
+    signals = [
+        signal("EURUSD", 1.0, age_in_minutes=61),
+        signal("EURUSD", 1.1001, age_in_minutes=59),
+    ]
+
+    validation = validator.validate(signals)
+
+    assert validation.reasons.tolist() == [
+        SignalRejectReasonEnum.TOO_OLD.value, SignalRejectReasonEnum.ACCEPTED.value]
+    assert signals[0].time_diff > datetime.timedelta(minutes=60)
+
+
+@pytest.fixture
+def tokyo_local_time(monkeypatch):
+    """Run the test on a host whose local time is 9 hours ahead of UTC."""
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_time_without_offset_is_read_as_utc(validator, tokyo_local_time):
+    # 2024-01-01T01:00:00Z
+    validator.mt5_handler.get_server_time = lambda: 1704070800.0
+    signals = [
+        TradeSignal(1, "1", "EURUSD", "BUY", 0.1, "2024-01-01T00:30:00", 1.1001, 1.1001),
+        TradeSignal(2, "2", "EURUSD", "BUY", 0.1, "2024-01-01 00:30:00+00:00", 1.1001, 1.1001),
+    ]
+
+    validation = validator.validate(signals)
+
+    assert validation.ages_in_seconds.tolist() == [1800.0, 1800.0]
+    assert validation.accepted.all()
+
+
+def test_signal_without_quote_is_rejected(validator, signal):
+    signals = [signal("BTCUSD", 1.0), signal("GBPUSD", 1.26)]
+
+    validation = validator.validate(signals)
+
+    assert validation.reasons.tolist() == [SignalRejectReasonEnum.NO_QUOTE.value] * 2
+    assert not validation.accepted.any()
+
+
+def test_empty_batch(validator):
+    validation = validator.validate([])
+
+    assert validation.accepted.tolist() == []
@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from handlers.constant import SignalLifecycleStateEnum
+from handlers.state_journal import StateJournal
+
+
+@pytest.fixture
+def state_journal(logger, tmp_path):
+    """Open the journal of the terminal, as a restarted process would."""
+    state_journals = []
+
+    def state_journal(retention_in_days=365, database_name="state/journal.sqlite3"):
+        state_journals.append(StateJournal(str(tmp_path / database_name), logger, retention_in_days))
+        return state_journals[-1]
+
+    yield state_journal
+    for opened_state_journal in state_journals:
+        opened_state_journal.close()
+
+
+def test_entries_are_loaded_again_after_restart(state_journal):
+    journal = state_journal()
+    journal.record_open(101, "1", "10", 5001)
+    journal.record_open(102, "1", "11", 5002)
+    journal.record_closed(102, None, None, 6002, 5002, time.time())
+    journal.close()
+
+    journal = state_journal()
+
+    assert journal.get(101).state == SignalLifecycleStateEnum.OPEN.value
+    assert journal.get_closed(101) is None
+    closed_entry = journal.get_closed(102)
+    assert (closed_entry.master_trader_id, closed_entry.external_signal_id, closed_entry.ticket) == ("1", "11", 6002)
+    assert journal.get_by_position_id(5001).magic_number == 101
+    assert journal.get_magic_numbers() == {101, 102}
+
+
+def test_closed_entry_is_not_written_again(state_journal):
+    journal = state_journal()
+    journal.record_closed(101, "1", "10", 6001, 5001, 100.0)
+
+    journal.record_closed(101, "1", "10", 6002, 5001, 200.0)
+
+    assert journal.get_closed(101).ticket == 6001
+
+
+def test_expired_closed_entries_are_deleted_at_start_up(state_journal):
+    journal = state_journal(retention_in_days=1)
+    journal.record_closed(101, "1", "10", 6001, 5001, time.time() - 2 * 86400)
+    journal.record_closed(102, "1", "11", 6002, 5002, time.time())
+    journal.record_open(103, "1", "12", 5003)
+    journal.close()
+
+    assert state_journal(retention_in_days=1).get_magic_numbers() == {102, 103}
+
+
+def test_deal_watermark_is_persisted(state_journal):
+    journal = state_journal()
+    assert journal.get_deal_watermark() is None
+
+    journal.set_deal_watermark(1700000000.0)
+    journal.set_deal_watermark(None)
+    journal.close()
+
+    assert state_journal().get_deal_watermark() == 1700000000.0
+
+
+def test_restore_copies_entries_of_another_journal(state_journal):
+    journal = state_journal()
+    journal.record_open(101, "1", "10", 5001)
+
+    restored_journal = state_journal(database_name="restored.sqlite3")
+    restored_journal.restore(journal.get_entries())
+
+    assert restored_journal.get_entries() == journal.get_entries()
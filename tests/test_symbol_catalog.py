@@ -0,0 +1,79 @@
+import pytest
+
+from handlers.symbol_catalog import SymbolCatalog
+
+
+@pytest.fixture
+def symbol_catalog(mt5, logger, monotonic_clock):
+    return SymbolCatalog(mt5, logger, "", ttl_in_seconds=300, unknown_symbol_ttl_in_seconds=600)
+
+
+def test_known_symbol_is_resolved_once_per_ttl(symbol_catalog, mt5, monotonic_clock):
+    symbol_spec = symbol_catalog.get_symbol_spec("EURUSD")
+
+    assert (symbol_spec.digits, symbol_spec.point, symbol_spec.pip_size) == (5, 0.00001, 0.0001)
+    monotonic_clock(299)
+    assert symbol_catalog.get_symbol_spec("EURUSD") is symbol_spec
+    assert mt5.call_counts["symbol_info"] == 1
+
+    monotonic_clock(1)
+    assert symbol_catalog.get_symbol_spec("EURUSD") is not symbol_spec
+    assert mt5.call_counts["symbol_info"] == 2
+
+
+def test_unknown_symbol_is_not_resolved_again_before_its_ttl(symbol_catalog, mt5, monotonic_clock):
+    assert symbol_catalog.get_symbol_spec("FOOBAR") is None
+    monotonic_clock(599)
+    assert symbol_catalog.get_symbol_spec("FOOBAR") is None
+    assert mt5.call_counts["symbol_info"] == 1
+
+    mt5.add_symbol("FOOBAR", 1.0)
+    monotonic_clock(1)
+    assert symbol_catalog.get_symbol_spec("FOOBAR").name == "FOOBAR"
+    assert mt5.call_counts["symbol_info"] == 2
+
+
+def test_invalidate_forgets_unknown_symbol(symbol_catalog, mt5):
+    symbol_catalog.get_symbol_spec("FOOBAR")
+    mt5.add_symbol("FOOBAR", 1.0)
+
+    symbol_catalog.invalidate("FOOBAR")
+
+    assert symbol_catalog.get_symbol_spec("FOOBAR") is not None
+
+
+def test_symbol_is_selected_only_when_not_selected(symbol_catalog, mt5):
+    assert symbol_catalog.enable("EURUSD").selected
+    assert symbol_catalog.enable("EURUSD").selected
+    assert mt5.call_counts["symbol_select"] == 1
+
+    assert symbol_catalog.enable("FOOBAR") is None
+    assert mt5.call_counts["symbol_select"] == 1
+
+
+def test_symbol_already_selected_in_the_terminal_is_not_selected_again(symbol_catalog, mt5):
+    mt5.symbol_select("EURUSD", True)
+
+    assert symbol_catalog.enable("EURUSD").selected
+    assert mt5.call_counts["symbol_select"] == 1
+
+
+def test_working_filling_type_is_remembered_per_symbol(symbol_catalog, mt5):
+    symbol_catalog.set_working_filling_type("EURUSD", mt5.ORDER_FILLING_FOK)
+    symbol_catalog.set_working_filling_type("USDJPY", mt5.ORDER_FILLING_IOC)
+
+    assert symbol_catalog.get_working_filling_type("EURUSD") == mt5.ORDER_FILLING_FOK
+    assert symbol_catalog.get_working_filling_type("GBPUSD") is None
+
+    symbol_catalog.invalidate("EURUSD")
+    assert symbol_catalog.get_working_filling_type("EURUSD") is None
+    assert symbol_catalog.get_working_filling_type("USDJPY") == mt5.ORDER_FILLING_IOC
+
+    symbol_catalog.clear_working_filling_types()
+    assert symbol_catalog.get_working_filling_type("USDJPY") is None
+
+
+def test_broker_symbol_carries_the_postfix(symbol_catalog):
+    symbol_catalog.set_symbol_postfix(".m")
+
+    assert symbol_catalog.to_broker_symbol("EUR/USD") == "EURUSD.m"